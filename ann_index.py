@@ -0,0 +1,226 @@
+# ann_index.py
+
+from pathlib import Path
+import numpy as np
+
+# -------------------------------------------------
+# NOTE
+# -------------------------------------------------
+# Store vectors are L2-normalised feature_encoder rows, so cosine similarity
+# is a plain dot product. Indexes only keep ids / centroids; the
+# vectors themselves are passed in from the vector store.
+#
+# search(..., alive=mask) skips rows whose mask entry is False
+# (tombstoned rows of a vector store segment).
+
+DEFAULT_KIND = "ivf"
+
+# -------------------------------------------------
+# HELPERS
+# -------------------------------------------------
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    # argpartition is O(n); only the k winners get sorted
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+
+    idx = np.argpartition(scores, -k)[-k:]
+    return idx[np.argsort(scores[idx])[::-1]]
+
+def row_scores(vectors, query: np.ndarray, rows=None) -> np.ndarray:
+    sub = vectors if rows is None else vectors[rows]
+    return np.asarray(sub @ query).ravel()
+
+# -------------------------------------------------
+# EXACT (BASELINE)
+# -------------------------------------------------
+
+class BruteForceIndex:
+    kind = "brute"
+
+    def __init__(self):
+        self.vectors = None
+
+    def build(self, vectors):
+        self.vectors = vectors
+        return self
+
+    def attach(self, vectors):
+        self.vectors = vectors
+        return self
+
+    def search(self, query: np.ndarray, k: int, alive: np.ndarray = None):
+        scores = row_scores(self.vectors, query)
+        if alive is not None:
+            scores[~alive] = -np.inf
+            k = min(k, int(np.count_nonzero(alive)))
+        idx = top_k(scores, k)
+        return idx, scores[idx]
+
+    def save(self, path: Path):
+        np.savez(path, kind=np.array(self.kind))
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls()
+
+# -------------------------------------------------
+# IVF (INVERTED FILE OVER K-MEANS CELLS)
+# -------------------------------------------------
+
+class IVFIndex:
+    kind = "ivf"
+
+    def __init__(self, n_lists: int = None, n_probe: int = 4, n_iter: int = 10, seed: int = 0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.seed = seed
+
+        self.vectors = None
+        self.centroids = None
+        self.list_offsets = None
+        self.list_ids = None
+
+    # ---------------- BUILD ----------------
+
+    def build(self, vectors):
+        n = vectors.shape[0]
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n)
+
+        rng = np.random.default_rng(self.seed)
+        centroids = self._dense(vectors[rng.choice(n, n_lists, replace=False)])
+
+        # spherical k-means: assign by dot product, renormalise means
+        for _ in range(self.n_iter):
+            assign = np.asarray(vectors @ centroids.T).argmax(axis=1)
+
+            for c in range(n_lists):
+                members = np.flatnonzero(assign == c)
+                if len(members) == 0:
+                    centroids[c] = self._dense(vectors[rng.integers(n)])[0]
+                    continue
+                centroids[c] = np.asarray(vectors[members].mean(axis=0)).ravel()
+
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms == 0, 1, norms)
+
+        assign = np.asarray(vectors @ centroids.T).argmax(axis=1)
+
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=n_lists)
+
+        self.vectors = vectors
+        self.n_lists = n_lists
+        self.centroids = centroids
+        self.list_ids = order.astype(np.int64)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return self
+
+    @staticmethod
+    def _dense(rows) -> np.ndarray:
+        rows = rows.toarray() if hasattr(rows, "toarray") else rows
+        return np.array(rows, dtype=np.float64, ndmin=2)
+
+    def attach(self, vectors):
+        self.vectors = vectors
+        return self
+
+    # ---------------- SEARCH ----------------
+
+    def candidates(self, query: np.ndarray, k: int, n_probe: int = None, alive: np.ndarray = None) -> np.ndarray:
+        n_probe = n_probe or self.n_probe
+        cell_order = np.argsort(self.centroids @ query)[::-1]
+
+        chosen = []
+        found = 0
+
+        # probe n_probe cells, more if they hold fewer than k (live) claims
+        for i, cell in enumerate(cell_order):
+            if i >= n_probe and found >= k:
+                break
+            start, end = self.list_offsets[cell], self.list_offsets[cell + 1]
+            ids = self.list_ids[start:end]
+            if alive is not None:
+                ids = ids[alive[ids]]
+            chosen.append(ids)
+            found += len(ids)
+
+        return np.concatenate(chosen) if chosen else np.empty(0, dtype=np.int64)
+
+    def search(self, query: np.ndarray, k: int, n_probe: int = None, alive: np.ndarray = None):
+        cand = self.candidates(query, k, n_probe, alive)
+        scores = row_scores(self.vectors, query, cand)
+        best = top_k(scores, k)
+        return cand[best], scores[best]
+
+    # ---------------- PERSIST ----------------
+
+    def save(self, path: Path):
+        np.savez(
+            path,
+            kind=np.array(self.kind),
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_ids=self.list_ids,
+            n_probe=np.array(self.n_probe),
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        index = cls(n_lists=len(arrays["centroids"]), n_probe=int(arrays["n_probe"]))
+        index.centroids = arrays["centroids"]
+        index.list_offsets = arrays["list_offsets"]
+        index.list_ids = arrays["list_ids"]
+        return index
+
+# -------------------------------------------------
+# REGISTRY
+# -------------------------------------------------
+
+INDEX_TYPES = {
+    BruteForceIndex.kind: BruteForceIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+def build_index(vectors, kind: str = DEFAULT_KIND, **params):
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown ANN index type: {kind}")
+    return INDEX_TYPES[kind](**params).build(vectors)
+
+def load_index(path: Path, vectors):
+    with np.load(path) as arrays:
+        kind = str(arrays["kind"])
+        index = INDEX_TYPES[kind].from_arrays(arrays)
+    return index.attach(vectors)
+
+# -------------------------------------------------
+# EVALUATION
+# -------------------------------------------------
+
+def recall_at_k(index, exact, queries, k: int, **search_params) -> float:
+    """
+    Fraction of the exact top-k ids that the index also returns,
+    averaged over all queries. Ties in the exact scores count as hits.
+    """
+    hits = 0
+    total = 0
+
+    for q in queries:
+        approx_ids, _ = index.search(q, k, **search_params)
+        exact_ids, exact_scores = exact.search(q, k)
+
+        # a different id with the same score as the k-th exact hit is equally correct
+        kth = exact_scores[-1] if len(exact_scores) else 0.0
+        approx_scores = row_scores(exact.vectors, q, approx_ids)
+
+        hits += min(
+            len(exact_ids),
+            len(set(approx_ids) & set(exact_ids))
+            + int(np.sum((approx_scores >= kth - 1e-9) & ~np.isin(approx_ids, exact_ids)))
+        )
+        total += len(exact_ids)
+
+    return hits / total if total else 1.0
@@ -1,22 +1,64 @@
 import streamlit as st
-import json
 from pathlib import Path
+import numpy as np
 
 # Internal imports (LOCKED CONTRACTS)
-from semantic_retriever import find_similar_claims
-from decision_engine import decide_claim
+from decision_cache import get_cache
+from columnar_feature_store import INDEX_COLUMN, get_feature, read_columns, store_version
 
 # -----------------------------
 # CONFIG
 # -----------------------------
 BASE_DIR = Path(__file__).resolve().parent
-FEATURE_DIR = BASE_DIR / "data" / "feature_store"
+
+PAGE_SIZES = [25, 50, 100]
 
 st.set_page_config(
     page_title="Intelligent Claims Decision System",
     layout="wide"
 )
 
+# -----------------------------
+# CACHED RESOURCES / DATA
+# -----------------------------
+# store_version() is a stat of the partition files: a pipeline run that
+# rewrites the store gives a new key, so the cached index is rebuilt once.
+
+@st.cache_resource
+def get_scoring():
+    # vector store + decision cache, shared by every session of this server
+    return get_cache()
+
+@st.cache_data(max_entries=4)
+def load_claim_index(version):
+    columns = read_columns([INDEX_COLUMN, "claim_number", "claim_type", "severity"])
+    numbers = np.array(
+        [n or "" for n in columns["claim_number"].tolist()], dtype=str
+    )
+    return {
+        "claim_id": columns[INDEX_COLUMN],
+        "claim_number": numbers,
+        # one upper-cased "<claim id> <claim number>" string per row for search
+        "search_key": np.char.upper(np.char.add(np.char.add(columns[INDEX_COLUMN], " "), numbers)),
+        "claim_type": columns["claim_type"],
+        "severity": columns["severity"],
+    }
+
+@st.cache_data(max_entries=1024)
+def load_claim(claim_id, claim_type, version):
+    return get_feature(claim_id, claim_type=claim_type)
+
+def search_claims(index, query, claim_types, severities):
+    # row positions matching every filter, in store order
+    mask = np.ones(len(index["claim_id"]), dtype=bool)
+    if query:
+        mask &= np.char.find(index["search_key"], query.strip().upper()) >= 0
+    if claim_types:
+        mask &= np.isin(index["claim_type"], claim_types)
+    if severities:
+        mask &= np.isin(index["severity"], severities)
+    return np.flatnonzero(mask)
+
 # -----------------------------
 # HEADER
 # -----------------------------
@@ -32,20 +74,50 @@ st.markdown(
 )
 
 # -----------------------------
-# SIDEBAR
+# SIDEBAR (SEARCH + PAGINATION)
 # -----------------------------
+version = store_version()
+index = load_claim_index(version)
+
 st.sidebar.header("📂 Select Incoming Claim")
 
-claim_files = sorted([f.name for f in FEATURE_DIR.glob("*.json")])
-selected_file = st.sidebar.selectbox("Choose a claim:", claim_files)
+query = st.sidebar.text_input("Search claim number")
+claim_types = st.sidebar.multiselect("Claim type", sorted(set(index["claim_type"].tolist())))
+severities = st.sidebar.multiselect("Severity", sorted(set(index["severity"].tolist())))
+
+rows = search_claims(index, query, claim_types, severities)
+
+if not len(rows):
+    st.sidebar.warning("No claims match the filters")
+    st.stop()
+
+page_size = st.sidebar.selectbox("Claims per page", PAGE_SIZES)
+pages = (len(rows) - 1) // page_size + 1
+page = st.sidebar.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1)
+
+page_rows = rows[(page - 1) * page_size:page * page_size]
+st.sidebar.caption(f"{len(rows)} matching claims")
+
+position = st.sidebar.radio(
+    "Choose a claim:",
+    range(len(page_rows)),
+    format_func=lambda i: (
+        f"{index['claim_number'][page_rows[i]] or index['claim_id'][page_rows[i]]}"
+        f" · {index['claim_type'][page_rows[i]]} · {index['severity'][page_rows[i]]}"
+    ),
+)
+selected = page_rows[position]
 
 run_btn = st.sidebar.button("🚀 Run Intelligent Decision")
 
 # -----------------------------
 # LOAD CLAIM
 # -----------------------------
-with open(FEATURE_DIR / selected_file) as f:
-    claim = json.load(f)
+claim = load_claim(
+    str(index["claim_id"][selected]),
+    str(index["claim_type"][selected]),
+    version
+)
 
 # -----------------------------
 # CLAIM OVERVIEW
@@ -77,7 +149,9 @@ if run_btn:
     # 🔍 Semantic Retrieval
     st.subheader("🔍 Semantic Similar Claims Search")
 
-    retrieval = find_similar_claims(claim)
+    # retrieval + decision, cached per feature fingerprint
+    result = get_scoring().score_claim(claim)
+    retrieval = result["retrieval"]
 
     matches = retrieval["matches"]
     summary = retrieval["similarity_summary"]
@@ -99,7 +173,7 @@ if run_btn:
     # 🧠 Decision Engine
     st.subheader("🧠 Decision Engine Verdict")
 
-    decision = decide_claim(claim, matches)
+    decision = result["decision"]
 
     decision_color = {
         "AUTO_APPROVE": "green",
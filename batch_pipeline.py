@@ -1,29 +1,29 @@
 from pathlib import Path
-import json
 
-from semantic_retriever import find_similar_claims
-from decision_engine import decide_claim
+from columnar_feature_store import read_features
+from decision_cache import get_cache
 
 BASE_DIR = Path(__file__).resolve().parent
-FEATURE_DIR = BASE_DIR / "data" / "feature_store"
 
 
 def run_batch_pipeline():
-    files = list(FEATURE_DIR.glob("*.json"))
-    print(f"📦 Processing {len(files)} claims...\n")
+    # whole store in one read per claim_type partition
+    claims = read_features()
+    print(f"📦 Processing {len(claims)} claims...\n")
 
-    for file in files[:1]:  # start with 1 for safety
-        claim = json.load(open(file))
-
-        retrieval = find_similar_claims(claim)
-        decision = decide_claim(
-            current_claim=claim,
-            similar_claims=retrieval["matches"]
-        )
+    # one vectorised retrieval + decision pass over the distinct
+    # feature fingerprints of the backlog
+    cache = get_cache()
+    results = cache.score(claims)
 
+    for claim, result in zip(claims, results):
+        decision = result["decision"]
         print(f"🧾 Claim: {claim['claim_number']}")
         print(f"➡️ Decision: {decision['decision']}")
-        print(f"📌 Reason: {decision['reason']}\n")
+        print(f"📌 Reason: {decision['reason']} ({decision['rule_id']})\n")
+
+    stats = cache.stats()
+    print(f"♻️ {stats['hits']} of {len(claims)} claims shared a feature fingerprint (hit rate {stats['hit_rate']:.0%})")
 
 
 if __name__ == "__main__":
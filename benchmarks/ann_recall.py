@@ -0,0 +1,89 @@
+# benchmarks/ann_recall.py
+#
+# recall@k and query latency of the ANN index vs the exact scan.
+#
+#   python benchmarks/ann_recall.py                 # real vector store
+#   python benchmarks/ann_recall.py 200000          # store rows + noise, scaled up
+
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ann_index import BruteForceIndex, IVFIndex, recall_at_k
+from sparse_store import load_csr
+from vector_generations import current_generation, read_manifest, segment_dir
+
+K = 3
+N_QUERIES = 200
+N_PROBES = [1, 2, 4, 8, 16]
+
+# -------------------------------------------------
+# CORPUS
+# -------------------------------------------------
+
+def scaled_corpus(vectors: np.ndarray, size: int, seed: int = 0) -> np.ndarray:
+    """
+    Resample store rows and jitter a few non-zero weights so the
+    corpus keeps the real clustering but has no exact duplicates.
+    """
+    rng = np.random.default_rng(seed)
+    rows = vectors[rng.integers(len(vectors), size=size)].copy()
+
+    noise = rng.normal(0, 0.05, size=rows.shape) * (rows > 0)
+    rows = np.clip(rows + noise, 0, None)
+
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    return rows / np.where(norms == 0, 1, norms)
+
+# -------------------------------------------------
+# BENCHMARK
+# -------------------------------------------------
+
+def time_queries(index, queries, **params) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        index.search(q, K, **params)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+def main(size: int = None):
+    # every segment of the published generation, tombstones included
+    vectors = sparse.vstack([
+        load_csr(segment_dir(seg["name"]) / "vectors.npz")
+        for seg in read_manifest(current_generation())["segments"]
+    ]).tocsr()
+    if size:
+        vectors = sparse.csr_matrix(scaled_corpus(vectors.toarray(), size))
+
+    rng = np.random.default_rng(1)
+    n = vectors.shape[0]
+    queries = vectors[rng.choice(n, min(N_QUERIES, n), replace=False)]
+    queries = queries.toarray()
+
+    print(f"📦 corpus: {vectors.shape[0]} x {vectors.shape[1]}, {len(queries)} queries, k={K}\n")
+
+    exact = BruteForceIndex().build(vectors)
+    exact_ms = time_queries(exact, queries)
+
+    start = time.perf_counter()
+    ivf = IVFIndex().build(vectors)
+    build_s = time.perf_counter() - start
+
+    print(f"{'index':<8}{'n_probe':>8}{'recall@k':>10}{'ms/query':>10}{'speedup':>9}")
+    print(f"{'brute':<8}{'-':>8}{1.0:>10.3f}{exact_ms:>10.3f}{1.0:>9.1f}")
+
+    for n_probe in N_PROBES:
+        if n_probe > ivf.n_lists:
+            break
+        recall = recall_at_k(ivf, exact, queries, K, n_probe=n_probe)
+        ms = time_queries(ivf, queries, n_probe=n_probe)
+        print(f"{'ivf':<8}{n_probe:>8}{recall:>10.3f}{ms:>10.3f}{exact_ms / ms:>9.1f}")
+
+    print(f"\n⏱️ IVF build ({ivf.n_lists} lists): {build_s:.2f}s")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,105 @@
+# benchmarks/entity_extraction.py
+#
+# claims/sec of entity_extractor.extract_entities over data/ocr, against
+# the previous implementation (uncompiled re.search per pattern over all
+# texts including combined.txt), with and without the email fast path.
+# All paths must give the same entities. The claim document cache is
+# cleared every round so each one reads from disk.
+#
+#   python benchmarks/entity_extraction.py [rounds]
+
+from pathlib import Path
+import re
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import claim_documents
+import entity_extractor
+from entity_extractor import FIELD_PATTERNS, OCR_DIR, clean_amount, extract_entities
+
+# -------------------------------------------------
+# BEFORE
+# -------------------------------------------------
+
+def legacy_extract(patterns, text):
+    for p in patterns:
+        m = re.search(p, text, re.I | re.S)
+        if m:
+            return m.group(1).strip()
+    return None
+
+def legacy_extract_entities(folder: Path):
+    texts = entity_extractor.read_claim_texts(folder)
+    full_text = "\n".join(texts.values())
+
+    claim_type = (
+        "AUTO" if folder.name.startswith("CLM-AU")
+        else "HOME" if folder.name.startswith("CLM-HO")
+        else "UNKNOWN"
+    )
+
+    def get(field):
+        return legacy_extract(FIELD_PATTERNS[field], full_text)
+
+    vehicle = vin = property_address = None
+    loss_type = "vehicle damage" if claim_type == "AUTO" else None
+
+    if claim_type == "AUTO":
+        vehicle, vin = get("vehicle"), get("vin")
+    if claim_type == "HOME":
+        property_address, loss_type = get("property_address"), get("loss_type")
+
+    return {
+        "claim_type": claim_type,
+        "claim_number": get("claim_number"),
+        "policy_number": get("policy_number"),
+        "insured_name": get("insured_auto" if claim_type == "AUTO" else "insured_home"),
+        "carrier": get("carrier"),
+        "date_of_loss": get("date_of_loss"),
+        "estimated_amount": clean_amount(get("estimated_amount")),
+        "injuries_reported": any("medical" in k for k in texts),
+        "police_report": any("police" in k for k in texts),
+        "legal_involvement": any("legal" in k for k in texts),
+        "vehicle": vehicle,
+        "vin": vin,
+        "property_address": property_address.replace("\n", ", ").strip() if property_address else None,
+        "loss_type": loss_type.lower().strip() if loss_type else None
+    }
+
+# -------------------------------------------------
+# BENCHMARK
+# -------------------------------------------------
+
+def claims_per_sec(fn, folders, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        claim_documents._cached_document.cache_clear()
+        for folder in folders:
+            fn(folder)
+    return rounds * len(folders) / (time.perf_counter() - start)
+
+def main(rounds: int = 3):
+    folders = sorted(f for f in OCR_DIR.iterdir() if f.is_dir())
+    print(f"📦 {len(folders)} claim folders, {rounds} rounds\n")
+
+    def ocr_only(folder):
+        return extract_entities(folder, use_email=False)
+
+    mismatches = [
+        f.name for f in folders
+        if not legacy_extract_entities(f) == ocr_only(f) == extract_entities(f)
+    ]
+
+    before = claims_per_sec(legacy_extract_entities, folders, rounds)
+    ocr = claims_per_sec(ocr_only, folders, rounds)
+    after = claims_per_sec(extract_entities, folders, rounds)
+
+    print(f"before:       {before:>10.1f} claims/sec")
+    print(f"OCR scan:     {ocr:>10.1f} claims/sec  ({ocr / before:.1f}x)")
+    print(f"email first:  {after:>10.1f} claims/sec  ({after / before:.1f}x)")
+    print(f"\n{'✅' if not mismatches else '❌'} output mismatches: {len(mismatches)} {mismatches[:5]}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,372 @@
+# benchmarks/pipeline_suite.py
+#
+# Throughput of every pipeline stage on a synthetic corpus of N claims
+# (synthetic_data_generator, text-only: no PDFs / PNGs, OCR text written
+# directly). Each stage runs in its own process against the corpus
+# (CLAIMS_DATA_DIR) and reports claims/sec, p50/p99 latency per claim and
+# peak RSS.
+#
+# Every run is appended to history.json; with a baseline.json present the
+# run is compared against it and the exit code is 1 on a regression
+# (claims/sec down or p99 / peak RSS up by more than --threshold).
+#
+#   python benchmarks/pipeline_suite.py [--sizes=1000,10000,100000]
+#                                       [--threshold=0.2] [--save-baseline]
+
+from pathlib import Path
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASE_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BASE_DIR))
+
+CORPUS_DIR = BENCH_DIR / ".corpus"
+HISTORY_FILE = BENCH_DIR / "history.json"
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+
+DEFAULT_SIZES = [1000]
+DEFAULT_THRESHOLD = 0.2
+
+# corpus content depends only on (size, seed)
+CORPUS_SEED = 1234
+
+# single-query stages time at most this many claims
+SINGLE_QUERIES = 1000
+
+# -------------------------------------------------
+# STAGES (RUN INSIDE THE CORPUS PROCESS)
+# -------------------------------------------------
+# each returns (claims, seconds, per-claim latencies in seconds or None)
+
+def timed_each(items, fn):
+    latencies = []
+    results = []
+    start = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        results.append(fn(item))
+        latencies.append(time.perf_counter() - t)
+    return results, time.perf_counter() - start, latencies
+
+def ocr_folders():
+    import claim_documents
+    return sorted(f for f in claim_documents.OCR_DIR.iterdir() if f.is_dir())
+
+def write_log(name, kind, claim_ids, results):
+    import record_log
+    with record_log.open_log(name, writable=True) as log:
+        for claim_id, result in zip(claim_ids, results):
+            if result is None:
+                continue
+            if kind == "text":
+                log.put_text(claim_id, result)
+            else:
+                log.put_json(claim_id, result)
+
+def stage_tagging():
+    import file_tagger
+    folders = ocr_folders()
+    results, seconds, latencies = timed_each(folders, file_tagger.process_claim)
+    write_log(file_tagger.LOG_NAME, "json", [f.name for f in folders], results)
+    return len(folders), seconds, latencies
+
+def stage_entities():
+    import entity_extractor
+    folders = ocr_folders()
+    results, seconds, latencies = timed_each(folders, entity_extractor.process_claim)
+    write_log(entity_extractor.LOG_NAME, "json", [f.name for f in folders], results)
+    return len(folders), seconds, latencies
+
+def stage_duplicates():
+    import duplicate_detector
+    folders = ocr_folders()
+
+    start = time.perf_counter()
+    duplicate_detector.update_index(full_rebuild=True)
+    return len(folders), time.perf_counter() - start, None
+
+def stage_signals():
+    import record_log
+    import signal_detector
+    claim_ids = record_log.reader(signal_detector.ENTITIES_LOG).keys()
+    results, seconds, latencies = timed_each(claim_ids, signal_detector.process_claim)
+    write_log(signal_detector.LOG_NAME, "json", claim_ids, results)
+    return len(claim_ids), seconds, latencies
+
+def stage_signals_batch():
+    import record_log
+    import signal_detector
+    log = record_log.reader(signal_detector.ENTITIES_LOG)
+    records = [log.get_json(k) for k in log.keys()]
+
+    start = time.perf_counter()
+    signal_detector.detect_signals_many(records)
+    return len(records), time.perf_counter() - start, None
+
+def stage_feature_store():
+    import columnar_feature_store
+    import feature_store_builder
+    import record_log
+    claim_ids = record_log.reader(feature_store_builder.SIGNALS_LOG).keys()
+
+    rows, seconds, latencies = timed_each(claim_ids, feature_store_builder.build_claim_row)
+    start = time.perf_counter()
+    columnar_feature_store.write_feature_store([r for r in rows if r is not None])
+    return len(claim_ids), seconds + time.perf_counter() - start, latencies
+
+def stage_vector_store():
+    import columnar_feature_store
+    import semantic_store_builder
+    claims = len(columnar_feature_store.claim_ids())
+
+    start = time.perf_counter()
+    semantic_store_builder.build_vector_store()
+    return claims, time.perf_counter() - start, None
+
+def load_features():
+    from columnar_feature_store import read_features
+    return read_features()
+
+def stage_retrieval_single():
+    from semantic_retriever import get_store
+    store = get_store()
+    features = load_features()[:SINGLE_QUERIES]
+    store.state()  # load outside the timing
+
+    _, seconds, latencies = timed_each(features, store.find_similar_claims)
+    return len(features), seconds, latencies
+
+def stage_retrieval_batch():
+    from semantic_retriever import get_store
+    store = get_store()
+    features = load_features()
+    store.state()
+
+    start = time.perf_counter()
+    store.find_similar_claims_batch(features)
+    return len(features), time.perf_counter() - start, None
+
+def retrieved_matches(features):
+    from semantic_retriever import get_store
+    return [r["matches"] for r in get_store().find_similar_claims_batch(features)]
+
+def stage_decision():
+    from decision_engine import decide_claim
+    features = load_features()
+    matches = retrieved_matches(features)
+
+    _, seconds, latencies = timed_each(
+        list(zip(features, matches)), lambda fm: decide_claim(*fm)
+    )
+    return len(features), seconds, latencies
+
+def stage_decision_batch():
+    from decision_engine import decide_claims
+    features = load_features()
+    matches = retrieved_matches(features)
+
+    start = time.perf_counter()
+    decide_claims(features, matches)
+    return len(features), time.perf_counter() - start, None
+
+# in pipeline order: later stages read what earlier ones wrote
+STAGES = {
+    "tagging": stage_tagging,
+    "entities": stage_entities,
+    "duplicates": stage_duplicates,
+    "signals": stage_signals,
+    "signals_batch": stage_signals_batch,
+    "feature_store": stage_feature_store,
+    "vector_store": stage_vector_store,
+    "retrieval_single": stage_retrieval_single,
+    "retrieval_batch": stage_retrieval_batch,
+    "decision": stage_decision,
+    "decision_batch": stage_decision_batch,
+}
+
+def run_stage_here(name: str) -> dict:
+    claims, seconds, latencies = STAGES[name]()
+
+    result = {
+        "claims": claims,
+        "seconds": round(seconds, 4),
+        "claims_per_sec": round(claims / seconds, 1) if seconds > 0 else None,
+        "p50_ms": None,
+        "p99_ms": None,
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            / (1024 * 1024 if sys.platform == "darwin" else 1024), 1
+        ),
+    }
+    if latencies:
+        p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+        result["p50_ms"] = round(float(p50), 4)
+        result["p99_ms"] = round(float(p99), 4)
+    return result
+
+# -------------------------------------------------
+# CORPUS
+# -------------------------------------------------
+
+def corpus_dir(size: int) -> Path:
+    return CORPUS_DIR / f"claims-{size}-seed{CORPUS_SEED}"
+
+def build_corpus(size: int) -> Path:
+    data_dir = corpus_dir(size)
+    done = data_dir / ".complete"
+    if done.exists():
+        return data_dir
+
+    shutil.rmtree(data_dir, ignore_errors=True)
+    print(f"🏗️ generating {size} text-only claims in {data_dir}")
+
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(BASE_DIR / "synthetic_data_generator.py"), str(size),
+         "--text-only", f"--seed={CORPUS_SEED}"],
+        env={**os.environ, "CLAIMS_DATA_DIR": str(data_dir)},
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    done.write_text(f"{time.perf_counter() - start:.1f}s\n")
+    return data_dir
+
+def reset_outputs(data_dir: Path):
+    # everything but the corpus itself (raw + ocr) is rebuilt per run
+    for name in ("records", "feature_columns", "vector_store", "duplicates", ".pipeline"):
+        shutil.rmtree(data_dir / name, ignore_errors=True)
+
+# -------------------------------------------------
+# SUITE
+# -------------------------------------------------
+
+def run_stage(name: str, data_dir: Path) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, f"--stage={name}"],
+        env={**os.environ, "CLAIMS_DATA_DIR": str(data_dir)},
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    # the stage's own prints come first, the result is the last line
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def run_suite(sizes: list) -> dict:
+    results = {}
+
+    for size in sizes:
+        data_dir = build_corpus(size)
+        reset_outputs(data_dir)
+        print(f"\n📦 {size} claims")
+
+        for name in STAGES:
+            result = run_stage(name, data_dir)
+            results[f"{size}/{name}"] = result
+
+            latency = (
+                f"p50 {result['p50_ms']:.3f} ms  p99 {result['p99_ms']:.3f} ms"
+                if result["p50_ms"] is not None else ""
+            )
+            print(
+                f"  {name:<17} {result['claims_per_sec'] or 0:>12.1f} claims/sec  "
+                f"{result['peak_rss_mb']:>7.1f} MB  {latency}"
+            )
+
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+
+    for key, now in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+
+        checks = [
+            ("claims_per_sec", now["claims_per_sec"], before.get("claims_per_sec"), -1),
+            ("p99_ms", now["p99_ms"], before.get("p99_ms"), 1),
+            ("peak_rss_mb", now["peak_rss_mb"], before.get("peak_rss_mb"), 1),
+        ]
+        for metric, value, old, worse in checks:
+            if value is None or not old:
+                continue
+            change = (value - old) / old
+            if change * worse > threshold:
+                regressions.append(f"{key} {metric}: {old} -> {value} ({change:+.0%})")
+
+    return regressions
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def append_history(entry: dict):
+    history = json.loads(HISTORY_FILE.read_text()) if HISTORY_FILE.exists() else []
+    history.append(entry)
+    HISTORY_FILE.write_text(json.dumps(history, indent=2) + "\n")
+
+def main(sizes: list, threshold: float, save_baseline: bool) -> int:
+    results = run_suite(sizes)
+
+    append_history({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    })
+    print(f"\n📝 appended to {HISTORY_FILE.name}")
+
+    if save_baseline:
+        baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+        baseline.update(results)
+        BASELINE_FILE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"📌 baseline saved to {BASELINE_FILE.name}")
+        return 0
+
+    if not BASELINE_FILE.exists():
+        print("ℹ️ no baseline yet (run with --save-baseline)")
+        return 0
+
+    regressions = compare(results, json.loads(BASELINE_FILE.read_text()), threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regressions beyond {threshold:.0%}:")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+
+    print(f"\n✅ no regressions beyond {threshold:.0%}")
+    return 0
+
+# -------------------------------------------------
+# RUN
+# -------------------------------------------------
+
+if __name__ == "__main__":
+    options = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+
+    if "stage" in options:
+        print(json.dumps(run_stage_here(options["stage"])))
+        sys.exit(0)
+
+    sys.exit(main(
+        sizes=[int(s) for s in options["sizes"].split(",")] if "sizes" in options else DEFAULT_SIZES,
+        threshold=float(options.get("threshold", DEFAULT_THRESHOLD)),
+        save_baseline="--save-baseline" in sys.argv,
+    ))
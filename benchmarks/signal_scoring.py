@@ -0,0 +1,115 @@
+# benchmarks/signal_scoring.py
+#
+# signal_detector.detect_signals_batch vs the per-claim detect_signals.
+#
+# Equivalence is checked property-style: random entity dicts (amounts on
+# and around the tier thresholds, missing / empty / None fields, odd claim
+# and loss types) plus every record in the entities log must give the
+# same output on both paths. Then both are timed on a scaled-up table.
+#
+#   python benchmarks/signal_scoring.py [claims] [samples]
+
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import record_log
+from signal_detector import (
+    AMOUNT_TIERS,
+    ENTITIES_LOG,
+    batch_to_records,
+    detect_signals,
+    detect_signals_batch,
+    detect_signals_many,
+    entities_to_columns,
+    take_rows,
+)
+
+# scalar path is timed on this many rows and extrapolated
+SCALAR_ROWS = 100_000
+
+CLAIM_TYPES = ["AUTO", "HOME", "UNKNOWN", None, "auto"]
+LOSS_TYPES = ["fire", "water damage", "wind hail", "theft", "", None, "vehicle damage"]
+FLAGS = [True, False, None, 0, 1, "yes", ""]
+
+# -------------------------------------------------
+# RANDOM ENTITIES
+# -------------------------------------------------
+
+def random_amount(rng):
+    # around every tier threshold, plus the kinds of values the extractor emits
+    threshold = AMOUNT_TIERS[rng.integers(len(AMOUNT_TIERS))][0]
+    choice = rng.integers(5)
+    if choice == 0:
+        return None
+    if choice == 1:
+        return ""
+    if choice == 2:
+        return str(threshold + int(rng.integers(-1, 2)))
+    if choice == 3:
+        return int(rng.integers(0, 120_000))
+    return str(int(rng.integers(0, 120_000)))
+
+def random_entities(rng) -> dict:
+    entities = {
+        "claim_number": f"CLM-{int(rng.integers(1_000_000)):07d}" if rng.random() > 0.05 else None,
+        "claim_type": CLAIM_TYPES[rng.integers(len(CLAIM_TYPES))],
+        "injuries_reported": FLAGS[rng.integers(len(FLAGS))],
+        "police_report": FLAGS[rng.integers(len(FLAGS))],
+        "legal_involvement": FLAGS[rng.integers(len(FLAGS))],
+        "estimated_amount": random_amount(rng),
+        "loss_type": LOSS_TYPES[rng.integers(len(LOSS_TYPES))],
+    }
+    # some fields missing entirely
+    for name in list(entities):
+        if rng.random() < 0.03:
+            del entities[name]
+    return entities
+
+def log_entities() -> list:
+    log = record_log.reader(ENTITIES_LOG)
+    return [log.get_json(k) for k in log.keys()] if log is not None else []
+
+# -------------------------------------------------
+# BENCHMARK
+# -------------------------------------------------
+
+def main(claims: int = 1_000_000, samples: int = 50_000):
+    rng = np.random.default_rng(0)
+    records = [random_entities(rng) for _ in range(samples)] + log_entities()
+
+    expected = [detect_signals(e) for e in records]
+    mismatches = [i for i, (a, b) in enumerate(zip(expected, detect_signals_many(records))) if a != b]
+    print(f"{'✅' if not mismatches else '❌'} {len(records)} claims checked, {len(mismatches)} mismatches")
+    for i in mismatches[:5]:
+        print("   ", records[i], expected[i])
+
+    # -------- timing on a scaled-up table --------
+    rows = np.random.default_rng(1).integers(len(records), size=claims)
+    columns = take_rows(entities_to_columns(records), rows)
+    scalar_input = [records[i] for i in rows[:SCALAR_ROWS]]
+
+    start = time.perf_counter()
+    for entities in scalar_input:
+        detect_signals(entities)
+    scalar = (time.perf_counter() - start) * claims / len(scalar_input)
+
+    start = time.perf_counter()
+    batch = detect_signals_batch(columns)
+    vectorised = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_to_records(batch)
+    to_records = time.perf_counter() - start
+
+    print(f"\n📦 {claims} claims")
+    print(f"detect_signals (per claim): {scalar:>8.2f}s  (extrapolated from {len(scalar_input)})")
+    print(f"detect_signals_batch:       {vectorised:>8.2f}s  ({scalar / vectorised:.0f}x)")
+    print(f"  + batch_to_records:       {to_records:>8.2f}s")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,199 @@
+# claim_documents.py
+
+from pathlib import Path
+from functools import lru_cache
+import os
+import re
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+OCR_DIR = DATA_DIR / "ocr"
+
+COMBINED_NAME = "combined.txt"
+
+# parsed claim folders kept per process (stages of one claim run back to back)
+CACHE_SIZE = 256
+
+# -------------------------------------------------
+# OCR FRAMING
+# -------------------------------------------------
+# combined.txt = "\n".join(f"\n===== FILE: {source} =====\n{text}\n")
+# over the attachments sorted by name; {text} is byte-identical to the
+# per-file <stem>.txt and holds "--- PAGE n ---" blocks.
+
+FILE_HEADER = re.compile(r"^===== FILE: (.+?) =====$", re.M)
+PAGE_HEADER = re.compile(r"^--- PAGE (\d+) ---$", re.M)
+
+def render_pages(pages) -> str:
+    # pages: page texts in order, numbered from 1
+    return "\n".join(f"--- PAGE {n} ---\n{text}" for n, text in enumerate(pages, 1))
+
+def layout_lines(runs) -> str:
+    # runs: (x, y, text) of a page's text layer. Runs on the same baseline
+    # become one line, left to right (side-by-side columns such as
+    # PRODUCER / INSURED end up on one line); lines go top to bottom.
+    lines = {}
+    for x, y, text in runs:
+        lines.setdefault(round(y, 1), []).append((x, text))
+
+    return "\n".join(
+        " ".join(text for _, text in sorted(line, key=lambda r: r[0]))
+        for _, line in sorted(lines.items(), key=lambda kv: -kv[0])
+    )
+
+def file_section(source_name: str, text: str) -> str:
+    return f"\n===== FILE: {source_name} =====\n{text}\n"
+
+def render_combined(files) -> str:
+    # files: iterable of (source_name, text)
+    return "\n".join(file_section(name, text) for name, text in sorted(files))
+
+def parse_combined(text: str) -> list:
+    headers = list(FILE_HEADER.finditer(text))
+    sections = []
+
+    for i, h in enumerate(headers):
+        start = h.end() + 1
+        # text ends before "\n" (own trailing newline) + "\n" (join) + "\n"
+        # (next section's leading newline)
+        end = headers[i + 1].start() - 3 if i + 1 < len(headers) else len(text) - 1
+        sections.append((h.group(1), text[start:max(start, end)]))
+
+    return sections
+
+def split_pages(text: str) -> list:
+    headers = list(PAGE_HEADER.finditer(text))
+    if not headers:
+        return [(1, text)] if text else []
+
+    pages = []
+    for i, h in enumerate(headers):
+        end = headers[i + 1].start() - 1 if i + 1 < len(headers) else len(text)
+        pages.append((int(h.group(1)), text[h.end() + 1:max(h.end() + 1, end)]))
+    return pages
+
+def txt_name(source_name: str) -> str:
+    # Path(source_name).stem + ".txt", without the pathlib overhead
+    return os.path.splitext(os.path.basename(source_name))[0] + ".txt"
+
+# -------------------------------------------------
+# DOCUMENT
+# -------------------------------------------------
+
+class ClaimFile:
+    def __init__(self, source_name: str, text: str):
+        self.source_name = source_name     # ACORD25_CLM-AU0001.pdf
+        self.name = txt_name(source_name)  # ACORD25_CLM-AU0001.txt
+        self.text = text
+
+    def pages(self):
+        return iter(split_pages(self.text))
+
+
+class ClaimDocument:
+    """
+    One claim folder of OCR text, read once (on first use). Stages ask
+    it for file names, per-file texts, pages or the joined text instead
+    of each globbing and reading the folder again.
+    """
+
+    def __init__(self, folder: Path, txt_stats: tuple):
+        self.folder = folder
+        self.claim_id = folder.name
+        # (name, size, mtime_ns) of every *.txt in the folder, incl. combined.txt
+        self.txt_stats = {name: (size, mtime) for name, size, mtime in txt_stats}
+        self.txt_names = sorted(self.txt_stats)
+        self._files = None
+        self._combined = ""
+        self._full_text = None
+
+    def _read(self):
+        per_file = [n for n in self.txt_names if n != COMBINED_NAME]
+        files = None
+
+        if COMBINED_NAME in self.txt_names:
+            self._combined = (self.folder / COMBINED_NAME).read_text(errors="ignore")
+            sections = parse_combined(self._combined)
+
+            # one read is enough when combined.txt covers exactly the per-file texts
+            if self._combined_is_current(sections, per_file):
+                files = [ClaimFile(name, text) for name, text in sections]
+
+        if files is None:
+            files = [
+                ClaimFile(name, (self.folder / name).read_text(errors="ignore"))
+                for name in per_file
+            ]
+
+        self._files = files
+
+    def _combined_is_current(self, sections: list, per_file: list) -> bool:
+        # a per-file text edited or re-extracted after combined.txt was
+        # written changes its size or is newer -> read the files instead
+        if sorted(txt_name(name) for name, _ in sections) != per_file:
+            return False
+
+        combined_mtime = self.txt_stats[COMBINED_NAME][1]
+        for name, text in sections:
+            size, mtime = self.txt_stats[txt_name(name)]
+            if mtime > combined_mtime or size != len(text.encode()):
+                return False
+        return True
+
+    @property
+    def files(self) -> list:
+        # ClaimFile per attachment, sorted by source name
+        if self._files is None:
+            self._read()
+        return self._files
+
+    @property
+    def combined(self) -> str:
+        # combined.txt as on disk ("" if absent)
+        if self._files is None:
+            self._read()
+        return self._combined
+
+    def texts(self, include_combined: bool = False) -> dict:
+        texts = {f.name: f.text for f in self.files}
+        if include_combined and COMBINED_NAME in self.txt_names:
+            texts[COMBINED_NAME] = self.combined
+        return texts
+
+    def full_text(self) -> str:
+        # per-file texts only: combined.txt would repeat all of them
+        if self._full_text is None:
+            self._full_text = "\n".join(f.text for f in self.files)
+        return self._full_text
+
+    def iter_pages(self):
+        for f in self.files:
+            for number, text in f.pages():
+                yield f, number, text
+
+# -------------------------------------------------
+# LOADING
+# -------------------------------------------------
+
+def txt_stats(folder) -> tuple:
+    # (name, size, mtime_ns) of every *.txt, sorted by name
+    stats = []
+    with os.scandir(folder) as entries:
+        for e in entries:
+            if e.name.endswith(".txt") and e.is_file():
+                st = e.stat()
+                stats.append((e.name, st.st_size, st.st_mtime_ns))
+    return tuple(sorted(stats))
+
+def read_claim_document(folder: Path) -> ClaimDocument:
+    folder = Path(folder)
+    return ClaimDocument(folder, txt_stats(folder))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_document(folder: str, stamp: tuple) -> ClaimDocument:
+    return ClaimDocument(Path(folder), stamp)
+
+def load_claim_document(folder: Path) -> ClaimDocument:
+    # any text file added, removed or rewritten (in place too) changes
+    # the stats and misses the cache
+    return _cached_document(str(folder), txt_stats(folder))
@@ -0,0 +1,357 @@
+# columnar_feature_store.py
+#
+# Feature store as typed NumPy columns, one bulk .npz per claim_type
+# partition, instead of one JSON file per claim:
+#
+#   data/feature_columns/claim_type=AUTO.npz
+#   data/feature_columns/claim_type=HOME.npz
+#   data/feature_columns/claim_type=__null__.npz   (claims without a type)
+#
+# Members per column (n = rows in the partition):
+#   bool / int     <col>                       shape (n,)
+#   str            <col>, <col>.null           fixed-width unicode (n,) + None mask
+#   category       <col>.codes, <col>.categories, <col>.null    (None -> code -1)
+#   str_list       <col>.codes, <col>.categories, <col>.offsets (n + 1)
+#
+# np.load() reads members on access, so a projection only touches the
+# columns it asks for; claim_type filters skip whole partitions.
+
+from pathlib import Path
+import json
+import os
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+STORE_DIR = DATA_DIR / "feature_columns"
+LEGACY_DIR = DATA_DIR / "feature_store"
+
+PARTITION_COLUMN = "claim_type"
+
+# file name key of the partition holding claim_type None
+NULL_PARTITION = "__null__"
+
+# claim folder name; the key for incremental updates, not a feature
+INDEX_COLUMN = "claim_id"
+
+# feature columns in legacy JSON key order
+SCHEMA = {
+    "claim_number": "str",
+    "claim_type": "category",
+    "has_medical": "bool",
+    "has_police": "bool",
+    "has_legal": "bool",
+    "num_attachments": "int",
+    "num_photos": "int",
+    "severity": "category",
+    "severity_score": "int",
+    "signals": "str_list",
+    "files_present": "str_list",
+    "carrier": "str",
+    "date_of_loss": "str",
+}
+
+FEATURE_COLUMNS = list(SCHEMA)
+
+# keys of the legacy per-claim JSON: the retrieval filter columns are
+# not exported, so the format stays what feature_store_builder wrote
+LEGACY_COLUMNS = [name for name in FEATURE_COLUMNS if name not in ("carrier", "date_of_loss")]
+
+COLUMN_TYPES = {INDEX_COLUMN: "str", **SCHEMA}
+
+# -------------------------------------------------
+# ENCODING
+# -------------------------------------------------
+
+def encode_column(name: str, kind: str, values: list) -> dict:
+    if kind == "bool":
+        return {name: np.array(values, dtype=bool)}
+
+    if kind == "int":
+        return {name: np.array(values, dtype=np.int32)}
+
+    if kind == "str":
+        return {
+            name: np.array([v if v is not None else "" for v in values], dtype=str),
+            f"{name}.null": np.array([v is None for v in values], dtype=bool),
+        }
+
+    if kind == "category":
+        categories = sorted({str(v) for v in values if v is not None})
+        lookup = {c: i for i, c in enumerate(categories)}
+        return {
+            f"{name}.codes": np.array([lookup[str(v)] if v is not None else -1 for v in values], dtype=np.int16),
+            f"{name}.categories": np.array(categories, dtype=str),
+            f"{name}.null": np.array([v is None for v in values], dtype=bool),
+        }
+
+    if kind == "str_list":
+        categories = sorted({v for items in values for v in items})
+        lookup = {c: i for i, c in enumerate(categories)}
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(items) for items in values])
+        return {
+            f"{name}.codes": np.array([lookup[v] for items in values for v in items], dtype=np.int16),
+            f"{name}.categories": np.array(categories, dtype=str),
+            f"{name}.offsets": offsets,
+        }
+
+    raise ValueError(f"Unknown column type {kind!r} for {name}")
+
+def has_column(npz, name: str, kind: str) -> bool:
+    member = name if kind in ("bool", "int", "str") else f"{name}.codes"
+    return member in npz.files
+
+def decode_column(npz, name: str, kind: str, rows=None):
+    # rows: index array / slice of the rows to keep (None = all)
+    rows = slice(None) if rows is None else rows
+
+    # partition written before the column was added to SCHEMA -> all None
+    if not has_column(npz, name, kind):
+        n = len(np.arange(len(npz[INDEX_COLUMN]))[rows])
+        return [None] * n if kind == "str_list" else np.full(n, None, dtype=object)
+
+    if kind in ("bool", "int"):
+        return npz[name][rows]
+
+    if kind == "str":
+        column = npz[name][rows]
+        null = npz[f"{name}.null"][rows]
+        if null.any():
+            column = column.astype(object)
+            column[null] = None
+        return column
+
+    categories = npz[f"{name}.categories"]
+    codes = npz[f"{name}.codes"]
+
+    if kind == "category":
+        codes = codes[rows]
+        # partitions written before the .null mask have no None values
+        null = npz[f"{name}.null"][rows] if f"{name}.null" in npz.files else None
+        if null is None or not null.any():
+            return categories[codes]
+        column = np.full(len(codes), None, dtype=object)
+        column[~null] = categories[codes[~null]]
+        return column
+
+    offsets = npz[f"{name}.offsets"]
+    starts, ends = offsets[:-1][rows], offsets[1:][rows]
+    return [categories[codes[s:e]].tolist() for s, e in zip(starts, ends)]
+
+# -------------------------------------------------
+# PREDICATES
+# -------------------------------------------------
+# filters: [(column, op, value), ...], all must hold (AND), e.g.
+#   [("claim_type", "==", "AUTO"), ("severity_score", ">=", 60),
+#    ("signals", "contains", "LEGAL_INVOLVEMENT")]
+
+OPS = {
+    "==": np.equal,
+    "!=": np.not_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+def column_mask(npz, name: str, kind: str, op: str, value, n: int) -> np.ndarray:
+    if kind == "str_list":
+        if op != "contains":
+            raise ValueError(f"{name} is a list column: only 'contains' is supported")
+
+        categories = npz[f"{name}.categories"].tolist()
+        mask = np.zeros(n, dtype=bool)
+        if value not in categories:
+            return mask
+
+        codes = npz[f"{name}.codes"]
+        offsets = npz[f"{name}.offsets"]
+        owner = np.repeat(np.arange(n), np.diff(offsets))
+        mask[owner[codes == categories.index(value)]] = True
+        return mask
+
+    if kind == "category":
+        # compare on the small codes array, not decoded strings
+        categories = npz[f"{name}.categories"].tolist()
+        codes = npz[f"{name}.codes"]
+
+        if op == "in":
+            wanted = [categories.index(v) for v in value if v in categories]
+            return np.isin(codes, wanted)
+        if op in ("==", "!=") and value not in categories:
+            return np.full(n, op == "!=")
+        if op in ("==", "!="):
+            return OPS[op](codes, categories.index(value))
+
+    column = decode_column(npz, name, kind)
+
+    if op == "in":
+        return np.isin(column, list(value))
+    if op not in OPS:
+        raise ValueError(f"Unknown filter op {op!r}")
+    return OPS[op](column, value)
+
+def partition_matches(claim_type: str, filters) -> bool:
+    # prune partitions on claim_type without opening them
+    for name, op, value in filters:
+        if name != PARTITION_COLUMN:
+            continue
+        if op == "==" and claim_type != value:
+            return False
+        if op == "!=" and claim_type == value:
+            return False
+        if op == "in" and claim_type not in value:
+            return False
+    return True
+
+# -------------------------------------------------
+# WRITE
+# -------------------------------------------------
+
+def partition_file(claim_type: str, store_dir: Path = STORE_DIR) -> Path:
+    key = NULL_PARTITION if claim_type is None else claim_type
+    return Path(store_dir) / f"{PARTITION_COLUMN}={key}.npz"
+
+def partition_files(store_dir: Path = STORE_DIR) -> dict:
+    store_dir = Path(store_dir)
+    if not store_dir.exists():
+        return {}
+    partitions = {}
+    for p in sorted(store_dir.glob(f"{PARTITION_COLUMN}=*.npz")):
+        key = p.stem.split("=", 1)[1]
+        partitions[None if key == NULL_PARTITION else key] = p
+    return partitions
+
+def store_version(store_dir: Path = STORE_DIR) -> tuple:
+    # changes whenever a partition is rewritten, added or dropped (stat only)
+    return tuple(
+        (claim_type, path.stat().st_mtime_ns, path.stat().st_size)
+        for claim_type, path in partition_files(store_dir).items()
+    )
+
+def write_partition(path: Path, rows: list):
+    arrays = {}
+    for name, kind in COLUMN_TYPES.items():
+        arrays.update(encode_column(name, kind, [row[name] for row in rows]))
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+def write_feature_store(rows: list, store_dir: Path = STORE_DIR) -> dict:
+    """
+    rows: feature dicts plus INDEX_COLUMN. Rewrites every partition and
+    drops partitions that no longer have rows. Returns {claim_type: rows}.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    partitions = {}
+    for row in rows:
+        partitions.setdefault(row[PARTITION_COLUMN], []).append(row)
+
+    for claim_type, part in partitions.items():
+        part.sort(key=lambda r: r[INDEX_COLUMN])
+        write_partition(partition_file(claim_type, store_dir), part)
+
+    for claim_type, path in partition_files(store_dir).items():
+        if claim_type not in partitions:
+            path.unlink()
+
+    return {claim_type: len(part) for claim_type, part in partitions.items()}
+
+# -------------------------------------------------
+# READ
+# -------------------------------------------------
+
+def read_columns(columns=None, filters=None, store_dir: Path = STORE_DIR) -> dict:
+    """
+    {column: values} over all partitions, rows in (claim_type, claim_id)
+    order. bool/int/str/category columns come back as NumPy arrays,
+    list columns as lists of lists.
+    """
+    columns = list(columns or FEATURE_COLUMNS)
+    filters = list(filters or [])
+
+    for name in columns + [f[0] for f in filters]:
+        if name not in COLUMN_TYPES:
+            raise KeyError(f"Unknown feature column {name!r}")
+
+    out = {name: [] for name in columns}
+
+    for claim_type, path in partition_files(store_dir).items():
+        if not partition_matches(claim_type, filters):
+            continue
+
+        with np.load(path, allow_pickle=False) as npz:
+            n = len(npz[INDEX_COLUMN])
+
+            rows = None
+            if filters:
+                mask = np.ones(n, dtype=bool)
+                for name, op, value in filters:
+                    mask &= column_mask(npz, name, COLUMN_TYPES[name], op, value, n)
+                rows = np.flatnonzero(mask)
+                if not len(rows):
+                    continue
+
+            for name in columns:
+                out[name].append(decode_column(npz, name, COLUMN_TYPES[name], rows))
+
+    result = {}
+    for name in columns:
+        parts = out[name]
+        if COLUMN_TYPES[name] == "str_list":
+            result[name] = [items for part in parts for items in part]
+        else:
+            result[name] = np.concatenate(parts) if parts else np.array([])
+    return result
+
+def read_features(columns=None, filters=None, store_dir: Path = STORE_DIR) -> list:
+    # feature dicts with plain Python values (same shape as the legacy JSON)
+    data = read_columns(columns, filters, store_dir)
+    names = list(data)
+    values = [
+        data[name] if isinstance(data[name], list) else data[name].tolist()
+        for name in names
+    ]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+def get_feature(claim_id: str, store_dir: Path = STORE_DIR, claim_type: str = None):
+    # claim_type (when known) prunes the lookup to one partition
+    filters = [(INDEX_COLUMN, "==", claim_id)]
+    if claim_type is not None:
+        filters.append((PARTITION_COLUMN, "==", claim_type))
+
+    rows = read_features(filters=filters, store_dir=store_dir)
+    return rows[0] if rows else None
+
+def claim_ids(filters=None, store_dir: Path = STORE_DIR) -> list:
+    return read_columns([INDEX_COLUMN], filters, store_dir)[INDEX_COLUMN].tolist()
+
+def load_rows(store_dir: Path = STORE_DIR) -> dict:
+    # {claim_id: row incl. INDEX_COLUMN}, for incremental rewrites
+    return {
+        row[INDEX_COLUMN]: row
+        for row in read_features(list(COLUMN_TYPES), store_dir=store_dir)
+    }
+
+# -------------------------------------------------
+# LEGACY EXPORT
+# -------------------------------------------------
+
+def export_json(out_dir: Path = LEGACY_DIR, store_dir: Path = STORE_DIR) -> int:
+    # data/feature_store/<claim_id>.json, as feature_store_builder used to write
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = read_features([INDEX_COLUMN] + LEGACY_COLUMNS, store_dir=store_dir)
+    for row in rows:
+        claim_id = row.pop(INDEX_COLUMN)
+        with open(out_dir / f"{claim_id}.json", "w") as f:
+            json.dump(row, f, indent=2)
+
+    return len(rows)
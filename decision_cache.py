@@ -0,0 +1,193 @@
+# decision_cache.py
+#
+# LRU + TTL cache in front of retrieval + decision. Claims with the same
+# encoded vector (same type, severity, flags, signals, ...) get the same
+# similar claims and the same decision, so they are scored once:
+#
+#   key = (vector store generation, rules digest, top_k, retrieval filters,
+#          sha1(encoder key + rule-tested fields))
+#
+# The cache is emptied as soon as a new store generation is served or the
+# rules config is edited.
+
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+
+import rule_engine
+from decision_engine import decide_claims
+from semantic_retriever import get_store, normalize_filters
+
+MAX_ENTRIES = 10000
+TTL_SECONDS = 3600
+
+# up to this many misses are retrieved one by one through the ANN /
+# partition index (app, /score); larger batches take the exact batch scan
+SINGLE_QUERY_MAX = 4
+
+# facts decide_claims derives from the retrieval itself, not the feature
+RETRIEVAL_FIELDS = {"max_similarity", "num_matches"}
+
+# -------------------------------------------------
+# FINGERPRINT
+# -------------------------------------------------
+
+def feature_fingerprint(feature: dict, encoder, rule_fields=()) -> str:
+    h = hashlib.sha1(repr(encoder.key(feature)).encode())
+    for field in sorted(rule_fields):
+        # rules may test fields the retrieval text does not carry
+        h.update(b"\0" + field.encode() + b"=" + json.dumps(feature.get(field), sort_keys=True).encode())
+    return h.hexdigest()
+
+# -------------------------------------------------
+# CACHE
+# -------------------------------------------------
+
+class DecisionCache:
+    """
+    score(claims) -> [{"retrieval": ..., "decision": ...}], same as the
+    uncached path: misses go through find_similar_claims() when there are
+    at most SINGLE_QUERY_MAX of them, else find_similar_claims_batch().
+    Cached results are shared between callers: treat them as read-only.
+    """
+
+    def __init__(self, store=None, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        self.store = store or get_store()
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._scope = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ---------------- LOOKUP ----------------
+
+    def _get(self, key, now: float):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored_at, result = entry
+        if now - stored_at > self.ttl:
+            del self._entries[key]
+            self.expired += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return result
+
+    def _put(self, key, result, now: float):
+        self._entries[key] = (now, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _check_scope(self, scope):
+        # store rebuilt or rules edited -> nothing cached is valid any more
+        if scope != self._scope:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._scope = scope
+
+    # ---------------- SCORING ----------------
+
+    def score(self, claims: list, top_k: int = 3, filters=None, same_claim_type: bool = True) -> list:
+        state = self.store.state()
+        generation = state["version"]
+        rules = rule_engine.load_rules()
+        rule_fields = rules.fields - RETRIEVAL_FIELDS
+        scope = (generation, rules.digest)
+
+        # the claim type is part of the encoder key, so the default
+        # same-type filter needs no extra key component
+        options = (normalize_filters(filters), same_claim_type)
+        keys = [(top_k, options, feature_fingerprint(c, state["encoder"], rule_fields)) for c in claims]
+        results = [None] * len(claims)
+        todo = {}
+
+        now = time.monotonic()
+        with self._lock:
+            self._check_scope(scope)
+            for i, key in enumerate(keys):
+                results[i] = self._get(key, now)
+                if results[i] is None:
+                    # identical claims in one batch are scored once
+                    todo.setdefault(key, []).append(i)
+
+            self.hits += len(claims) - len(todo)
+            self.misses += len(todo)
+
+        if todo:
+            first = [rows[0] for rows in todo.values()]
+            batch = [claims[i] for i in first]
+
+            if len(batch) <= SINGLE_QUERY_MAX:
+                retrievals = [
+                    self.store.find_similar_claims(claim, top_k, filters, same_claim_type)
+                    for claim in batch
+                ]
+            else:
+                retrievals = self.store.find_similar_claims_batch(batch, top_k, filters, same_claim_type)
+            decisions = decide_claims(batch, [r["matches"] for r in retrievals])
+
+            now = time.monotonic()
+            with self._lock:
+                for (key, rows), retrieval, decision in zip(todo.items(), retrievals, decisions):
+                    result = {"retrieval": retrieval, "decision": decision}
+                    if self._scope == scope:
+                        self._put(key, result, now)
+                    for i in rows:
+                        results[i] = result
+
+        return results
+
+    def score_claim(self, claim: dict, top_k: int = 3, filters=None, same_claim_type: bool = True) -> dict:
+        return self.score([claim], top_k, filters, same_claim_type)[0]
+
+    # ---------------- MAINTENANCE ----------------
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "generation": self._scope[0] if self._scope else None,
+            "rules_digest": self._scope[1] if self._scope else None,
+        }
+
+# -------------------------------------------------
+# MODULE-LEVEL API
+# -------------------------------------------------
+
+_cache = DecisionCache()
+
+
+def get_cache() -> DecisionCache:
+    return _cache
+
+
+def score_claims(claims: list, top_k: int = 3, filters=None, same_claim_type: bool = True) -> list:
+    return _cache.score(claims, top_k, filters, same_claim_type)
+
+
+def score_claim(claim: dict, top_k: int = 3, filters=None, same_claim_type: bool = True) -> dict:
+    return _cache.score_claim(claim, top_k, filters, same_claim_type)
@@ -1,6 +1,34 @@
 # decision_engine.py
+#
+# AUTO_APPROVE / MANUAL_REVIEW / ESCALATE / LLM_JUDGE from the rules in
+# decision_rules.json (see rule_engine.py). Every decision records the
+# rule that fired and the rules version.
 from typing import Dict, List
 
+import rule_engine
+
+
+def claim_facts(current_claim: Dict, similar_claims: List[Dict]) -> Dict:
+    # fields the rules can test: the feature dict plus retrieval summary
+    return {
+        **current_claim,
+        "num_matches": len(similar_claims),
+        "max_similarity": (
+            max(c["similarity_score"] for c in similar_claims)
+            if similar_claims else None
+        ),
+    }
+
+
+def decision_result(rule: Dict, max_similarity, version: str) -> Dict:
+    result = {"decision": rule["decision"]}
+    if max_similarity is not None:
+        result["max_similarity"] = round(max_similarity, 3)
+    result["reason"] = rule["reason"]
+    result["rule_id"] = rule["id"]
+    result["rules_version"] = version
+    return result
+
 
 def decide_claim(
     current_claim: Dict,
@@ -10,51 +38,26 @@ def decide_claim(
     Rule-based decision engine.
     LLM is NOT used here.
     """
+    table = rule_engine.load_rules()
+    facts = claim_facts(current_claim, similar_claims)
 
-    # -----------------------------
-    # SAFETY CHECK
-    # -----------------------------
-    if not similar_claims:
-        return {
-            "decision": "MANUAL_REVIEW",
-            "reason": "No similar claims found"
-        }
-
-    # -----------------------------
-    # EXTRACT SIGNALS
-    # -----------------------------
-    max_similarity = max(c["similarity_score"] for c in similar_claims)
-
-    severity = current_claim.get("severity")
-    has_medical = current_claim.get("has_medical", False)
-    has_legal = current_claim.get("has_legal", False)
-
-    # -----------------------------
-    # DECISION RULES
-    # -----------------------------
-    if (
-        max_similarity >= 0.95
-        and severity == "LOW"
-        and not has_medical
-        and not has_legal
-    ):
-        decision = "AUTO_APPROVE"
-        reason = "Highly similar to historical low-risk claims"
-
-    elif max_similarity >= 0.75:
-        decision = "MANUAL_REVIEW"
-        reason = "Moderate similarity to past claims"
-
-    elif severity == "HIGH" or has_medical or has_legal:
-        decision = "ESCALATE"
-        reason = "High severity or legal/medical involvement"
-
-    else:
-        decision = "LLM_JUDGE"
-        reason = "Unclear pattern, requires semantic judgment"
+    return decision_result(table.decide(facts), facts["max_similarity"], table.version)
 
-    return {
-        "decision": decision,
-        "max_similarity": round(max_similarity, 3),
-        "reason": reason
-    }
\ No newline at end of file
+
+def decide_claims(
+    claims: List[Dict],
+    similar_claims: List[List[Dict]]
+) -> List[Dict]:
+    """
+    Same output as decide_claim() per claim, evaluated as one vectorised
+    pass over the whole batch (one mask per rule).
+    """
+    table = rule_engine.load_rules()
+    facts = [claim_facts(c, s) for c, s in zip(claims, similar_claims)]
+
+    fired = table.decide_batch(rule_engine.Columns(facts))
+
+    return [
+        decision_result(table.rules[i], f["max_similarity"], table.version)
+        for f, i in zip(facts, fired.tolist())
+    ]
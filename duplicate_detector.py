@@ -0,0 +1,370 @@
+# duplicate_detector.py
+#
+# Near-duplicate OCR documents across claims (the same claim submitted
+# twice, a repair estimate recycled into another claim) without comparing
+# every pair:
+#
+#   data/ocr/<claim>/<stem>.txt  -> word shingles -> MinHash signature
+#   signature                    -> BANDS band keys (LSH buckets)
+#
+# Documents sharing a bucket are candidates; a candidate is a duplicate
+# when its signatures agree on at least DUPLICATE_THRESHOLD of the
+# permutations (estimated Jaccard similarity of the shingle sets). A
+# lookup costs BANDS binary searches, not a pass over the corpus.
+#
+# Signatures are kept in data/duplicates/signatures.npz with the hash of
+# the text they came from, so a run only re-signs new / changed files.
+# Output: data/records/duplicates.log, one record per claim that has
+# duplicates (read by signal_detector as DUPLICATE_SUBMISSION).
+#
+#   python duplicate_detector.py [workers] [--full]
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+import re
+import sys
+import time
+import zlib
+
+import numpy as np
+
+import record_log
+import stage_manifest
+from claim_documents import COMBINED_NAME, OCR_DIR, PAGE_HEADER
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+DUPLICATES_DIR = DATA_DIR / "duplicates"
+SIGNATURE_FILE = DUPLICATES_DIR / "signatures.npz"
+
+# output: data/records/duplicates.log, one record per claim id
+LOG_NAME = "duplicates"
+
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+
+# BANDS x ROWS = NUM_PERM; a pair with Jaccard s becomes a candidate with
+# probability 1 - (1 - s^ROWS)^BANDS (s=0.8: 0.95, s=0.5: 0.06)
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+DUPLICATE_THRESHOLD = 0.8
+
+# shorter texts (image placeholders, empty pages) are not indexed:
+# they would all look alike
+MIN_SHINGLES = 8
+
+# matches kept per claim record, most similar first
+MAX_MATCHES = 20
+
+# documents handed to a worker in one task
+CHUNK_SIZE = 256
+
+SEED = 1
+
+WORD = re.compile(r"\w+")
+# a recycled document keeps its text but may carry the new claim number
+CLAIM_NUMBER = re.compile(r"CLM-[A-Z]{2}\d+")
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+SHINGLE_BASE = np.uint64(1000003)
+
+# hash permutations (a * x + b) mod p: a, b < 2^32 keep a * x + b in uint64
+_rng = np.random.default_rng(SEED)
+PERM_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+# -------------------------------------------------
+# SIGNATURES
+# -------------------------------------------------
+
+def shingles(text: str) -> np.ndarray:
+    # unique 32-bit hashes of the SHINGLE_WORDS-word windows
+    text = CLAIM_NUMBER.sub("claimno", PAGE_HEADER.sub("", text)).lower()
+    words = np.array([zlib.crc32(w.encode()) for w in WORD.findall(text)], dtype=np.uint64)
+    if len(words) == 0:
+        return words
+
+    width = min(SHINGLE_WORDS, len(words))
+    n = len(words) - width + 1
+
+    hashes = np.zeros(n, dtype=np.uint64)
+    for j in range(width):
+        hashes = hashes * SHINGLE_BASE + words[j:j + n]
+    return np.unique(hashes & MAX_HASH)
+
+def minhash(hashes: np.ndarray) -> np.ndarray:
+    # (NUM_PERM,) uint32: per permutation the smallest permuted shingle
+    permuted = (np.outer(PERM_A, hashes) + PERM_B[:, None]) % MERSENNE_PRIME & MAX_HASH
+    return permuted.min(axis=1).astype(np.uint32)
+
+def sign_chunk(texts: list):
+    # -> signatures (n, NUM_PERM) uint32, indexed (n,) bool
+    signatures = np.full((len(texts), NUM_PERM), MAX_HASH, dtype=np.uint32)
+    indexed = np.zeros(len(texts), dtype=bool)
+
+    for i, text in enumerate(texts):
+        hashes = shingles(text)
+        if len(hashes) >= MIN_SHINGLES:
+            signatures[i] = minhash(hashes)
+            indexed[i] = True
+
+    return signatures, indexed
+
+def text_hash(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+# -------------------------------------------------
+# LSH INDEX
+# -------------------------------------------------
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    # (n, BANDS) uint64: one hash of the ROWS values of every band
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    keys = np.zeros(bands.shape[:2], dtype=np.uint64)
+    for j in range(ROWS):
+        keys = keys * SHINGLE_BASE + bands[:, :, j]
+    return keys
+
+
+class LSHIndex:
+    """
+    Band keys of the indexed documents, sorted per band: the bucket of a
+    key is one np.searchsorted range.
+    """
+
+    def __init__(self, signatures: np.ndarray, indexed: np.ndarray):
+        self.signatures = signatures
+        self.rows = np.flatnonzero(indexed)
+
+        keys = band_keys(signatures[self.rows])
+        self.order = np.argsort(keys, axis=0, kind="stable")
+        self.sorted = np.take_along_axis(keys, self.order, axis=0)
+
+    def candidates(self, queries: np.ndarray) -> tuple:
+        # (query positions, document rows) sharing at least one bucket
+        keys = band_keys(self.signatures[queries])
+        pairs = []
+
+        for band in range(BANDS):
+            lo = np.searchsorted(self.sorted[:, band], keys[:, band], "left")
+            hi = np.searchsorted(self.sorted[:, band], keys[:, band], "right")
+            sizes = hi - lo
+
+            q = np.repeat(np.arange(len(queries)), sizes)
+            # lo[q] .. hi[q] - 1 for every query, flattened
+            pos = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes) + np.repeat(lo, sizes)
+            pairs.append(q * len(self.signatures) + self.rows[self.order[pos, band]])
+
+        unique = np.unique(np.concatenate(pairs)) if pairs else np.empty(0, dtype=np.int64)
+        return unique // len(self.signatures), unique % len(self.signatures)
+
+    def duplicates(self, queries: np.ndarray, threshold: float = DUPLICATE_THRESHOLD) -> tuple:
+        # (query rows, document rows, similarity) of verified candidates
+        q, docs = self.candidates(queries)
+        rows = queries[q]
+        keep = rows != docs
+
+        rows, docs = rows[keep], docs[keep]
+        similarity = (self.signatures[rows] == self.signatures[docs]).mean(axis=1)
+
+        ok = similarity >= threshold
+        return rows[ok], docs[ok], similarity[ok]
+
+# -------------------------------------------------
+# PERSISTENCE
+# -------------------------------------------------
+
+def empty_signatures() -> dict:
+    return {
+        "doc": np.array([], dtype=str),
+        "text_hash": np.array([], dtype=np.uint64),
+        "signature": np.zeros((0, NUM_PERM), dtype=np.uint32),
+        "indexed": np.array([], dtype=bool),
+    }
+
+def load_signatures(version: str) -> dict:
+    # signatures of another code version are re-computed
+    if not SIGNATURE_FILE.exists():
+        return empty_signatures()
+    with np.load(SIGNATURE_FILE) as npz:
+        if str(npz["version"]) != version:
+            return empty_signatures()
+        return {name: npz[name] for name in ("doc", "text_hash", "signature", "indexed")}
+
+def save_signatures(data: dict, version: str):
+    DUPLICATES_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = SIGNATURE_FILE.with_name(SIGNATURE_FILE.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, version=np.array(version), **data)
+    os.replace(tmp, SIGNATURE_FILE)
+
+def claim_of(doc: str) -> str:
+    return doc.split("/", 1)[0]
+
+# -------------------------------------------------
+# UPDATE (INCREMENTAL)
+# -------------------------------------------------
+
+def scan_documents() -> dict:
+    # "<claim>/<stem>.txt" -> bytes, every per-file text (not combined.txt)
+    docs = {}
+    if not OCR_DIR.exists():
+        return docs
+
+    for folder in sorted(f for f in OCR_DIR.iterdir() if f.is_dir()):
+        for path in sorted(folder.glob("*.txt")):
+            if path.name != COMBINED_NAME:
+                docs[f"{folder.name}/{path.name}"] = path.read_bytes()
+    return docs
+
+def claim_records(docs: np.ndarray, rows, others, similarity) -> dict:
+    # verified pairs -> {claim: duplicates record}
+    records = {}
+    for row, other, sim in sorted(zip(rows.tolist(), others.tolist(), similarity.tolist()), key=lambda p: -p[2]):
+        claim_id, _, document = docs[row].partition("/")
+        match_claim, _, match_document = docs[other].partition("/")
+
+        matches = records.setdefault(claim_id, [])
+        if len(matches) < MAX_MATCHES:
+            matches.append({
+                "claim_id": match_claim,
+                "document": document,
+                "matched_document": match_document,
+                "similarity": round(sim, 3),
+            })
+
+    return {
+        claim_id: {
+            "duplicate_of": sorted({m["claim_id"] for m in matches}),
+            "max_similarity": matches[0]["similarity"],
+            "matches": matches,
+        }
+        for claim_id, matches in records.items()
+    }
+
+def update_index(workers: int = None, full_rebuild: bool = False, executor=None) -> dict:
+    """
+    Signs every new or changed OCR text (in a worker pool), drops the
+    ones that vanished and rewrites the duplicates records of the claims
+    whose matches can have changed: the claims with changed texts, their
+    previous matches (from their old records) and their new matches.
+    """
+    start = time.perf_counter()
+    version = stage_manifest.code_version(sys.modules[__name__])
+
+    old = empty_signatures() if full_rebuild else load_signatures(version)
+    old_rows = {doc: i for i, doc in enumerate(old["doc"].tolist())}
+
+    # -------- what changed since the last run --------
+    current = scan_documents()
+
+    keep = []
+    todo = []
+    hashes = {}
+
+    for doc, data in current.items():
+        hashes[doc] = text_hash(data)
+        row = old_rows.get(doc)
+        if row is not None and int(old["text_hash"][row]) == hashes[doc]:
+            keep.append(row)
+        else:
+            todo.append(doc)
+
+    removed = set(old_rows) - set(current)
+    changed_claims = {claim_of(doc) for doc in todo} | {claim_of(doc) for doc in removed}
+
+    print(f"▶️ duplicates: {len(todo)} new/changed documents, {len(removed)} removed")
+
+    # -------- sign the delta --------
+    texts = [current[doc].decode("utf-8", errors="ignore") for doc in todo]
+    chunks = [texts[i:i + CHUNK_SIZE] for i in range(0, len(texts), CHUNK_SIZE)]
+
+    own_executor = executor is None and len(chunks) > 1
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+
+    try:
+        results = list(executor.map(sign_chunk, chunks)) if executor else [sign_chunk(c) for c in chunks]
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    keep = np.array(keep, dtype=np.int64)
+    data = {
+        "doc": np.concatenate([old["doc"][keep], np.array(todo, dtype=str)]),
+        "text_hash": np.concatenate([
+            old["text_hash"][keep], np.array([hashes[doc] for doc in todo], dtype=np.uint64)
+        ]),
+        "signature": np.concatenate([old["signature"][keep]] + [s for s, _ in results]),
+        "indexed": np.concatenate([old["indexed"][keep]] + [i for _, i in results]),
+    }
+    save_signatures(data, version)
+
+    # -------- claims whose records can change --------
+    index = LSHIndex(data["signature"], data["indexed"])
+    docs = data["doc"].tolist()
+    claims = np.array([claim_of(doc) for doc in docs])
+
+    with record_log.open_log(LOG_NAME, writable=True) as log:
+        if full_rebuild:
+            affected = set(claims.tolist()) | set(log.keys())
+        else:
+            affected = set(changed_claims)
+
+            # previous matches (symmetric: they listed the changed claims)
+            for claim_id in changed_claims:
+                record = log.get_json(claim_id) if claim_id in log else None
+                affected.update(record["duplicate_of"] if record else ())
+
+            # new matches of the re-signed documents
+            new_rows = np.arange(len(keep), len(docs))
+            _, others, _ = index.duplicates(new_rows[data["indexed"][new_rows]])
+            affected.update(claims[others].tolist())
+
+        queries = np.flatnonzero(np.isin(claims, list(affected)) & data["indexed"])
+        rows, others, similarity = index.duplicates(queries)
+        same = claims[rows] == claims[others]
+        records = claim_records(data["doc"], rows[~same], others[~same], similarity[~same])
+
+        for claim_id in sorted(affected):
+            if claim_id in records:
+                log.put_json(claim_id, records[claim_id])
+            elif claim_id in log:
+                log.delete(claim_id)
+
+        flagged = len(log)
+
+    elapsed = time.perf_counter() - start
+    rate = len(todo) / elapsed if elapsed > 0 else 0.0
+
+    print(
+        f"⏱️ duplicates: {len(todo)} documents signed, {len(affected)} claims re-checked, "
+        f"{flagged} claims with duplicates in {elapsed:.2f}s ({rate:.1f} documents/sec)"
+    )
+
+    return {
+        "stage": "duplicates",
+        "documents": len(todo),
+        "removed": len(removed),
+        "claims": len(affected),
+        "flagged": flagged,
+        "seconds": round(elapsed, 3),
+        "documents_per_sec": round(rate, 1)
+    }
+
+# -------------------------------------------------
+# RUN
+# -------------------------------------------------
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+
+    update_index(
+        workers=int(args[0]) if args else None,
+        full_rebuild="--full" in sys.argv
+    )
+    print("✅ DUPLICATE DETECTION COMPLETE")
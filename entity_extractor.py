@@ -1,19 +1,261 @@
 from pathlib import Path
+from email import message_from_bytes
+from email.header import decode_header, make_header
+import base64
+import quopri
+import os
 import re
-import json
+
+from claim_documents import load_claim_document
+from record_log import open_log
 
 BASE_DIR = Path(__file__).resolve().parent
-OCR_DIR = BASE_DIR / "data" / "ocr"
-OUT_DIR = BASE_DIR / "data" / "entities"
-OUT_DIR.mkdir(parents=True, exist_ok=True)
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+OCR_DIR = DATA_DIR / "ocr"
+RAW_DIR = DATA_DIR / "raw" / "ClaimsEnterpriseEML"
+EMAIL_NAME = "email.eml"
+
+# output: data/records/entities.log, one record per claim id
+LOG_NAME = "entities"
+
+# -------------------------------------------------
+# EXTRACTION SPEC (COMPILED ONCE AT IMPORT)
+# -------------------------------------------------
+# field -> patterns in priority order; group(1) is the value.
+# The first pattern that matches anywhere in the text wins.
+
+FIELD_PATTERNS = {
+    "claim_number": [
+        r"(CLM-[A-Z]{2}\d{4,})"
+    ],
+    "policy_number": [
+        r"Policy Number[:\s]*((AU|HO)\d{7})"
+    ],
+    "carrier": [
+        r"INSURER A[:\s]*([^\n]+)",
+        r"INSURANCE COMPANY\s+Company[:\s]*([^\n]+)",
+        r"Prepared for[:\s]*([^\n]+)",
+        r"Dear\s+([A-Za-z]+)\s+Claims"
+    ],
+    "date_of_loss": [
+        r"Date of Loss[:\s]*([\d/]{8,10})",
+        r"occurred on\s*([\d/]{8,10})"
+    ],
+    "estimated_amount": [
+        r"Total Estimated Repairs[:\s]*\$([\d,]+)",
+        r"Estimated Damage[:\s]*\$([\d,]+)",
+        r"Estimated Amount[:\s]*\$([\d,]+)"
+    ],
+    "insured_auto": [
+        r"Customer[:\s]*([A-Z][a-z]+\s+[A-Z][a-z]+)",
+        r"Brokerage Services\s+([A-Z][a-z]+\s+[A-Z][a-z]+)",
+        r"(?:Regards|Sincerely|Thank you),?\s*\n\s*([A-Z][a-z]+\s+[A-Z][a-z]+)",
+        r"\n([A-Z][a-z]+\s+[A-Z][a-z]+)\nPhone:",
+        r"\n([A-Z][a-z]+\s+[A-Z][a-z]+)\nEmail:"
+    ],
+    "insured_home": [
+        r"Name[:\s]*([A-Z][a-z]+\s+[A-Z][a-z]+)",
+        r"Sincerely,\s*([A-Z][a-z]+\s+[A-Z][a-z]+)"
+    ],
+    "vehicle": [
+        r"Vehicle[:\s]*((19|20)\d{2}\s+[A-Za-z]+\s+[A-Za-z0-9]+)"
+    ],
+    "vin": [
+        r"VIN[:\s]*([A-HJ-NPR-Z0-9]{17})"
+    ],
+    "property_address": [
+        r"Property Address[:\s]*([\s\S]*?\d{5})",
+        r"Address[:\s]*([\s\S]*?\d{5})",
+        r"located at\s*([\s\S]*?\d{5})"
+    ],
+    "loss_type": [
+        r"Cause of Loss[:\s]*([A-Za-z ]+)(?:\n|$)",
+        r"Loss Type[:\s]*([A-Za-z ]+)(?:\n|$)"
+    ],
+}
+
+REGEX_META = set("\\.^$*+?{}[]|()")
+
+# leading group of plain literal alternatives, e.g. "(?:Regards|Sincerely)"
+LEADING_ALTERNATION = re.compile(r"\((?:\?:)?((?:[^\\.^$*+?{}\[\]|()]{3,}\|)+[^\\.^$*+?{}\[\]|()]{3,})\)")
+
+def has_top_level_alternation(pattern: str) -> bool:
+    depth = 0
+    k = 0
+    while k < len(pattern):
+        c = pattern[k]
+        if c == "\\":
+            k += 2
+            continue
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            return True
+        k += 1
+    return False
+
+def literal_anchor(pattern: str):
+    """
+    Lower-cased literal text every match of `pattern` starts with, or
+    None when there is no safe one (leading class / alternation / short).
+    A leading group of literal alternatives gives a tuple of anchors.
+    """
+    m = LEADING_ALTERNATION.match(pattern)
+    if (
+        m
+        and pattern[m.end():m.end() + 1] not in ("?", "*", "{")
+        and not has_top_level_alternation(pattern)
+    ):
+        return tuple(a.lower() for a in m.group(1).split("|"))
+
+    # leading capture groups do not move the match start
+    i = 0
+    while pattern.startswith("(", i) and not pattern.startswith("(?", i):
+        i += 1
+
+    j = i
+    while j < len(pattern) and pattern[j] not in REGEX_META:
+        j += 1
+
+    anchor = pattern[i:j]
+
+    # a quantifier makes the last literal char optional / repeatable
+    if j < len(pattern) and pattern[j] in "?*{":
+        anchor = anchor[:-1]
+
+    # an alternation inside the stripped groups could skip the anchor
+    depth = 0
+    k = 0
+    while k < len(pattern):
+        c = pattern[k]
+        if c == "\\":
+            k += 2
+            continue
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth <= i:
+            return None
+        k += 1
+
+    return anchor.lower() if len(anchor) >= 3 else None
+
+def compile_spec(field_patterns: dict) -> dict:
+    return {
+        field: [(re.compile(p, re.I | re.S), literal_anchor(p)) for p in patterns]
+        for field, patterns in field_patterns.items()
+    }
+
+EXTRACTION_SPEC = compile_spec(FIELD_PATTERNS)
+
+# -------------------------------------------------
+# EMAIL FAST PATH
+# -------------------------------------------------
+# The claim email body (~1 KB, regular wording) carries most fields.
+# Fields found here win; the rest fall back to the OCR scan above.
+
+EMAIL_FIELD_PATTERNS = {
+    "claim_number": [
+        r"Claim Number[:\s]*(CLM-[A-Z]{2}\d{4,})",
+        r"(CLM-[A-Z]{2}\d{4,})"
+    ],
+    "policy_number": [
+        r"Policy Number[:\s]*((AU|HO)\d{7})"
+    ],
+    "carrier": [
+        r"Dear\s+([A-Za-z][A-Za-z ]*?)\s+Claims"
+    ],
+    "date_of_loss": [
+        r"occurred on\s*([\d/]{8,10})"
+    ],
+    "estimated_amount": [
+        r"Estimated Damage[:\s]*\$([\d,]+)"
+    ],
+    "insured_auto": [
+        r"(?:Regards|Sincerely|Thank you),?\s*\n\s*([A-Z][a-z]+\s+[A-Z][a-z]+)"
+    ],
+    "insured_home": [
+        r"(?:Regards|Sincerely|Thank you),?\s*\n\s*([A-Z][a-z]+\s+[A-Z][a-z]+)"
+    ],
+    "vehicle": [
+        r"involving my\s+((19|20)\d{2}\s+[A-Za-z]+\s+[A-Za-z0-9]+)"
+    ],
+    "property_address": [
+        r"located at\s*([^\n]*?\d{5})"
+    ],
+    "loss_type": [
+        r"Loss Type[:\s]*([A-Za-z ]+)(?:\n|$)"
+    ],
+}
+
+EMAIL_SPEC = compile_spec(EMAIL_FIELD_PATTERNS)
+
+# fields extract_entities() looks up per claim type
+BASIC_FIELDS = ["claim_number", "policy_number", "carrier", "date_of_loss", "estimated_amount"]
+CLAIM_FIELDS = {
+    "AUTO": BASIC_FIELDS + ["insured_auto", "vehicle", "vin"],
+    "HOME": BASIC_FIELDS + ["insured_home", "property_address", "loss_type"],
+    "UNKNOWN": BASIC_FIELDS + ["insured_home"],
+}
 
 # -------------------------------------------------
 # HELPERS
 # -------------------------------------------------
 
+class ScanText:
+    """
+    Text plus one lower-cased copy. Anchored patterns locate candidate
+    offsets with str.find on the copy and run the regex only there,
+    which is equivalent to regex.search() but skips the case-insensitive
+    per-character scan that re.I forces on every pattern.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        lower = text.lower()
+        # lower() changes length for a few non-ASCII chars -> offsets unusable
+        self.lower = lower if len(lower) == len(text) else None
+
+    def search(self, regex, anchor):
+        if anchor is None or self.lower is None:
+            return regex.search(self.text)
+
+        if isinstance(anchor, tuple):
+            return self.search_any(regex, anchor)
+
+        pos = self.lower.find(anchor)
+        while pos != -1:
+            m = regex.match(self.text, pos)
+            if m:
+                return m
+            pos = self.lower.find(anchor, pos + 1)
+        return None
+
+    def search_any(self, regex, anchors):
+        # candidate offsets of all alternatives, tried left to right
+        found = {a: self.lower.find(a) for a in anchors}
+
+        while True:
+            live = [p for p in found.values() if p != -1]
+            if not live:
+                return None
+
+            pos = min(live)
+            m = regex.match(self.text, pos)
+            if m:
+                return m
+
+            for a, p in found.items():
+                if p == pos:
+                    found[a] = self.lower.find(a, pos + 1)
+
 def extract(patterns, text):
-    for p in patterns:
-        m = re.search(p, text, re.I | re.S)
+    scan = text if isinstance(text, ScanText) else ScanText(text)
+    for regex, anchor in patterns:
+        m = scan.search(regex, anchor)
         if m:
             return m.group(1).strip()
     return None
@@ -25,13 +267,61 @@ def clean_amount(val):
 # ENTITY EXTRACTION
 # -------------------------------------------------
 
-def extract_entities(folder: Path):
+def email_headers(head: str) -> dict:
+    headers = {}
+    name = None
+    for line in head.split("\n"):
+        if line[:1] in (" ", "\t") and name:
+            headers[name] += " " + line.strip()  # folded header
+        elif ":" in line:
+            name, _, value = line.partition(":")
+            name = name.strip().lower()
+            headers[name] = value.strip()
+    return headers
+
+def decode_body(payload: bytes, encoding: str) -> bytes:
+    encoding = encoding.lower()
+    if encoding == "quoted-printable":
+        return quopri.decodestring(payload)
+    if encoding == "base64":
+        return base64.b64decode(payload)
+    return payload
+
+def read_email_text(path: Path):
+    """
+    "Subject: ...\n" + plain-text body of the claim email, transfer
+    encoding (quoted-printable / base64) undone. None if there is no email.
+    """
+    if not path.exists():
+        return None
+
+    raw = path.read_bytes().replace(b"\r\n", b"\n")
+    head, _, payload = raw.partition(b"\n\n")
+    headers = email_headers(head.decode("latin-1"))
+    subject = str(make_header(decode_header(headers.get("subject", ""))))
+
+    # single-part text/plain (what the claim mails are): no MIME parser needed
+    content_type = headers.get("content-type", "text/plain")
+    if content_type.lower().startswith("text/plain"):
+        m = re.search(r'charset="?([^";\s]+)', content_type, re.I)
+        body = decode_body(payload, headers.get("content-transfer-encoding", ""))
+        return f"Subject: {subject}\n" + body.decode(m.group(1) if m else "utf-8", errors="replace")
 
-    texts = {}
-    for f in folder.glob("*.txt"):
-        texts[f.name.lower()] = f.read_text(errors="ignore")
+    message = message_from_bytes(raw)
+    for part in message.walk():
+        if part.get_content_type() == "text/plain" and not part.get_filename():
+            body = part.get_payload(decode=True) or b""
+            return f"Subject: {subject}\n" + body.decode(part.get_content_charset() or "utf-8", errors="replace")
 
-    full_text = "\n".join(texts.values())
+    return f"Subject: {subject}\n"
+
+def read_claim_texts(folder: Path) -> dict:
+    texts = load_claim_document(folder).texts(include_combined=True)
+    return {name.lower(): text for name, text in texts.items()}
+
+def extract_entities(folder: Path, use_email: bool = True):
+
+    doc = load_claim_document(folder)
 
     # ---------------- CLAIM TYPE ----------------
     if folder.name.startswith("CLM-AU"):
@@ -41,78 +331,63 @@ def extract_entities(folder: Path):
     else:
         claim_type = "UNKNOWN"
 
-    # ---------------- BASIC FIELDS ----------------
-    claim_number = extract([r"(CLM-[A-Z]{2}\d{4})"], full_text)
+    # the email only pays off when it can spare the OCR scan entirely:
+    # AUTO claims need it for the VIN anyway, so reading the email too
+    # is pure overhead (measured ~18% slower on data/ocr)
+    if any(field not in EMAIL_SPEC for field in CLAIM_FIELDS[claim_type]):
+        use_email = False
 
-    policy_number = extract([
-        r"Policy Number[:\s]*((AU|HO)\d{7})"
-    ], full_text)
+    email_text = read_email_text(RAW_DIR / folder.name / EMAIL_NAME) if use_email else None
+    email_scan = ScanText(email_text) if email_text else None
+    ocr_scan = None
 
-    carrier = extract([
-        r"INSURER A[:\s]*([^\n]+)",
-        r"INSURANCE COMPANY\s+Company[:\s]*([^\n]+)",
-        r"Prepared for[:\s]*([^\n]+)",
-        r"Dear\s+([A-Za-z]+)\s+Claims"
-    ], full_text)
+    def get(field):
+        nonlocal ocr_scan
 
-    date_of_loss = extract([
-        r"Date of Loss[:\s]*([\d/]{8,10})",
-        r"occurred on\s*([\d/]{8,10})"
-    ], full_text)
+        if email_scan is not None and field in EMAIL_SPEC:
+            value = extract(EMAIL_SPEC[field], email_scan)
+            if value is not None:
+                return value
 
-    estimated_amount = clean_amount(extract([
-        r"Total Estimated Repairs[:\s]*\$([\d,]+)",
-        r"Estimated Damage[:\s]*\$([\d,]+)",
-        r"Estimated Amount[:\s]*\$([\d,]+)"
-    ], full_text))
+        # OCR text is read and lower-cased only once a field needs it;
+        # per-file texts (combined.txt repeats them), or combined.txt
+        # when it is all the folder has
+        if ocr_scan is None:
+            ocr_scan = ScanText(doc.full_text() if doc.files else doc.combined)
+        return extract(EXTRACTION_SPEC[field], ocr_scan)
+
+    # ---------------- BASIC FIELDS ----------------
+    claim_number = get("claim_number")
+    policy_number = get("policy_number")
+    carrier = get("carrier")
+    date_of_loss = get("date_of_loss")
+    estimated_amount = clean_amount(get("estimated_amount"))
 
     # ---------------- INSURED NAME ----------------
     if claim_type == "AUTO":
-        insured = extract([
-            r"Customer[:\s]*([A-Z][a-z]+\s+[A-Z][a-z]+)",
-            r"Brokerage Services\s+([A-Z][a-z]+\s+[A-Z][a-z]+)",
-            r"(?:Regards|Sincerely|Thank you),?\s*\n\s*([A-Z][a-z]+\s+[A-Z][a-z]+)",
-            r"\n([A-Z][a-z]+\s+[A-Z][a-z]+)\nPhone:",
-            r"\n([A-Z][a-z]+\s+[A-Z][a-z]+)\nEmail:"
-        ], full_text)
+        insured = get("insured_auto")
     else:
-        insured = extract([
-            r"Name[:\s]*([A-Z][a-z]+\s+[A-Z][a-z]+)",
-            r"Sincerely,\s*([A-Z][a-z]+\s+[A-Z][a-z]+)"
-        ], full_text)
+        insured = get("insured_home")
 
     # ---------------- AUTO ----------------
     vehicle = vin = loss_type = None
     property_address = None
 
     if claim_type == "AUTO":
-        vehicle = extract([
-            r"Vehicle[:\s]*((19|20)\d{2}\s+[A-Za-z]+\s+[A-Za-z0-9]+)"
-        ], full_text)
-
-        vin = extract([
-            r"VIN[:\s]*([A-HJ-NPR-Z0-9]{17})"
-        ], full_text)
-
+        vehicle = get("vehicle")
+        vin = get("vin")
         loss_type = "vehicle damage"
 
     # ---------------- HOME ----------------
     if claim_type == "HOME":
-        property_address = extract([
-            r"Property Address[:\s]*([\s\S]*?\d{5})",
-            r"Address[:\s]*([\s\S]*?\d{5})",
-            r"located at\s*([\s\S]*?\d{5})"
-        ], full_text)
-
-        loss_type = extract([
-            r"Cause of Loss[:\s]*([A-Za-z ]+)(?:\n|$)",
-            r"Loss Type[:\s]*([A-Za-z ]+)(?:\n|$)"
-        ], full_text)
+        property_address = get("property_address")
+        loss_type = get("loss_type")
 
     # ---------------- FLAGS (FILE-BASED) ----------------
-    has_medical = any("medical" in k for k in texts)
-    has_police = any("police" in k for k in texts)
-    has_legal = any("legal" in k for k in texts)
+    names = [n.lower() for n in doc.txt_names]
+    has_medical = any("medical" in k for k in names)
+    has_police = any("police" in k for k in names)
+    has_legal = any("legal" in k for k in names)
 
     return {
         "claim_type": claim_type,
@@ -135,20 +410,18 @@ def extract_entities(folder: Path):
 # BATCH RUN
 # -------------------------------------------------
 
-def main():
-    for folder in OCR_DIR.iterdir():
-        if not folder.is_dir():
-            continue
+def process_claim(folder: Path):
+    return extract_entities(folder)
 
-        entities = extract_entities(folder)
-
-        out = OUT_DIR / folder.name
-        out.mkdir(exist_ok=True)
+def main():
+    with open_log(LOG_NAME, writable=True) as log:
+        for folder in OCR_DIR.iterdir():
+            if not folder.is_dir():
+                continue
 
-        with open(out / "ENTITIES.json", "w") as f:
-            json.dump(entities, f, indent=2)
+            log.put_json(folder.name, process_claim(folder))
 
     print("✅ ENTITY EXTRACTION COMPLETE (AUTO + HOME)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,195 @@
+# feature_encoder.py
+#
+# Feature-store dict -> fixed numeric vector, shared by the vector store
+# builder and the retriever (no text templates, no tokenizer):
+#
+#   claim_type, severity          one-hot
+#   severity_score, num_photos    one-hot bucket
+#   has_medical/police/legal      one-hot yes / no
+#   signals, files_present        multi-hot
+#
+# Each block is scaled by its weight and rows are L2-normalised, so a
+# dot product is a cosine similarity. Values outside the vocabulary
+# (e.g. a new HOME_LOSS_* signal) land in one of HASH_BUCKETS hashed
+# slots of their block instead of being dropped, so the vocabulary
+# never has to be refitted.
+
+from bisect import bisect_right
+import zlib
+
+import numpy as np
+from scipy import sparse
+
+from signal_detector import DEFAULT_SEVERITY, FLAG_SIGNALS, SEVERITY_LEVELS, home_loss_signal
+
+# bump when the column layout changes (stores built before must be rebuilt)
+ENCODER_VERSION = 2
+
+DEFAULT_WEIGHTS = {
+    "claim_type": 2.0,
+    "severity": 1.0,
+    "severity_score": 0.5,
+    "flags": 1.0,
+    "num_photos": 0.5,
+    "files_present": 0.5,
+    "signals": 1.0,
+}
+
+HASH_BUCKETS = 8
+
+DEFAULT_VOCAB = {
+    "claim_type": ["AUTO", "HOME"],
+    "severity": [DEFAULT_SEVERITY] + [level for _, level in reversed(SEVERITY_LEVELS)],
+    # bucket i holds scores below edge i (last bucket: everything above)
+    "severity_score": [20, 40, 60, 80, 100, 120],
+    "flags": ["has_medical", "has_police", "has_legal"],
+    # 0, 1, 2, 3 and "4 or more" photos
+    "num_photos": [0, 1, 2, 3, 4],
+    "files_present": ["ACORD", "REPAIR_ESTIMATE", "MEDICAL", "POLICE", "LEGAL", "PHOTOS", "OTHER"],
+    "signals": FLAG_SIGNALS + [
+        home_loss_signal(loss)
+        for loss in ["Fire", "Water Damage", "Theft", "Liability", "Natural Disaster", "Vandalism"]
+    ],
+}
+
+# blocks whose values outside the vocabulary go to hashed slots
+HASHED_BLOCKS = ["signals", "files_present"]
+
+# -------------------------------------------------
+# ENCODER
+# -------------------------------------------------
+
+class FeatureEncoder:
+    """
+    encode(feature) -> dense row, encode_batch(features) -> CSR rows.
+    spec() / from_spec() persist the exact layout with a vector store
+    generation, so queries are always encoded like the store was.
+    """
+
+    def __init__(self, weights: dict = None, vocab: dict = None, hash_buckets: int = HASH_BUCKETS):
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.vocab = {**DEFAULT_VOCAB, **(vocab or {})}
+        self.hash_buckets = hash_buckets
+
+        # block -> {value: column}; column names only for inspection
+        self.columns = []
+        self._slots = {}
+        self._hashed = {}
+
+        for value in self.vocab["claim_type"]:
+            self._add("claim_type", value)
+        for value in self.vocab["severity"]:
+            self._add("severity", value)
+        for i in range(len(self.vocab["severity_score"]) + 1):
+            self._add("severity_score", i)
+        for flag in self.vocab["flags"]:
+            self._add("flags", (flag, True))
+            self._add("flags", (flag, False))
+        for value in self.vocab["num_photos"]:
+            self._add("num_photos", value)
+        for block in ("files_present", "signals"):
+            for value in self.vocab[block]:
+                self._add(block, value)
+
+        for block in HASHED_BLOCKS:
+            self._hashed[block] = len(self.columns)
+            self.columns.extend(f"{block}#{i}" for i in range(hash_buckets))
+
+        self.dim = len(self.columns)
+
+    def _add(self, block: str, value):
+        self._slots.setdefault(block, {})[value] = len(self.columns)
+        self.columns.append(f"{block}={value}")
+
+    # ---------------- PERSIST ----------------
+
+    def spec(self) -> dict:
+        return {
+            "version": ENCODER_VERSION,
+            "weights": self.weights,
+            "vocab": self.vocab,
+            "hash_buckets": self.hash_buckets,
+        }
+
+    @classmethod
+    def from_spec(cls, spec: dict):
+        if spec.get("version") != ENCODER_VERSION:
+            raise ValueError(
+                f"Vector store was encoded with feature encoder v{spec.get('version')}, "
+                f"this is v{ENCODER_VERSION} (rebuild the store)"
+            )
+        return cls(spec["weights"], spec["vocab"], spec["hash_buckets"])
+
+    # ---------------- ENCODING ----------------
+
+    def _slot(self, block: str, value):
+        column = self._slots[block].get(value)
+        if column is None and block in self._hashed:
+            bucket = zlib.crc32(f"{block}:{value}".encode()) % self.hash_buckets
+            column = self._hashed[block] + bucket
+        return column
+
+    def active(self, feature: dict) -> list:
+        # (column, weight) of every non-zero entry, before normalisation
+        w = self.weights
+        slots = self._slots
+
+        entries = []
+
+        column = slots["claim_type"].get(feature.get("claim_type"))
+        if column is not None:
+            entries.append((column, w["claim_type"]))
+
+        column = slots["severity"].get(feature.get("severity"))
+        if column is not None:
+            entries.append((column, w["severity"]))
+
+        bucket = bisect_right(self.vocab["severity_score"], feature.get("severity_score") or 0)
+        entries.append((slots["severity_score"][bucket], w["severity_score"]))
+
+        for flag in self.vocab["flags"]:
+            entries.append((slots["flags"][(flag, bool(feature.get(flag)))], w["flags"]))
+
+        photos = min(int(feature.get("num_photos") or 0), self.vocab["num_photos"][-1])
+        column = slots["num_photos"].get(photos)
+        if column is not None:
+            entries.append((column, w["num_photos"]))
+
+        for block in ("files_present", "signals"):
+            for value in set(feature.get(block) or ()):
+                entries.append((self._slot(block, value), w[block]))
+
+        return entries
+
+    def key(self, feature: dict) -> tuple:
+        # identical keys <=> identical vectors
+        return tuple(sorted(self.active(feature)))
+
+    def encode(self, feature: dict) -> np.ndarray:
+        row = np.zeros(self.dim)
+        for column, weight in self.active(feature):
+            row[column] += weight
+
+        norm = np.linalg.norm(row)
+        return row / norm if norm else row
+
+    def encode_batch(self, features: list):
+        indptr = [0]
+        indices = []
+        data = []
+
+        for feature in features:
+            for column, weight in self.active(feature):
+                indices.append(column)
+                data.append(weight)
+            indptr.append(len(indices))
+
+        rows = sparse.csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(features), self.dim),
+        )
+        rows.sum_duplicates()
+
+        norms = np.sqrt(np.asarray(rows.multiply(rows).sum(axis=1)).ravel())
+        rows.data /= np.repeat(np.where(norms == 0, 1, norms), np.diff(rows.indptr))
+        return rows
@@ -1,99 +1,145 @@
+from datetime import datetime
 from pathlib import Path
-import json
+import sys
+
+import columnar_feature_store as store
+import record_log
 
 BASE_DIR = Path(__file__).resolve().parent
 
-SIGNAL_DIR = BASE_DIR / "data" / "signals"
-FILE_TAG_DIR = BASE_DIR / "data" / "file_tags"
-OUT_DIR = BASE_DIR / "data" / "feature_store"
+# input record logs (data/records/<name>.log), keyed by claim id
+SIGNALS_LOG = "signals"
+FILE_TAGS_LOG = "file_tags"
+ENTITIES_LOG = "entities"
+
+# date_of_loss as extracted (first match wins) -> stored as ISO YYYY-MM-DD
+DATE_FORMATS = ["%m/%d/%Y", "%m/%d/%y", "%Y-%m-%d"]
 
-OUT_DIR.mkdir(parents=True, exist_ok=True)
+# columnar store (claim_type partitions); OUT_DIR only for the legacy JSON export
+STORE_DIR = store.STORE_DIR
+OUT_DIR = store.LEGACY_DIR
 
 # ---------------------------------------
 # HELPERS
 # ---------------------------------------
 
-def load_json(path):
-    with open(path, "r") as f:
-        return json.load(f)
+def iso_date(value):
+    if not value:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
 
 # ---------------------------------------
 # FEATURE STORE BUILDER
 # ---------------------------------------
 
-def build_feature_store():
-    for claim_folder in SIGNAL_DIR.iterdir():
-        if not claim_folder.is_dir():
-            continue
+def build_claim_features(claim_id: str):
 
-        claim_id = claim_folder.name
+    # -------- Load signal output --------
+    signal_data = record_log.read_json(SIGNALS_LOG, claim_id)
+    if signal_data is None:
+        return None
 
-        # -------- Load signal output --------
-        signal_file = claim_folder / "SIGNALS.json"
-        if not signal_file.exists():
-            continue
+    # -------- Load file tags --------
+    file_tags = record_log.read_json(FILE_TAGS_LOG, claim_id)
+    if file_tags is None:
+        return None
 
-        signal_data = load_json(signal_file)
+    # -------- Carrier / loss date (retrieval filters) --------
+    entities = record_log.read_json(ENTITIES_LOG, claim_id) or {}
 
-        # -------- Load file tags --------
-        file_tag_file = FILE_TAG_DIR / claim_id / "FILE_TAGS.json"
-        if not file_tag_file.exists():
-            continue
+    # -----------------------------------
+    # FEATURE ENGINEERING
+    # -----------------------------------
+
+    all_tags = set()
+    num_photos = 0
+
+    for filename, tags in file_tags.items():
+        # collect tags
+        for t in tags:
+            all_tags.add(t)
+
+        # ✅ PHOTO COUNT — filename based ONLY
+        fname = filename.lower()
+        if any(x in fname for x in ["damage", "photo", "img", "image"]):
+            num_photos += 1
+
+    return {
+        "claim_number": signal_data["claim_number"],
+        "claim_type": signal_data["claim_type"],
+
+        # Presence flags
+        "has_medical": "MEDICAL" in all_tags,
+        "has_police": "POLICE" in all_tags,
+        "has_legal": "LEGAL" in all_tags,
+
+        # Counts
+        "num_attachments": len(file_tags),
+        "num_photos": num_photos,
+
+        # Risk output
+        "severity": signal_data["severity"],
+        "severity_score": signal_data["severity_score"],
 
-        file_tags = load_json(file_tag_file)
+        # Explainability
+        "signals": signal_data["signals_detected"],
+        "files_present": sorted(list(all_tags)),
 
-        # -----------------------------------
-        # FEATURE ENGINEERING
-        # -----------------------------------
+        # Retrieval partitions / filters
+        "carrier": entities.get("carrier"),
+        "date_of_loss": iso_date(entities.get("date_of_loss"))
+    }
 
-        all_tags = set()
-        num_photos = 0
+def build_claim_row(claim_id: str):
+    # store row = features + claim id (None if inputs are missing)
+    features = build_claim_features(claim_id)
+    if features is None:
+        return None
 
-        for filename, tags in file_tags.items():
-            # collect tags
-            for t in tags:
-                all_tags.add(t)
+    return {store.INDEX_COLUMN: claim_id, **features}
 
-            # ✅ PHOTO COUNT — filename based ONLY
-            fname = filename.lower()
-            if any(x in fname for x in ["damage", "photo", "img", "image"]):
-                num_photos += 1
+def commit_rows(rows: dict, removed=()):
+    """
+    Merge rebuilt rows {claim_id: row or None} into the columnar store
+    and drop `removed` claims. Untouched claims keep their stored row.
+    """
+    current = store.load_rows(STORE_DIR)
 
-        features = {
-            "claim_number": signal_data["claim_number"],
-            "claim_type": signal_data["claim_type"],
+    for claim_id in removed:
+        current.pop(claim_id, None)
 
-            # Presence flags
-            "has_medical": "MEDICAL" in all_tags,
-            "has_police": "POLICE" in all_tags,
-            "has_legal": "LEGAL" in all_tags,
+    for claim_id, row in rows.items():
+        if row is None:
+            current.pop(claim_id, None)
+        else:
+            current[claim_id] = row
 
-            # Counts
-            "num_attachments": len(file_tags),
-            "num_photos": num_photos,
+    return store.write_feature_store(list(current.values()), STORE_DIR)
 
-            # Risk output
-            "severity": signal_data["severity"],
-            "severity_score": signal_data["severity_score"],
+def build_feature_store(export_json: bool = False):
+    with record_log.open_log(SIGNALS_LOG) as signals:
+        rows = [build_claim_row(claim_id) for claim_id in signals.keys()]
 
-            # Explainability
-            "signals": signal_data["signals_detected"],
-            "files_present": sorted(list(all_tags))
-        }
+    # -----------------------------------
+    # SAVE FEATURE STORE (ONE FILE PER claim_type)
+    # -----------------------------------
 
-        # -----------------------------------
-        # SAVE FEATURE STORE
-        # -----------------------------------
+    partitions = store.write_feature_store([r for r in rows if r is not None], STORE_DIR)
 
-        out_file = OUT_DIR / f"{claim_id}.json"
-        with open(out_file, "w") as f:
-            json.dump(features, f, indent=2)
+    if export_json:
+        store.export_json(OUT_DIR, STORE_DIR)
 
-    print("✅ FEATURE STORE CREATED SUCCESSFULLY (PHOTO COUNT FIXED)")
+    print(f"✅ FEATURE STORE CREATED SUCCESSFULLY {partitions}")
 
 # ---------------------------------------
 # RUN
 # ---------------------------------------
 
 if __name__ == "__main__":
-    build_feature_store()
\ No newline at end of file
+    # --json: also write the legacy data/feature_store/<claim>.json files
+    build_feature_store(export_json="--json" in sys.argv)
\ No newline at end of file
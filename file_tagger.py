@@ -1,11 +1,15 @@
 from pathlib import Path
-import json
-import re
+import os
+
+from claim_documents import COMBINED_NAME, load_claim_document
+from record_log import open_log
 
 BASE_DIR = Path(__file__).resolve().parent
-OCR_DIR = BASE_DIR / "data" / "ocr"
-OUT_DIR = BASE_DIR / "data" / "file_tags"
-OUT_DIR.mkdir(parents=True, exist_ok=True)
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+OCR_DIR = DATA_DIR / "ocr"
+
+# output: data/records/file_tags.log, one record per claim id
+LOG_NAME = "file_tags"
 
 # -------------------------------------------------
 # STRICT FILE TAGGING (NO MIXING)
@@ -44,33 +48,33 @@ def tag_single_file(text: str, filename: str):
 # BATCH RUN
 # -------------------------------------------------
 
-def main():
-    for claim_folder in OCR_DIR.iterdir():
-        if not claim_folder.is_dir():
-            continue
+def tag_claim_folder(claim_folder: Path):
+    results = {}
+    combined_tags = set()
 
-        out_folder = OUT_DIR / claim_folder.name
-        out_folder.mkdir(exist_ok=True)
+    for f in load_claim_document(claim_folder).files:
+        tags = tag_single_file(f.text, f.name)
 
-        results = {}
-        combined_tags = set()
+        results[f.name] = sorted(tags)
+        combined_tags.update(tags)
 
-        for txt_file in claim_folder.glob("*.txt"):
-            text = txt_file.read_text(errors="ignore")
-            tags = tag_single_file(text, txt_file.name)
+    #  combined = claim-level truth
+    results[COMBINED_NAME] = sorted(combined_tags)
 
-            results[txt_file.name] = sorted(tags)
+    return results
 
-            if txt_file.name != "combined.txt":
-                combined_tags.update(tags)
+def process_claim(claim_folder: Path):
+    return tag_claim_folder(claim_folder)
 
-        #  combined = claim-level truth
-        results["combined.txt"] = sorted(combined_tags)
+def main():
+    with open_log(LOG_NAME, writable=True) as log:
+        for claim_folder in OCR_DIR.iterdir():
+            if not claim_folder.is_dir():
+                continue
 
-        with open(out_folder / "FILE_TAGS.json", "w") as f:
-            json.dump(results, f, indent=2)
+            log.put_json(claim_folder.name, process_claim(claim_folder))
 
     print(" FILE TAGGING COMPLETE")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
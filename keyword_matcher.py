@@ -0,0 +1,97 @@
+# keyword_matcher.py
+#
+# Keyword vocabularies of the detectors (summary risk flags, file
+# taxonomy, ...) compiled once per caller. A document is lowercased
+# once and each category stops at its first hit, using C substring
+# search (`in`) for plain keywords and a precompiled regex only for
+# the ones that need it. Measured on data/ocr this beats both a
+# per-call re.search loop and a combined trie regex: CPython's string
+# search is far faster per character than any automaton run by the
+# regex engine or in Python, and stopping at the first hit skips most
+# of the vocabulary.
+#
+# Matching is case-insensitive substring matching, like
+# `keyword in text.lower()`. Regex vocabularies may join literal parts
+# with \s* (e.g. r"acord\s*25"); anything richer is rejected when the
+# matcher is built.
+
+import re
+
+WHITESPACE = r"\s*"
+
+# characters that must be escaped to be literal in a regex vocabulary
+# (a backslash before any other non-alphanumeric char is a literal too)
+REGEX_META = set(".^$*+?{}[]\\|()")
+
+# -------------------------------------------------
+# PATTERN PARSING
+# -------------------------------------------------
+
+def regex_tokens(pattern: str) -> tuple:
+    # literal chars (escaped meta allowed) and \s* -> token tuple
+    tokens = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith(WHITESPACE, i):
+            tokens.append(WHITESPACE)
+            i += len(WHITESPACE)
+        elif pattern[i] == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            tokens.append(pattern[i + 1])
+            i += 2
+        elif pattern[i] in REGEX_META:
+            raise ValueError(f"Unsupported keyword pattern {pattern!r} (only literals and \\s*)")
+        else:
+            tokens.append(pattern[i].lower())
+            i += 1
+    return tuple(tokens)
+
+def compile_keyword(keyword: str, regex: bool):
+    # plain keyword -> lowercase str, \s* keyword -> compiled pattern
+    if not regex:
+        return keyword.lower()
+
+    tokens = regex_tokens(keyword)
+    if WHITESPACE not in tokens:
+        return "".join(tokens)
+    return re.compile("".join(t if t == WHITESPACE else re.escape(t) for t in tokens))
+
+# -------------------------------------------------
+# MATCHER
+# -------------------------------------------------
+
+class KeywordMatcher:
+    """
+    Built from {category: [keyword, ...]} by the module that owns the
+    vocabulary, so it only ever checks that module's keywords.
+
+    matches(text) -> {category: bool}, stopping at each category's
+    first hit; scan(text) -> {category: set(keywords found)}.
+    """
+
+    def __init__(self, vocabulary: dict, regex: bool = False):
+        self.categories = list(vocabulary)
+        self._checks = {}
+        for category, keywords in vocabulary.items():
+            if not keywords or not all(keywords):
+                raise ValueError(f"Empty keyword in category {category!r}")
+            self._checks[category] = [(keyword, compile_keyword(keyword, regex)) for keyword in keywords]
+
+    @staticmethod
+    def _hit(check, lower: str) -> bool:
+        return check in lower if isinstance(check, str) else check.search(lower) is not None
+
+    def matches(self, text: str) -> dict:
+        lower = text.lower()
+        hit = self._hit
+        return {
+            category: any(hit(check, lower) for _, check in checks)
+            for category, checks in self._checks.items()
+        }
+
+    def scan(self, text: str) -> dict:
+        lower = text.lower()
+        hit = self._hit
+        return {
+            category: {keyword for keyword, check in checks if hit(check, lower)}
+            for category, checks in self._checks.items()
+        }
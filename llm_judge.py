@@ -1,7 +1,10 @@
 # llm_judge.py
 import json
 
-SIMILARITY_THRESHOLD = 0.85
+import rule_engine
+
+# threshold in decision_rules.json, shared with the retriever's high_similarity_flag
+SIMILARITY_THRESHOLD = "high_similarity"
 
 def llm_judge(incoming_claim, retrieval_output):
     """
@@ -12,7 +15,7 @@ def llm_judge(incoming_claim, retrieval_output):
     summary = retrieval_output["similarity_summary"]
     matches = retrieval_output["matches"]
 
-    if summary["max_similarity"] >= SIMILARITY_THRESHOLD:
+    if summary["max_similarity"] >= rule_engine.threshold(SIMILARITY_THRESHOLD):
         decision = "AUTO_APPROVE"
         confidence = 90
         reasoning = (
@@ -1,13 +1,18 @@
 # EMAIL_INTELLIGENT_SYSTEM/file_tagger.py
 
 from pathlib import Path
-import json
-import re
+import os
+
+from claim_documents import load_claim_document
+import keyword_matcher
+from record_log import open_log
 
 BASE_DIR = Path(__file__).resolve().parent
-OCR_DIR = BASE_DIR / "data" / "ocr"
-OUT_DIR = BASE_DIR / "data" / "file_tags"
-OUT_DIR.mkdir(parents=True, exist_ok=True)
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+OCR_DIR = DATA_DIR / "ocr"
+
+# output: data/records/file_tags.log (same stage log as file_tagger.py)
+LOG_NAME = "file_tags"
 
 # -------------------------------------------------
 # FILE TAGGING TAXONOMY (STRICT, BUSINESS-SAFE)
@@ -63,6 +68,8 @@ FILE_TAXONOMY = {
     ]
 }
 
+TAXONOMY_KEYWORDS = keyword_matcher.KeywordMatcher(FILE_TAXONOMY, regex=True)
+
 # -------------------------------------------------
 # FILE TAGGING LOGIC
 # -------------------------------------------------
@@ -70,7 +77,6 @@ FILE_TAXONOMY = {
 def tag_file(text: str, filename: str):
     tags = set()
 
-    lower_text = text.lower()
     lower_name = filename.lower()
 
     # -------------------------------------------------
@@ -88,13 +94,12 @@ def tag_file(text: str, filename: str):
         return list(tags)
 
     # -------------------------------------------------
-    # 3️⃣ TEXT-BASED STRICT TAGGING
+    # 3️⃣ TEXT-BASED STRICT TAGGING (first hit per tag)
     # -------------------------------------------------
-    for tag, patterns in FILE_TAXONOMY.items():
-        for pattern in patterns:
-            if re.search(pattern, lower_text):
-                tags.add(tag)
-                break
+    hits = TAXONOMY_KEYWORDS.matches(text)
+    for tag in FILE_TAXONOMY:
+        if hits[tag]:
+            tags.add(tag)
 
     # -------------------------------------------------
     # 4️⃣ FALLBACK
@@ -108,23 +113,20 @@ def tag_file(text: str, filename: str):
 # BATCH RUN
 # -------------------------------------------------
 
-def main():
-    for claim_folder in OCR_DIR.iterdir():
-        if not claim_folder.is_dir():
-            continue
-
-        claim_out = OUT_DIR / claim_folder.name
-        claim_out.mkdir(exist_ok=True)
+def tag_claim_folder(claim_folder: Path):
+    texts = load_claim_document(claim_folder).texts(include_combined=True)
+    return {name: tag_file(text, name) for name, text in texts.items()}
 
-        results = {}
+def process_claim(claim_folder: Path):
+    return tag_claim_folder(claim_folder)
 
-        for txt_file in claim_folder.glob("*.txt"):
-            text = txt_file.read_text(errors="ignore")
-            tags = tag_file(text, txt_file.name)
-            results[txt_file.name] = tags
+def main():
+    with open_log(LOG_NAME, writable=True) as log:
+        for claim_folder in OCR_DIR.iterdir():
+            if not claim_folder.is_dir():
+                continue
 
-        with open(claim_out / "FILE_TAGS.json", "w") as f:
-            json.dump(results, f, indent=2)
+            log.put_json(claim_folder.name, process_claim(claim_folder))
 
     print("✅ FILE TAGGING COMPLETE (STRICT MODE)")
 
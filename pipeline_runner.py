@@ -0,0 +1,398 @@
+# pipeline_runner.py
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+import sys
+import time
+
+import raw_ingestor
+import duplicate_detector
+import file_tagger
+import entity_extractor
+import summary_generator
+import signal_detector
+import feature_store_builder
+import semantic_store_builder
+import columnar_feature_store
+import record_log
+import stage_manifest
+import vector_generations
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# claims handed to a worker in one task (keeps IPC overhead low)
+CHUNK_SIZE = 64
+
+# -------------------------------------------------
+# STAGES (ORDER MATTERS)
+# -------------------------------------------------
+# claims() -> {claim_id: handle passed to process(handle)}
+# input_hash(handle) -> hash of what decides if the claim is stale
+#
+# Per-claim stages append process() results to one record log
+# (data/records/<log>.log, see record_log.py) as they come back from the
+# workers; a None result deletes the claim's record.
+#
+# Bulk stages write one store instead: process() returns the claim's row,
+# existing() lists the stored claim ids and commit(rows, removed) merges
+# the rebuilt rows into the store.
+#
+# Stages with process_batch(handles) -> results skip the worker pool and
+# handle all stale claims in one call (vectorised scoring).
+#
+# Consecutive stages with the same claims and input_hash run as one pass:
+# a worker runs all of them for a claim back to back, so the OCR stages
+# share one cached claim_documents.ClaimDocument per claim.
+
+def ocr_claims() -> dict:
+    return {f.name: f for f in entity_extractor.OCR_DIR.iterdir() if f.is_dir()}
+
+def ocr_input_hash(folder: Path) -> str:
+    # entity extraction reads the claim email before the OCR text
+    email = entity_extractor.RAW_DIR / folder.name / entity_extractor.EMAIL_NAME
+    return stage_manifest.hash_files(list(folder.glob("*.txt")) + ([email] if email.exists() else []))
+
+def entity_claims() -> dict:
+    log = record_log.reader(signal_detector.ENTITIES_LOG)
+    return {claim_id: claim_id for claim_id in log.keys()} if log is not None else {}
+
+def entity_input_hash(claim_id: str) -> str:
+    return stage_manifest.hash_records([signal_detector.ENTITIES_LOG, signal_detector.DUPLICATES_LOG], claim_id)
+
+def signal_claims() -> dict:
+    log = record_log.reader(feature_store_builder.SIGNALS_LOG)
+    return {claim_id: claim_id for claim_id in log.keys()} if log is not None else {}
+
+def signal_input_hash(claim_id: str) -> str:
+    return stage_manifest.hash_records(
+        [feature_store_builder.SIGNALS_LOG, feature_store_builder.FILE_TAGS_LOG, feature_store_builder.ENTITIES_LOG],
+        claim_id
+    )
+
+STAGES = [
+    {
+        "name": "file_tags",
+        "module": file_tagger,
+        "claims": ocr_claims,
+        "input_hash": ocr_input_hash,
+        "log": file_tagger.LOG_NAME,
+        "kind": "json",
+        "process": file_tagger.process_claim,
+    },
+    {
+        "name": "entities",
+        "module": entity_extractor,
+        "claims": ocr_claims,
+        "input_hash": ocr_input_hash,
+        "log": entity_extractor.LOG_NAME,
+        "kind": "json",
+        "process": entity_extractor.process_claim,
+    },
+    {
+        "name": "summaries",
+        "module": summary_generator,
+        "claims": ocr_claims,
+        "input_hash": ocr_input_hash,
+        "log": summary_generator.LOG_NAME,
+        "kind": "text",
+        "process": summary_generator.process_claim,
+    },
+    {
+        "name": "signals",
+        "module": signal_detector,
+        "claims": entity_claims,
+        "input_hash": entity_input_hash,
+        "log": signal_detector.LOG_NAME,
+        "kind": "json",
+        "process": signal_detector.process_claim,
+        "process_batch": signal_detector.process_claims,
+    },
+    {
+        "name": "feature_store",
+        "module": feature_store_builder,
+        "claims": signal_claims,
+        "input_hash": signal_input_hash,
+        "existing": lambda: set(columnar_feature_store.claim_ids(store_dir=feature_store_builder.STORE_DIR)),
+        "commit": feature_store_builder.commit_rows,
+        "process": feature_store_builder.build_claim_row,
+    },
+]
+
+# rewrite a stage log once dead records take up this share of it
+COMPACT_RATIO = 0.5
+
+# -------------------------------------------------
+# HELPERS
+# -------------------------------------------------
+
+def put_record(log, claim_id: str, result, kind: str):
+    if result is None:
+        log.delete(claim_id)
+    elif kind == "text":
+        log.put_text(claim_id, result)
+    else:
+        log.put_json(claim_id, result)
+
+def maybe_compact(name: str, log):
+    dead = log.dead_bytes()
+    if dead and dead >= COMPACT_RATIO * log.path.stat().st_size:
+        print(f"🗜️ {name}: compacted, {log.compact()} bytes reclaimed")
+
+# -------------------------------------------------
+# WORKER
+# -------------------------------------------------
+
+def run_chunk(tasks):
+    # tasks: [(claim_id, handle, [(stage name, process_claim), ...])]
+    done = []
+    for claim_id, handle, steps in tasks:
+        for name, process_claim in steps:
+            done.append((name, claim_id, process_claim(handle)))
+    return done
+
+# -------------------------------------------------
+# STAGE RUNNER (INCREMENTAL)
+# -------------------------------------------------
+
+def group_stages(stages: list) -> list:
+    groups = []
+    for stage in stages:
+        last = groups[-1][-1] if groups else None
+        if (
+            last is not None
+            and last["claims"] is stage["claims"]
+            and last["input_hash"] is stage["input_hash"]
+        ):
+            groups[-1].append(stage)
+        else:
+            groups.append([stage])
+    return groups
+
+def run_stages(stages: list, executor) -> list:
+    """
+    Incremental run of stages sharing one claims/input_hash: each claim's
+    inputs are hashed once, and every stale (claim, stage) pair of a
+    claim goes to the same worker task.
+    """
+    start = time.perf_counter()
+
+    manifests = {s["name"]: stage_manifest.load_manifest(s["name"]) for s in stages}
+    versions = {s["name"]: stage_manifest.code_version(s["module"]) for s in stages}
+
+    # -------- what changed since the last run --------
+    first = stages[0]
+    inputs = first["claims"]()
+
+    existing = {s["name"]: s["existing"]() for s in stages if "existing" in s}
+    records = {
+        s["name"]: record_log.open_log(s["log"], writable=True)
+        for s in stages if "log" in s
+    }
+
+    def has_output(stage, claim_id):
+        if "existing" in stage:
+            return claim_id in existing[stage["name"]]
+        return claim_id in records[stage["name"]]
+
+    todo = {s["name"]: [] for s in stages}
+    hashes = {}
+    tasks = []
+
+    for claim_id in sorted(inputs):
+        input_hash = hashes[claim_id] = first["input_hash"](inputs[claim_id])
+        steps = []
+
+        for stage in stages:
+            name = stage["name"]
+            if (
+                stage_manifest.is_current(manifests[name], claim_id, input_hash, versions[name])
+                and has_output(stage, claim_id)
+            ):
+                continue
+            todo[name].append(claim_id)
+            if "process_batch" not in stage:
+                steps.append((name, stage["process"]))
+
+        if steps:
+            tasks.append((claim_id, inputs[claim_id], steps))
+
+    # -------- inputs vanished -> drop outputs --------
+    removed = {}
+    for stage in stages:
+        name = stage["name"]
+
+        if "existing" in stage:
+            # bulk store: dropped in commit() together with the new rows
+            removed[name] = existing[name] - set(inputs)
+        else:
+            log = records[name]
+            removed[name] = set(log.keys()) - set(inputs)
+            for claim_id in removed[name]:
+                log.delete(claim_id)
+
+        for claim_id in removed[name]:
+            manifests[name].pop(claim_id, None)
+
+        print(
+            f"▶️ {name}: {len(todo[name])} new/changed, "
+            f"{len(inputs) - len(todo[name])} unchanged, {len(removed[name])} removed"
+        )
+
+    # -------- process the delta --------
+    chunks = [tasks[i:i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE)]
+    futures = [executor.submit(run_chunk, chunk) for chunk in chunks]
+
+    kinds = {s["name"]: s.get("kind") for s in stages}
+    rows = {s["name"]: {} for s in stages if "commit" in s}
+
+    logs = {s["name"]: open(stage_manifest.journal_file(s["name"]), "a") for s in stages}
+
+    def store(results):
+        entries = []
+        for name, claim_id, result in results:
+            if name in rows:
+                rows[name][claim_id] = result
+            else:
+                put_record(records[name], claim_id, result, kinds[name])
+
+            entry = {"input_hash": hashes[claim_id], "code_version": versions[name]}
+            manifests[name][claim_id] = entry
+            entries.append((name, claim_id, entry))
+
+        # records reach the log before the journal marks them done
+        for log in records.values():
+            log.flush()
+        for name, claim_id, entry in entries:
+            stage_manifest.append_journal(logs[name], claim_id, entry)
+        for log in logs.values():
+            log.flush()
+
+    try:
+        for future in as_completed(futures):
+            store(future.result())
+
+        for stage in stages:
+            if "process_batch" in stage and todo[stage["name"]]:
+                claim_ids = todo[stage["name"]]
+                results = stage["process_batch"]([inputs[c] for c in claim_ids])
+                store((stage["name"], c, r) for c, r in zip(claim_ids, results))
+    finally:
+        for log in logs.values():
+            log.close()
+        for name, log in records.items():
+            maybe_compact(name, log)
+            log.close()
+
+    # bulk stores first: a crash before this point leaves journal entries
+    # for claims missing from the store, which has_output() re-runs
+    for stage in stages:
+        if "commit" in stage:
+            stage["commit"](rows[stage["name"]], removed[stage["name"]])
+
+    for name, manifest in manifests.items():
+        stage_manifest.save_manifest(name, manifest)
+
+    elapsed = time.perf_counter() - start
+    stats = []
+
+    for stage in stages:
+        name = stage["name"]
+        claims = len(todo[name])
+        rate = claims / elapsed if elapsed > 0 else 0.0
+
+        print(f"⏱️ {name}: {claims} claims in {elapsed:.2f}s ({rate:.1f} claims/sec)")
+
+        stats.append({
+            "stage": name,
+            "claims": claims,
+            "unchanged": len(inputs) - claims,
+            "removed": len(removed[name]),
+            "seconds": round(elapsed, 3),
+            "claims_per_sec": round(rate, 1)
+        })
+
+    return stats
+
+def run_stage(stage: dict, executor) -> dict:
+    return run_stages([stage], executor)[0]
+
+# -------------------------------------------------
+# VECTOR STORE (WHOLE CORPUS)
+# -------------------------------------------------
+
+def run_vector_stage():
+    name = "vector_store"
+    manifest = stage_manifest.load_manifest(name)
+    version = stage_manifest.code_version(semantic_store_builder)
+
+    start = time.perf_counter()
+
+    input_hash = stage_manifest.hash_files(
+        columnar_feature_store.partition_files(semantic_store_builder.FEATURE_DIR).values()
+    )
+
+    if (
+        stage_manifest.is_current(manifest, name, input_hash, version)
+        and vector_generations.current_generation() is not None
+    ):
+        print(f"▶️ {name}: unchanged, skipping rebuild")
+        rebuilt = False
+    else:
+        if manifest.get(name, {}).get("code_version") == version:
+            # feature store changed: new / changed claims -> one new segment
+            semantic_store_builder.update_vector_store()
+            semantic_store_builder.merge_segments()
+        else:
+            semantic_store_builder.build_vector_store()
+        manifest[name] = {"input_hash": input_hash, "code_version": version}
+        stage_manifest.save_manifest(name, manifest)
+        rebuilt = True
+
+    elapsed = time.perf_counter() - start
+    print(f"⏱️ {name}: {elapsed:.2f}s")
+
+    return {"stage": name, "rebuilt": rebuilt, "seconds": round(elapsed, 3)}
+
+# -------------------------------------------------
+# PIPELINE
+# -------------------------------------------------
+
+def run_pipeline(workers: int = None, full_rebuild: bool = False, build_vectors: bool = True, ingest: bool = False):
+    if full_rebuild:
+        stage_manifest.clear_manifests()
+
+    workers = workers or os.cpu_count() or 1
+    print(f"🚀 Running pipeline with {workers} workers")
+
+    stats = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # raw EML/PDF/PNG -> data/ocr (off by default: data/ocr may come from elsewhere)
+        if ingest:
+            stats.append(raw_ingestor.ingest(executor=executor))
+
+        # near-duplicate OCR texts across claims, before signals read them
+        stats.append(duplicate_detector.update_index(full_rebuild=full_rebuild, executor=executor))
+
+        for group in group_stages(STAGES):
+            stats.extend(run_stages(group, executor))
+
+    if build_vectors:
+        stats.append(run_vector_stage())
+
+    print("✅ PIPELINE COMPLETE")
+    return stats
+
+# -------------------------------------------------
+# RUN
+# -------------------------------------------------
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+
+    run_pipeline(
+        workers=int(args[0]) if args else None,
+        full_rebuild="--full" in sys.argv,
+        ingest="--ingest" in sys.argv
+    )
@@ -0,0 +1,297 @@
+# raw_ingestor.py
+#
+# data/raw/ClaimsEnterpriseEML/<claim>/{email.eml, *.pdf, *.png}
+#   -> data/ocr/<claim>/{<stem>.txt, combined.txt}
+#
+#   python raw_ingestor.py [workers] [--full] [--ocr=<backend>]
+
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from email import policy
+from email.parser import BytesParser
+from io import BytesIO
+import hashlib
+import os
+import sys
+import time
+
+import stage_manifest
+from claim_documents import COMBINED_NAME, layout_lines, render_combined, render_pages, txt_name
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+RAW_DIR = DATA_DIR / "raw" / "ClaimsEnterpriseEML"
+OCR_DIR = DATA_DIR / "ocr"
+
+EMAIL_NAME = "email.eml"
+
+PDF_SUFFIXES = {".pdf"}
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".tif", ".tiff"}
+
+# image OCR backend, see OCR_BACKENDS ("none" = images give empty text)
+OCR_BACKEND = os.environ.get("CLAIMS_OCR_BACKEND", "none")
+
+# attachments handed to a worker in one task
+CHUNK_SIZE = 64
+
+MANIFEST_NAME = "ingest"
+
+# -------------------------------------------------
+# EMAIL
+# -------------------------------------------------
+
+def read_email(path: Path):
+    with open(path, "rb") as f:
+        return BytesParser(policy=policy.default).parse(f)
+
+def email_attachments(message) -> dict:
+    attachments = {}
+    for part in message.iter_attachments():
+        name = part.get_filename()
+        if name:
+            attachments[Path(name).name] = part.get_payload(decode=True) or b""
+    return attachments
+
+def claim_attachments(folder: Path) -> dict:
+    """
+    Attachments of one raw claim: MIME parts of email.eml plus the files
+    saved next to it (the synthetic generator writes them side by side).
+    """
+    attachments = {}
+
+    eml = folder / EMAIL_NAME
+    if eml.exists():
+        attachments.update(email_attachments(read_email(eml)))
+
+    for f in folder.iterdir():
+        suffix = f.suffix.lower()
+        if f.is_file() and (suffix in PDF_SUFFIXES or suffix in IMAGE_SUFFIXES):
+            attachments.setdefault(f.name, f.read_bytes())
+
+    return dict(sorted(attachments.items()))
+
+# -------------------------------------------------
+# PDF TEXT LAYER
+# -------------------------------------------------
+
+def layout_text(page) -> str:
+    runs = []
+
+    def visit(text, cm, tm, font, size):
+        if text.strip():
+            x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+            y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+            runs.append((x, y, text.strip()))
+
+    page.extract_text(visitor_text=visit)
+    return layout_lines(runs)
+
+def pdf_pages(data: bytes) -> list:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ImportError("PDF text extraction needs pypdf (pip install pypdf)")
+
+    return [layout_text(page) for page in PdfReader(BytesIO(data)).pages]
+
+# -------------------------------------------------
+# IMAGE OCR BACKENDS (PLUGGABLE)
+# -------------------------------------------------
+# backend.pages(image bytes) -> list of page texts
+
+class NoOCR:
+    name = "none"
+
+    def pages(self, data: bytes) -> list:
+        return []
+
+
+class TesseractOCR:
+    name = "tesseract"
+
+    def __init__(self):
+        try:
+            import pytesseract
+            from PIL import Image
+        except ImportError:
+            raise ImportError("tesseract backend needs pytesseract and Pillow")
+
+        self.pytesseract = pytesseract
+        self.Image = Image
+
+    def pages(self, data: bytes) -> list:
+        image = self.Image.open(BytesIO(data))
+        return [self.pytesseract.image_to_string(image).strip()]
+
+
+OCR_BACKENDS = {
+    NoOCR.name: NoOCR,
+    TesseractOCR.name: TesseractOCR,
+}
+
+def register_ocr_backend(name: str, backend_cls):
+    OCR_BACKENDS[name] = backend_cls
+
+def get_ocr_backend(name: str = None):
+    name = name or OCR_BACKEND
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend {name!r} (choose from {sorted(OCR_BACKENDS)})")
+    return OCR_BACKENDS[name]()
+
+# -------------------------------------------------
+# WORKER
+# -------------------------------------------------
+
+def extract_text(name: str, data: bytes, backend) -> str:
+    suffix = Path(name).suffix.lower()
+
+    if suffix in PDF_SUFFIXES:
+        return render_pages(pdf_pages(data))
+    if suffix in IMAGE_SUFFIXES:
+        return render_pages(backend.pages(data))
+    return ""
+
+def run_chunk(tasks, backend_name: str):
+    # tasks: [(claim_id, attachment name, bytes)]
+    backend = get_ocr_backend(backend_name)
+    done = []
+
+    for claim_id, name, data in tasks:
+        out = OCR_DIR / claim_id
+        out.mkdir(parents=True, exist_ok=True)
+        (out / txt_name(name)).write_text(extract_text(name, data, backend), encoding="utf-8")
+        done.append((claim_id, name))
+
+    return done
+
+# -------------------------------------------------
+# INGEST (INCREMENTAL)
+# -------------------------------------------------
+
+def write_combined(claim_id: str, names: list):
+    out = OCR_DIR / claim_id
+    files = [
+        (name, (out / txt_name(name)).read_text(encoding="utf-8", errors="ignore"))
+        for name in names
+    ]
+    (out / COMBINED_NAME).write_text(render_combined(files), encoding="utf-8")
+
+def ingest(workers: int = None, full_rebuild: bool = False, backend: str = None, executor=None) -> dict:
+    """
+    Extracts every new or changed attachment (sha256 of its bytes, per
+    attachment) in a worker pool and rebuilds combined.txt of the claims
+    that changed. Manifest entries are keyed "<claim>/<attachment>".
+    """
+    backend = backend or OCR_BACKEND
+    get_ocr_backend(backend)  # fail fast on a missing backend
+
+    manifest = {} if full_rebuild else stage_manifest.load_manifest(MANIFEST_NAME)
+    version = stage_manifest.code_version(sys.modules[__name__]) + f":{backend}"
+
+    start = time.perf_counter()
+    OCR_DIR.mkdir(parents=True, exist_ok=True)
+
+    # -------- what changed since the last run --------
+    claims = {}
+    todo = []
+    hashes = {}
+    touched = set()
+
+    for folder in sorted(f for f in RAW_DIR.iterdir() if f.is_dir()):
+        claim_id = folder.name
+        attachments = claim_attachments(folder)
+        claims[claim_id] = list(attachments)
+
+        for name, data in attachments.items():
+            key = f"{claim_id}/{name}"
+            input_hash = hashlib.sha256(data).hexdigest()
+
+            if (
+                stage_manifest.is_current(manifest, key, input_hash, version)
+                and (OCR_DIR / claim_id / txt_name(name)).exists()
+            ):
+                continue
+
+            hashes[key] = input_hash
+            todo.append((claim_id, name, data))
+            touched.add(claim_id)
+
+        if not (OCR_DIR / claim_id / COMBINED_NAME).exists():
+            touched.add(claim_id)
+
+    # -------- attachments / claims vanished -> drop their text --------
+    removed = 0
+    for key in list(manifest):
+        claim_id, _, name = key.partition("/")
+        if name in claims.get(claim_id, ()):
+            continue
+
+        (OCR_DIR / claim_id / txt_name(name)).unlink(missing_ok=True)
+        manifest.pop(key)
+        removed += 1
+
+        if claim_id in claims:
+            touched.add(claim_id)
+        else:
+            (OCR_DIR / claim_id / COMBINED_NAME).unlink(missing_ok=True)
+
+    print(
+        f"▶️ ingest: {len(todo)} new/changed attachments in {len(touched)} claims, "
+        f"{removed} removed (OCR backend: {backend})"
+    )
+
+    # -------- extract the delta --------
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+
+    try:
+        chunks = [todo[i:i + CHUNK_SIZE] for i in range(0, len(todo), CHUNK_SIZE)]
+        futures = [executor.submit(run_chunk, chunk, backend) for chunk in chunks]
+
+        with open(stage_manifest.journal_file(MANIFEST_NAME), "a") as log:
+            for future in as_completed(futures):
+                for claim_id, name in future.result():
+                    key = f"{claim_id}/{name}"
+                    entry = {"input_hash": hashes[key], "code_version": version}
+                    manifest[key] = entry
+                    stage_manifest.append_journal(log, key, entry)
+                log.flush()
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    # -------- combined.txt of every claim that changed --------
+    for claim_id in sorted(touched & set(claims)):
+        write_combined(claim_id, claims[claim_id])
+
+    stage_manifest.save_manifest(MANIFEST_NAME, manifest)
+
+    elapsed = time.perf_counter() - start
+    rate = len(todo) / elapsed if elapsed > 0 else 0.0
+
+    print(f"⏱️ ingest: {len(todo)} attachments in {elapsed:.2f}s ({rate:.1f} attachments/sec)")
+
+    return {
+        "stage": "ingest",
+        "attachments": len(todo),
+        "claims": len(touched),
+        "removed": removed,
+        "seconds": round(elapsed, 3),
+        "attachments_per_sec": round(rate, 1)
+    }
+
+# -------------------------------------------------
+# RUN
+# -------------------------------------------------
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    backend = next((a.split("=", 1)[1] for a in sys.argv[1:] if a.startswith("--ocr=")), None)
+
+    ingest(
+        workers=int(args[0]) if args else None,
+        full_rebuild="--full" in sys.argv,
+        backend=backend
+    )
+    print("✅ INGESTION COMPLETE")
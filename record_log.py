@@ -0,0 +1,342 @@
+# record_log.py
+#
+# Append-only record log: one file per stage instead of one directory
+# per claim.
+#
+#   data/records/<stage>.log   MAGIC + records
+#   data/records/<stage>.idx   {"log_size": n, "offsets": {key: offset}}
+#
+#   record = <key_len u32><value_len u32><flags u8><crc32 u32><key><value>
+#
+# The last record of a key wins; a TOMBSTONE record deletes it. The .idx
+# covers the log up to log_size and records after that are re-scanned on
+# open, so a crash only costs a short scan (a torn last record is cut).
+# Reads go through an mmap of the log: O(1) lookup by claim id.
+#
+#   python record_log.py compact [stage ...]
+#   python record_log.py export <stage> [out_dir]
+#   python record_log.py import [stage ...]
+
+from pathlib import Path
+from functools import lru_cache
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+RECORD_DIR = DATA_DIR / "records"
+
+MAGIC = b"CLMLOG1\n"
+HEADER = struct.Struct("<IIBI")
+TOMBSTONE = 1
+
+# legacy per-claim layout: stage -> (directory, file name, value kind)
+LEGACY_LAYOUT = {
+    "file_tags": (DATA_DIR / "file_tags", "FILE_TAGS.json", "json"),
+    "entities": (DATA_DIR / "entities", "ENTITIES.json", "json"),
+    "signals": (DATA_DIR / "signals", "SIGNALS.json", "json"),
+    "summaries": (DATA_DIR / "summaries", "CLAIM_SUMMARY.txt", "text"),
+}
+
+# -------------------------------------------------
+# LOG
+# -------------------------------------------------
+
+class RecordLog:
+    def __init__(self, path: Path, writable: bool = False):
+        self.path = Path(path)
+        self.index_path = self.path.with_suffix(".idx")
+        self.writable = writable
+
+        if not self.path.exists():
+            if not writable:
+                raise FileNotFoundError(f"No record log at {self.path}")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "wb") as f:
+                f.write(MAGIC)
+
+        self._file = open(self.path, "r+b" if writable else "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{self.path} is not a record log")
+
+        self._map = None
+        self._offsets = {}
+        self._size = os.fstat(self._file.fileno()).st_size
+
+        self._scan(self._load_index())
+
+    # ---------------- INDEX ----------------
+
+    def _load_index(self) -> int:
+        # returns the log offset the saved index covers
+        if self.index_path.exists():
+            try:
+                with open(self.index_path) as f:
+                    saved = json.load(f)
+                if saved["log_size"] <= self._size:
+                    self._offsets = saved["offsets"]
+                    return saved["log_size"]
+            except (ValueError, KeyError):
+                pass
+        self._offsets = {}
+        return len(MAGIC)
+
+    def _scan(self, offset: int):
+        view = self._view()
+
+        while offset + HEADER.size <= self._size:
+            key_len, value_len, flags, crc = HEADER.unpack_from(view, offset)
+            end = offset + HEADER.size + key_len + value_len
+            if end > self._size:
+                break
+
+            body = view[offset + HEADER.size:end]
+            if zlib.crc32(body) != crc:
+                break
+
+            key = bytes(body[:key_len]).decode()
+            if flags & TOMBSTONE:
+                self._offsets.pop(key, None)
+            else:
+                self._offsets[key] = offset
+            offset = end
+
+        # torn tail from a crashed writer
+        if offset < self._size and self.writable:
+            self._close_map()
+            self._file.truncate(offset)
+            self._size = offset
+
+    def save_index(self):
+        tmp = self.index_path.with_suffix(".idx.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"log_size": self._size, "offsets": self._offsets}, f)
+        os.replace(tmp, self.index_path)
+
+    # ---------------- MMAP ----------------
+
+    def _view(self):
+        if self._map is None or len(self._map) != self._size:
+            self._close_map()
+            if self.writable:
+                self._file.flush()  # buffered appends must be on disk to map them
+            self._map = mmap.mmap(self._file.fileno(), self._size, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    # ---------------- READ ----------------
+
+    def get(self, key: str):
+        offset = self._offsets.get(key)
+        if offset is None:
+            return None
+
+        view = self._view()
+        key_len, value_len, _, _ = HEADER.unpack_from(view, offset)
+        start = offset + HEADER.size + key_len
+        return view[start:start + value_len]
+
+    def get_json(self, key: str):
+        value = self.get(key)
+        return json.loads(value) if value is not None else None
+
+    def get_text(self, key: str):
+        value = self.get(key)
+        return value.decode() if value is not None else None
+
+    def keys(self) -> list:
+        return sorted(self._offsets)
+
+    def items(self):
+        for key in self.keys():
+            yield key, self.get(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    # ---------------- WRITE ----------------
+
+    def _append(self, key: str, value: bytes, flags: int = 0) -> int:
+        if not self.writable:
+            raise PermissionError(f"{self.path} was opened read-only")
+
+        key_bytes = key.encode()
+        body = key_bytes + value
+        offset = self._size
+
+        self._file.seek(offset)
+        self._file.write(HEADER.pack(len(key_bytes), len(value), flags, zlib.crc32(body)))
+        self._file.write(body)
+        self._size = offset + HEADER.size + len(body)
+        return offset
+
+    def put(self, key: str, value: bytes):
+        self._offsets[key] = self._append(key, value)
+
+    def put_json(self, key: str, obj):
+        self.put(key, json.dumps(obj).encode())
+
+    def put_text(self, key: str, text: str):
+        self.put(key, text.encode())
+
+    def delete(self, key: str):
+        if key in self._offsets:
+            self._append(key, b"", TOMBSTONE)
+            del self._offsets[key]
+
+    def flush(self):
+        self._file.flush()
+
+    # ---------------- COMPACTION ----------------
+
+    def dead_bytes(self) -> int:
+        live = sum(
+            HEADER.size + len(k.encode()) + len(self.get(k))
+            for k in self._offsets
+        )
+        return self._size - len(MAGIC) - live
+
+    def compact(self) -> int:
+        """
+        Rewrites the live records (sorted by key) into a new log and
+        swaps it in. Returns the bytes reclaimed.
+        """
+        before = self._size
+        tmp = self.path.with_suffix(".log.tmp")
+
+        with RecordLog(tmp, writable=True) as out:
+            for key, value in self.items():
+                out.put(key, bytes(value))
+            out.flush()
+            os.fsync(out._file.fileno())
+            out.save_index()
+
+        self._close_map()
+        self._file.close()
+
+        os.replace(tmp, self.path)
+        os.replace(tmp.with_suffix(".idx"), self.index_path)
+
+        self._file = open(self.path, "r+b" if self.writable else "rb")
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._scan(self._load_index())
+
+        return before - self._size
+
+    # ---------------- LIFECYCLE ----------------
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self.writable:
+            self.flush()
+            self.save_index()
+        self._close_map()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# -------------------------------------------------
+# STAGE LOGS
+# -------------------------------------------------
+
+def log_path(stage: str, record_dir: Path = RECORD_DIR) -> Path:
+    return Path(record_dir) / f"{stage}.log"
+
+def open_log(stage: str, writable: bool = False, record_dir: Path = RECORD_DIR) -> RecordLog:
+    return RecordLog(log_path(stage, record_dir), writable=writable)
+
+@lru_cache(maxsize=16)
+def _cached_reader(path: str, stamp: tuple) -> RecordLog:
+    return RecordLog(Path(path))
+
+def reader(stage: str, record_dir: Path = RECORD_DIR):
+    """
+    Shared read-only view of a stage log for this process (workers look
+    up upstream records through it). Re-opened when the log changes;
+    None if the stage has not written a log yet.
+    """
+    path = log_path(stage, record_dir)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return _cached_reader(str(path), (st.st_size, st.st_mtime_ns))
+
+def read_json(stage: str, claim_id: str):
+    log = reader(stage)
+    return log.get_json(claim_id) if log is not None else None
+
+# -------------------------------------------------
+# LEGACY LAYOUT
+# -------------------------------------------------
+
+def import_legacy(stage: str) -> int:
+    # data/<stage>/<claim>/<FILE> -> data/records/<stage>.log
+    directory, file_name, kind = LEGACY_LAYOUT[stage]
+    count = 0
+
+    with open_log(stage, writable=True) as log:
+        for path in sorted(directory.glob(f"*/{file_name}")):
+            if kind == "json":
+                log.put_json(path.parent.name, json.loads(path.read_text()))
+            else:
+                log.put_text(path.parent.name, path.read_text())
+            count += 1
+
+    return count
+
+def export_legacy(stage: str, out_dir: Path = None) -> int:
+    directory, file_name, kind = LEGACY_LAYOUT[stage]
+    out_dir = Path(out_dir or directory)
+
+    with open_log(stage) as log:
+        for claim_id, value in log.items():
+            out = out_dir / claim_id
+            out.mkdir(parents=True, exist_ok=True)
+
+            if kind == "json":
+                with open(out / file_name, "w") as f:
+                    json.dump(json.loads(value), f, indent=2)
+            else:
+                (out / file_name).write_text(bytes(value).decode())
+
+        return len(log)
+
+# -------------------------------------------------
+# RUN
+# -------------------------------------------------
+
+if __name__ == "__main__":
+    command, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else ("compact", [])
+
+    if command == "compact":
+        for stage in args or sorted(p.stem for p in RECORD_DIR.glob("*.log")):
+            with open_log(stage, writable=True) as log:
+                print(f"🗜️ {stage}: {len(log)} records, {log.compact()} bytes reclaimed")
+
+    elif command == "export":
+        count = export_legacy(args[0], args[1] if len(args) > 1 else None)
+        print(f"📤 {args[0]}: {count} claims exported")
+
+    elif command == "import":
+        for stage in args or list(LEGACY_LAYOUT):
+            print(f"📥 {stage}: {import_legacy(stage)} claims imported")
+
+    else:
+        print("usage: python record_log.py compact|export|import [stage ...]")
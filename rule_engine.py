@@ -0,0 +1,266 @@
+# rule_engine.py
+#
+# Decision rules from a versioned config (decision_rules.json) compiled
+# into an ordered decision table: the first rule whose condition holds
+# fires, a rule without "when" always does (the default).
+#
+#   condition = {"all": [condition, ...]}
+#             | {"any": [condition, ...]}
+#             | {"not": condition}
+#             | {"field": f, "op": op, "value": v}
+#             | {"field": f, "op": op, "threshold": name}   # thresholds[name]
+#
+#   ops: == != < <= > >= in   and   true / false (truthiness, no value)
+#
+# A compiled table evaluates one claim (facts dict) or a batch of claims
+# as columns, one NumPy mask per rule. A missing / None field never
+# satisfies a comparison (NaN in numeric columns).
+
+from pathlib import Path
+from functools import lru_cache
+import hashlib
+import json
+import operator
+import os
+import time
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+RULES_FILE = Path(os.environ.get("CLAIMS_DECISION_RULES", BASE_DIR / "decision_rules.json"))
+
+COMPARE_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+NUMERIC_OPS = {"<", "<=", ">", ">="}
+TRUTH_OPS = {"true", "false"}
+
+# -------------------------------------------------
+# COMPILE
+# -------------------------------------------------
+
+def compile_condition(cond: dict, thresholds: dict):
+    """
+    -> (test(facts) -> bool, mask(columns) -> bool array, fields)
+    where columns(field, kind) returns the batch column of a field as
+    kind "number" (float, NaN = missing), "truth" (bool), "value"
+    (object) or "present" (bool, not None).
+    """
+    if cond is None:
+        return (lambda facts: True), (lambda columns: columns.ones()), set()
+
+    if "all" in cond or "any" in cond:
+        combine = "all" if "all" in cond else "any"
+        parts = [compile_condition(c, thresholds) for c in cond[combine]]
+        tests = [t for t, _, _ in parts]
+        masks = [m for _, m, _ in parts]
+        fields = set().union(*(f for _, _, f in parts))
+
+        if combine == "all":
+            def test(facts):
+                return all(t(facts) for t in tests)
+
+            def mask(columns):
+                out = columns.ones()
+                for m in masks:
+                    out = out & m(columns)
+                return out
+        else:
+            def test(facts):
+                return any(t(facts) for t in tests)
+
+            def mask(columns):
+                out = ~columns.ones()
+                for m in masks:
+                    out = out | m(columns)
+                return out
+
+        return test, mask, fields
+
+    if "not" in cond:
+        inner_test, inner_mask, fields = compile_condition(cond["not"], thresholds)
+        return (lambda facts: not inner_test(facts)), (lambda columns: ~inner_mask(columns)), fields
+
+    field, op = cond["field"], cond["op"]
+
+    if op in TRUTH_OPS:
+        expected = op == "true"
+        return (
+            (lambda facts: bool(facts.get(field)) == expected),
+            (lambda columns: columns(field, "truth") == expected),
+            {field},
+        )
+
+    if "threshold" in cond:
+        if cond["threshold"] not in thresholds:
+            raise KeyError(f"Unknown threshold {cond['threshold']!r} in rule condition")
+        value = thresholds[cond["threshold"]]
+    else:
+        value = cond["value"]
+
+    if op == "in":
+        allowed = list(value)
+        return (
+            (lambda facts: facts.get(field) in allowed),
+            (lambda columns: np.isin(columns(field, "value"), allowed)),
+            {field},
+        )
+
+    if op not in COMPARE_OPS:
+        raise ValueError(f"Unknown rule op {op!r}")
+    compare = COMPARE_OPS[op]
+
+    def test(facts):
+        actual = facts.get(field)
+        return actual is not None and compare(actual, value)
+
+    numeric = op in NUMERIC_OPS or isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    def mask(columns):
+        column = columns(field, "number" if numeric else "value")
+        with np.errstate(invalid="ignore"):
+            return compare(column, value) & columns(field, "present")
+
+    return test, mask, {field}
+
+# -------------------------------------------------
+# DECISION TABLE
+# -------------------------------------------------
+
+class Columns:
+    """
+    Lazily built batch columns over a list of facts dicts (or arrays
+    given up front, e.g. straight from columnar_feature_store).
+    """
+
+    def __init__(self, facts: list = None, arrays: dict = None, n: int = None):
+        self.facts = facts or []
+        self.arrays = dict(arrays or {})
+        self.n = len(self.facts) if n is None else n
+        self._built = {}
+
+    def ones(self):
+        return np.ones(self.n, dtype=bool)
+
+    def __call__(self, field: str, kind: str):
+        key = (field, kind)
+        if key not in self._built:
+            if field in self.arrays:
+                values = self.arrays[field]
+            else:
+                values = [f.get(field) for f in self.facts]
+            self._built[key] = self._convert(values, kind)
+        return self._built[key]
+
+    @staticmethod
+    def _convert(values, kind: str):
+        if isinstance(values, np.ndarray) and values.dtype.kind in "biuf":
+            # typed column: nothing is missing
+            return {
+                "number": values.astype(np.float64),
+                "truth": values.astype(bool),
+                "present": np.ones(len(values), dtype=bool),
+            }.get(kind, values.astype(object))
+
+        out = np.empty(len(values), dtype=object)
+        out[:] = list(values)
+
+        if kind == "truth":
+            return out.astype(bool)
+        if kind == "present":
+            return np.array([v is not None for v in out], dtype=bool)
+        if kind == "number":
+            return np.array([np.nan if v is None else v for v in out], dtype=np.float64)
+        return out
+
+
+class DecisionTable:
+    def __init__(self, config: dict):
+        self.version = config["version"]
+        # content hash: changes on any edit, even without a version bump
+        self.digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+        self.thresholds = dict(config.get("thresholds", {}))
+        self.rules = []
+
+        for rule in config["rules"]:
+            test, mask, fields = compile_condition(rule.get("when"), self.thresholds)
+            self.rules.append({
+                "id": rule["id"],
+                "decision": rule["decision"],
+                "reason": rule["reason"],
+                "test": test,
+                "mask": mask,
+                "fields": fields,
+            })
+
+        if not self.rules or "when" in config["rules"][-1]:
+            raise ValueError("the last decision rule must be a default (no 'when')")
+
+    @property
+    def fields(self) -> set:
+        return set().union(*(r["fields"] for r in self.rules))
+
+    def decide(self, facts: dict) -> dict:
+        # first matching rule
+        for rule in self.rules:
+            if rule["test"](facts):
+                return rule
+
+    def decide_batch(self, columns: Columns) -> np.ndarray:
+        """
+        Index of the rule that fires for every row. Rows are taken by the
+        first rule whose mask holds, in rule order.
+        """
+        fired = np.full(columns.n, -1, dtype=np.int32)
+        open_rows = columns.ones()
+
+        for i, rule in enumerate(self.rules):
+            hit = open_rows & rule["mask"](columns)
+            fired[hit] = i
+            open_rows &= ~hit
+            if not open_rows.any():
+                break
+
+        return fired
+
+# -------------------------------------------------
+# LOADING
+# -------------------------------------------------
+
+# how often (seconds) load_rules() re-checks the config file for edits
+RELOAD_CHECK_SECONDS = 1.0
+
+_checked = {}
+
+@lru_cache(maxsize=4)
+def _cached_table(path: str, stamp: int) -> DecisionTable:
+    with open(path) as f:
+        return DecisionTable(json.load(f))
+
+def load_rules(path: Path = None) -> DecisionTable:
+    """
+    Compiled rules of the config file; recompiled when the file changes,
+    so a threshold edit applies to the next decisions without a deploy.
+    """
+    path = str(path or RULES_FILE)
+    now = time.monotonic()
+
+    checked = _checked.get(path)
+    if checked is not None and now - checked[0] < RELOAD_CHECK_SECONDS:
+        return checked[1]
+
+    table = _cached_table(path, os.stat(path).st_mtime_ns)
+    _checked[path] = (now, table)
+    return table
+
+def reload_rules():
+    # next load_rules() call re-reads the config immediately
+    _checked.clear()
+
+def threshold(name: str, path: Path = None) -> float:
+    return load_rules(path).thresholds[name]
@@ -0,0 +1,105 @@
+# scoring_client.py
+#
+# Stand-in client for load-testing scoring_service.py locally.
+#
+#   python scoring_client.py [requests] [concurrency] [port]
+
+from pathlib import Path
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+
+from columnar_feature_store import read_features
+
+BASE_DIR = Path(__file__).resolve().parent
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# -------------------------------------------------
+# HTTP (KEEP-ALIVE)
+# -------------------------------------------------
+
+async def request(reader, writer, method: str, path: str, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\n"
+        f"Host: {HOST}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+
+    return status, json.loads(await reader.readexactly(length))
+
+# -------------------------------------------------
+# LOAD TEST
+# -------------------------------------------------
+
+async def worker(claims, counter, latencies, errors, port):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        while True:
+            i = counter["next"]
+            if i >= counter["total"]:
+                break
+            counter["next"] += 1
+
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, "POST", "/score", claims[i % len(claims)])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+async def load_test(total: int = 2000, concurrency: int = 32, port: int = PORT):
+    claims = read_features()
+
+    counter = {"next": 0, "total": total}
+    latencies = []
+    errors = []
+
+    print(f"🚀 {total} /score requests, {concurrency} connections")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(claims, counter, latencies, errors, port)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"⏱️ {total / elapsed:.1f} req/sec, errors: {len(errors)}")
+    print(f"   client p50 {p50:.2f}ms  p95 {p95:.2f}ms  p99 {p99:.2f}ms")
+
+    reader, writer = await asyncio.open_connection(HOST, port)
+    _, metrics = await request(reader, writer, "GET", "/metrics")
+    writer.close()
+
+    print("📊 server metrics:")
+    print(json.dumps(metrics, indent=2))
+
+# -------------------------------------------------
+# RUN
+# -------------------------------------------------
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(load_test(*args))
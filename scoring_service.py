@@ -0,0 +1,304 @@
+# scoring_service.py
+#
+# Long-running local scoring API (stdlib asyncio, no framework).
+#
+#   POST /score         one feature-store dict   -> {"retrieval": ..., "decision": ...}
+#   POST /score_batch   list of feature dicts    -> list of the above
+#   GET  /metrics       request counts, batch sizes, p50/p95/p99 latency, cache hit rate
+#   GET  /health        loaded vector store generation
+#
+#   python scoring_service.py [port]
+
+from collections import deque
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+
+from semantic_retriever import get_store
+import decision_cache
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# micro-batching: /score requests arriving within MAX_WAIT_MS are
+# scored together with one find_similar_claims_batch call
+MAX_BATCH = 64
+MAX_WAIT_MS = 5
+
+# latencies kept per route for the percentiles
+METRICS_WINDOW = 10000
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+# -------------------------------------------------
+# SCORING
+# -------------------------------------------------
+
+def score_claims(claims: list) -> list:
+    # repeated feature fingerprints are served from the decision cache
+    return decision_cache.score_claims(claims)
+
+def score_each(claims: list) -> list:
+    # (result, error) per claim, so one malformed claim fails only itself
+    outcomes = []
+    for claim in claims:
+        try:
+            outcomes.append((score_claims([claim])[0], None))
+        except Exception as e:
+            outcomes.append((None, e))
+    return outcomes
+
+# -------------------------------------------------
+# METRICS
+# -------------------------------------------------
+
+class LatencyMetrics:
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = window
+        self.latencies = {}
+        self.counts = {}
+        self.errors = 0
+        self.batch_sizes = deque(maxlen=window)
+        self.started = time.time()
+
+    def record(self, route: str, seconds: float):
+        if route not in self.latencies:
+            self.latencies[route] = deque(maxlen=self.window)
+            self.counts[route] = 0
+        self.latencies[route].append(seconds * 1000)
+        self.counts[route] += 1
+
+    def snapshot(self) -> dict:
+        routes = {}
+        for route, values in self.latencies.items():
+            ms = np.fromiter(values, dtype=np.float64)
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            routes[route] = {
+                "requests": self.counts[route],
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+            }
+
+        return {
+            "uptime_sec": round(time.time() - self.started, 1),
+            "errors": self.errors,
+            "avg_batch_size": (
+                round(sum(self.batch_sizes) / len(self.batch_sizes), 2)
+                if self.batch_sizes else 0
+            ),
+            "routes": routes,
+        }
+
+# -------------------------------------------------
+# MICRO-BATCHER
+# -------------------------------------------------
+
+class MicroBatcher:
+    def __init__(self, metrics: LatencyMetrics, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+
+    async def submit(self, claim: dict) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((claim, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            claims = [claim for claim, _ in batch]
+            self.metrics.batch_sizes.append(len(batch))
+
+            # numpy / sklearn work off the event loop
+            try:
+                results = await loop.run_in_executor(None, score_claims, claims)
+                outcomes = [(result, None) for result in results]
+            except Exception:
+                # a bad claim failed the batch: re-score one by one
+                outcomes = await loop.run_in_executor(None, score_each, claims)
+
+            for (_, future), (result, error) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+# -------------------------------------------------
+# HTTP
+# -------------------------------------------------
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+async def read_request(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        return None
+
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length")
+    if length < 0:
+        raise HttpError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Request body too large")
+
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+def write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool):
+    body = json.dumps(payload).encode()
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+
+# -------------------------------------------------
+# SERVICE
+# -------------------------------------------------
+
+class ScoringService:
+    def __init__(self):
+        self.metrics = LatencyMetrics()
+        self.batcher = MicroBatcher(self.metrics)
+
+    async def route(self, method: str, path: str, body: bytes):
+        if path == "/health":
+            return {"status": "ok", "generation": get_store().generation}
+
+        if path == "/metrics":
+            return {**self.metrics.snapshot(), "cache": decision_cache.get_cache().stats()}
+
+        if path not in ("/score", "/score_batch"):
+            raise HttpError(404, f"Unknown path {path}")
+        if method != "POST":
+            raise HttpError(405, f"{path} expects POST")
+
+        try:
+            payload = json.loads(body or b"null")
+        except json.JSONDecodeError:
+            raise HttpError(400, "Body is not valid JSON")
+
+        if path == "/score":
+            if not isinstance(payload, dict):
+                raise HttpError(400, "/score expects one feature object")
+            return await self.batcher.submit(payload)
+
+        if not isinstance(payload, list):
+            raise HttpError(400, "/score_batch expects a list of feature objects")
+
+        self.metrics.batch_sizes.append(len(payload))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, score_claims, payload)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                start = time.perf_counter()
+                try:
+                    status, payload = 200, await self.route(method, path, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except (KeyError, TypeError) as e:
+                    status, payload = 400, {"error": f"Invalid feature payload: {e}"}
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+
+                if status >= 400:
+                    self.metrics.errors += 1
+                self.metrics.record(path, time.perf_counter() - start)
+
+                write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = HOST, port: int = PORT):
+        # keep the store resident before the first request arrives
+        store = get_store()
+        store.state()
+
+        batcher_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle, host, port)
+
+        print(f"🚀 Scoring service on http://{host}:{port} (store {store.generation})")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+
+# -------------------------------------------------
+# RUN
+# -------------------------------------------------
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(ScoringService().serve(port=int(sys.argv[1]) if len(sys.argv) > 1 else PORT))
+    except KeyboardInterrupt:
+        print("\n🛑 Scoring service stopped")
@@ -1,53 +1,565 @@
 from pathlib import Path
 import json
+import threading
+import time
 import numpy as np
-import joblib
-from sklearn.metrics.pairwise import cosine_similarity
+
+from ann_index import top_k as top_k_ids
+import rule_engine
+from vector_generations import VECTOR_DIR, current_generation, generation_dir, read_manifest, segment_dir
 
 BASE_DIR = Path(__file__).resolve().parent
-VECTOR_DIR = BASE_DIR / "data" / "vector_store"
-
-vectors = np.load(VECTOR_DIR / "vectors.npy")
-metadata = json.load(open(VECTOR_DIR / "metadata.json"))
-vectorizer = joblib.load(VECTOR_DIR / "tfidf.pkl")
-
-
-def feature_to_text(feature: dict) -> str:
-    return (
-        f"Claim type {feature['claim_type']}. "
-        f"Severity {feature['severity']} score {feature['severity_score']}. "
-        f"Medical {feature['has_medical']}. "
-        f"Police {feature['has_police']}. "
-        f"Legal {feature['has_legal']}. "
-        f"Photos {feature['num_photos']}. "
-        f"Files {', '.join(feature['files_present'])}. "
-        f"Signals {', '.join(feature['signals'])}."
+
+# queries scored per matrix product in find_similar_claims_batch
+# (bounds the dense score block to BATCH_BLOCK x store rows)
+BATCH_BLOCK = 1024
+
+# how often (seconds) a query re-reads CURRENT for a new generation
+RELOAD_CHECK_SECONDS = 1.0
+
+# threshold in decision_rules.json behind high_similarity_flag
+HIGH_SIMILARITY_THRESHOLD = "high_similarity"
+
+# -----------------------------
+# FILTERS
+# -----------------------------
+# filters: [(column, op, value), ...], all must hold (AND), ops as in
+# columnar_feature_store (==, !=, <, <=, >, >=, in) over the columns the
+# builder keeps per row: claim_type, carrier, loss_year, severity,
+# severity_score, date_of_loss (ISO string, compares as a date).
+#
+# Segment rows are sorted by partition (claim_type, carrier, loss_year),
+# so a filter on those columns skips whole row ranges. Over the ranges
+# left, a query either
+#   - pre-filters: exact scan of only the matching rows, when there are
+#     at most PREFILTER_MAX_ROWS of them
+#   - post-filters: searches the IVF index of each large partition (the
+#     segment index, limited to the chosen ranges, for the small ones)
+#     for k * (rows in scope / matching rows) * OVERFETCH rows and drops
+#     the ones failing the row filters, doubling the fetch until k survive.
+#
+# same_claim_type=True (default) adds ("claim_type", "==", query type).
+#
+# find_similar_claims_batch() skips the indexes and scans the matching
+# rows exactly, so on large segments its results are exact while the
+# single-query path above is approximate.
+
+PREFILTER_MAX_ROWS = 5000
+OVERFETCH = 2
+
+# unknown carrier / loss date as the builder writes them: such rows only
+# match "!=" filters on that column
+MISSING = {"carrier": "", "date_of_loss": "", "loss_year": 0}
+
+
+def normalize_filters(filters) -> tuple:
+    # hashable form ("in" values come as lists / sets)
+    return tuple(
+        (name, op, tuple(sorted(value)) if isinstance(value, (list, set, tuple)) else value)
+        for name, op, value in filters or []
     )
 
 
-def find_similar_claims(new_feature: dict, top_k: int = 3) -> dict:
-    query_text = feature_to_text(new_feature)
-    query_vec = vectorizer.transform([query_text]).toarray()
+def query_filters(feature: dict, filters=None, same_claim_type: bool = True) -> tuple:
+    filters = normalize_filters(filters)
+    if same_claim_type and feature.get("claim_type"):
+        filters += (("claim_type", "==", feature["claim_type"]),)
+    return filters
+
+
+def filter_mask(columns: dict, filters, n: int) -> np.ndarray:
+    # filters on columns not in `columns` are left to the caller
+    from columnar_feature_store import OPS
+
+    mask = np.ones(n, dtype=bool)
+    for name, op, value in filters:
+        if name not in columns:
+            continue
+        column = columns[name]
+
+        if op == "in":
+            mask &= np.isin(column, list(value))
+        elif op in OPS:
+            mask &= OPS[op](column, value)
+        else:
+            raise ValueError(f"Unknown filter op {op!r}")
+
+        if name in MISSING and op != "!=":
+            mask &= column != MISSING[name]
+    return mask
 
-    scores = cosine_similarity(query_vec, vectors)[0]
-    top_idx = scores.argsort()[-top_k:][::-1]
 
-    matches = []
-    sim_scores = []
+# -----------------------------
+# VECTOR STORE (LAZY)
+# -----------------------------
 
-    for idx in top_idx:
-        sim = float(scores[idx])
-        sim_scores.append(sim)
+class VectorStore:
+    """
+    Loads the published vector store generation on the first query, not
+    at import. Every RELOAD_CHECK_SECONDS a query re-reads the CURRENT
+    pointer; when a new generation was published it is loaded on a
+    background thread while queries keep using the active one, and the
+    two buffers are swapped with one reference assignment once the new
+    generation is fully loaded. Queries never wait on a rebuild and
+    always see one consistent snapshot.
 
-        row = metadata[idx].copy()
-        row["similarity_score"] = round(sim, 3)
-        matches.append(row)
+    Segments are immutable, so a new generation only loads the segments
+    the previous one did not have (an update = one small segment).
+    """
 
-    return {
-        "matches": matches,
-        "similarity_summary": {
-            "max_similarity": round(max(sim_scores), 3),
-            "avg_similarity": round(sum(sim_scores) / len(sim_scores), 3),
-            "high_similarity_flag": max(sim_scores) >= 0.85
+    def __init__(self, vector_dir: Path = VECTOR_DIR):
+        self.vector_dir = Path(vector_dir)
+        self._segments = {}
+        self._state = None
+        self._loading = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # ---------------- LOADING ----------------
+
+    def version(self):
+        return current_generation(self.vector_dir)
+
+    @property
+    def generation(self):
+        state = self._state
+        return state["version"] if state else None
+
+    def _load_segment(self, name: str) -> dict:
+        from ann_index import load_index, BruteForceIndex, IVFIndex
+        from sparse_store import load_csr
+
+        seg_dir = segment_dir(name, self.vector_dir)
+
+        # CSR, memory-mapped -> retriever processes share one copy of the pages
+        vectors = load_csr(seg_dir / "vectors.npz")
+        n = vectors.shape[0]
+
+        with open(seg_dir / "metadata.json") as f:
+            metadata = json.load(f)
+
+        # ANN index if the builder wrote one, exact scan otherwise
+        ann_file = seg_dir / "ann_index.npz"
+        index = (
+            load_index(ann_file, vectors)
+            if ann_file.exists()
+            else BruteForceIndex().build(vectors)
+        )
+
+        # filter columns (older segments: what metadata.json carries)
+        with np.load(seg_dir / "rows.npz") as rows:
+            columns = {c: rows[c] for c in rows.files if c not in ("claim_id", "fingerprint")}
+        if not columns:
+            columns = {
+                c: np.array([m[c] or "" for m in metadata], dtype=str)
+                for c in ("claim_type", "severity")
+            }
+            columns["severity_score"] = np.array([m["severity_score"] or 0 for m in metadata])
+
+        # partitions: key columns + row ranges (older segments: one range),
+        # groups: (start, end, IVF index) of the large key-prefix ranges
+        part_file = seg_dir / "partitions.npz"
+        partitions = {"keys": {}, "offsets": np.array([0, n], dtype=np.int64), "groups": []}
+        if part_file.exists():
+            with np.load(part_file) as arrays:
+                partitions["offsets"] = arrays["offsets"]
+                partitions["keys"] = {
+                    c: arrays[c] for c in arrays.files if "." not in c and c not in ("offsets", "groups")
+                }
+                for g, (start, end) in enumerate(arrays["groups"].tolist()):
+                    group_index = IVFIndex.from_arrays({
+                        key: arrays[f"g{g}.{key}"]
+                        for key in ("centroids", "list_offsets", "list_ids", "n_probe")
+                    })
+                    partitions["groups"].append((start, end, group_index.attach(vectors)))
+
+        return {
+            "name": name,
+            "vectors": vectors,
+            "metadata": metadata,
+            "index": index,
+            "columns": columns,
+            "partitions": partitions,
         }
-    }
\ No newline at end of file
+
+    def _load(self, version) -> dict:
+        # heavy imports only when a query actually needs the store
+        from feature_encoder import FeatureEncoder
+
+        if version is None:
+            raise FileNotFoundError(
+                f"No vector store generation published in {self.vector_dir} "
+                "(run semantic_store_builder.py first)"
+            )
+
+        gen_dir = generation_dir(version, self.vector_dir)
+        manifest = read_manifest(version, self.vector_dir)
+
+        with open(gen_dir / "encoder.json") as f:
+            encoder = FeatureEncoder.from_spec(json.load(f))
+
+        loaded = self._segments
+        segments = []
+        metadata = []
+        alive = []
+        offset = 0
+
+        for entry in manifest["segments"]:
+            seg = loaded.get(entry["name"]) or self._load_segment(entry["name"])
+
+            # tombstoned rows stay in the segment, masked out of every search
+            seg_alive = None
+            if entry["deleted"]:
+                seg_alive = np.ones(entry["rows"], dtype=bool)
+                seg_alive[np.array(entry["deleted"], dtype=np.int64)] = False
+
+            segments.append((seg, offset, seg_alive))
+            metadata.extend(seg["metadata"])
+            alive.append(seg_alive if seg_alive is not None else np.ones(entry["rows"], dtype=bool))
+            offset += entry["rows"]
+
+        self._segments = {seg["name"]: seg for seg, _, _ in segments}
+        alive = np.concatenate(alive) if alive else np.zeros(0, dtype=bool)
+
+        return {
+            "version": version,
+            "segments": segments,
+            # row ids below are global: segment offset + row in segment
+            "metadata": metadata,
+            "alive": alive,
+            "live_rows": int(np.count_nonzero(alive)),
+            "encoder": encoder,
+        }
+
+    def _load_in_background(self, version):
+        try:
+            state = self._load(version)
+            self._state = state  # the swap
+        except Exception as e:
+            print(f"⚠️ Vector store {version} failed to load, keeping {self.generation}: {e}")
+        finally:
+            with self._lock:
+                self._loading = None
+
+    def state(self) -> dict:
+        now = time.monotonic()
+        state = self._state
+
+        if state is not None and now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return state
+
+        with self._lock:
+            self._checked_at = now
+            version = self.version()
+
+            # cold start: nothing to serve from yet -> load inline
+            if self._state is None:
+                self._state = self._load(version)
+
+            elif version != self._state["version"] and self._loading != version:
+                if version is None:
+                    return self._state
+                self._loading = version
+                threading.Thread(
+                    target=self._load_in_background, args=(version,), daemon=True
+                ).start()
+
+            return self._state
+
+    def reload(self):
+        # synchronous switch to whatever CURRENT points at
+        with self._lock:
+            self._state = self._load(self.version())
+            self._checked_at = time.monotonic()
+
+    # ---------------- QUERIES ----------------
+
+    def build_result(self, state: dict, top_idx, top_scores) -> dict:
+        metadata = state["metadata"]
+
+        matches = []
+        sim_scores = []
+
+        for idx, score in zip(top_idx, top_scores):
+            sim = float(score)
+            sim_scores.append(sim)
+
+            row = metadata[idx].copy()
+            row["similarity_score"] = round(sim, 3)
+            matches.append(row)
+
+        # empty store -> no matches, zero similarity
+        max_sim = max(sim_scores, default=0.0)
+
+        return {
+            "matches": matches,
+            "similarity_summary": {
+                "max_similarity": round(max_sim, 3),
+                "avg_similarity": round(sum(sim_scores) / len(sim_scores), 3) if sim_scores else 0.0,
+                "high_similarity_flag": bool(sim_scores) and max_sim >= rule_engine.threshold(HIGH_SIMILARITY_THRESHOLD)
+            }
+        }
+
+    def candidate_ranges(self, seg: dict, alive, filters) -> list:
+        """
+        [(partition, start, end, rows or None)] of one segment: the
+        partitions whose key can match, with the live rows passing the
+        filters (None = every row of the range).
+        """
+        partitions = seg["partitions"]
+        offsets = partitions["offsets"]
+        n_parts = len(offsets) - 1
+
+        # key columns decide per partition, the others per row
+        keep = filter_mask(partitions["keys"], filters, n_parts)
+        row_filters = [f for f in filters if f[0] not in partitions["keys"]]
+        for name, _, _ in row_filters:
+            if name not in seg["columns"]:
+                raise KeyError(f"Unknown filter column {name!r}")
+
+        ranges = []
+        for p in np.flatnonzero(keep).tolist():
+            start, end = int(offsets[p]), int(offsets[p + 1])
+
+            rows = None
+            if row_filters or alive is not None:
+                columns = {name: seg["columns"][name][start:end] for name, _, _ in row_filters}
+                mask = filter_mask(columns, row_filters, end - start)
+                if alive is not None:
+                    mask &= alive[start:end]
+                if not mask.all():
+                    rows = start + np.flatnonzero(mask)
+                    if not len(rows):
+                        continue
+
+            ranges.append((p, start, end, rows))
+        return ranges
+
+    @staticmethod
+    def exact_scan(seg: dict, query_vec, k: int, rows):
+        from ann_index import row_scores
+
+        scores = row_scores(seg["vectors"], query_vec, rows)
+        best = top_k_ids(scores, k)
+        return rows[best], scores[best]
+
+    def post_filter(self, seg: dict, index, query_vec, k: int, scope, rows):
+        """
+        Best k of `rows` (matching rows, sorted) through `index`, which
+        may return any row of `scope` (chosen ranges, live): fetches
+        k * scope rows / matching rows * OVERFETCH, doubling until k
+        survive the filters. Once a fetch would cover more rows than
+        match, the matching rows are scanned exactly instead.
+        """
+        scope_rows = int(np.count_nonzero(scope))
+
+        matches = None
+        if len(rows) < scope_rows:
+            matches = np.zeros(len(scope), dtype=bool)
+            matches[rows] = True
+
+        fetch = int(np.ceil(k * scope_rows / len(rows) * OVERFETCH))
+        while fetch < len(rows):
+            ids, scores = index.search(query_vec, fetch, alive=scope)
+            if matches is not None:
+                ok = matches[ids]
+                ids, scores = ids[ok], scores[ok]
+            if len(ids) >= k:
+                return ids[:k], scores[:k]
+            fetch *= 2
+
+        return self.exact_scan(seg, query_vec, k, rows)
+
+    def search_segment(self, seg: dict, alive, query_vec, k: int, filters):
+        # (segment rows, scores): best k rows of one segment under the filters
+        ranges = self.candidate_ranges(seg, alive, filters)
+        if not ranges:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        def matching_rows(members):
+            return np.concatenate([
+                np.arange(start, end) if rows is None else rows
+                for _, start, end, rows in members
+            ])
+
+        # pre-filter: few matching rows -> exact scan of just those
+        rows = matching_rows(ranges)
+        if len(rows) <= PREFILTER_MAX_ROWS:
+            return self.exact_scan(seg, query_vec, k, rows)
+
+        # chosen partitions -> index: the largest indexed range made only of
+        # chosen partitions, else the largest one holding the partition
+        # (the segment index holds all), searched within the chosen rows
+        n = seg["vectors"].shape[0]
+        offsets = seg["partitions"]["offsets"]
+        groups = seg["partitions"]["groups"]
+        by_size = sorted(range(len(groups)), key=lambda g: groups[g][1] - groups[g][0])
+
+        chosen = {r[0]: r for r in ranges}
+        by_index = {}
+
+        for g in reversed(by_size):
+            lo, hi, _ = groups[g]
+            parts = range(*np.searchsorted(offsets, [lo, hi]).tolist())
+            if all(p in chosen for p in parts):
+                by_index[g] = [chosen.pop(p) for p in parts]
+
+        for p, r in chosen.items():
+            covering = [g for g in by_size if groups[g][0] <= r[1] and r[2] <= groups[g][1]]
+            by_index.setdefault(covering[-1] if covering else None, []).append(r)
+
+        ids = []
+        scores = []
+        for g, members in by_index.items():
+            scope = np.zeros(n, dtype=bool)
+            for _, start, end, _ in members:
+                scope[start:end] = True
+            if alive is not None:
+                scope &= alive
+
+            index = seg["index"] if g is None else groups[g][2]
+            idx, sc = self.post_filter(seg, index, query_vec, k, scope, matching_rows(members))
+
+            ids.append(idx)
+            scores.append(sc)
+
+        ids = np.concatenate(ids)
+        scores = np.concatenate(scores)
+        best = top_k_ids(scores, k)
+        return ids[best], scores[best]
+
+    def find_similar_claims(
+        self, new_feature: dict, top_k: int = 3, filters=None, same_claim_type: bool = True
+    ) -> dict:
+        state = self.state()
+        filters = query_filters(new_feature, filters, same_claim_type)
+
+        # query stays a small dense row: CSR matvec over the store is O(nnz)
+        query_vec = state["encoder"].encode(new_feature)
+
+        # rows are L2-normalised -> dot product == cosine similarity;
+        # best top_k of every segment (partition), then the best top_k of those
+        ids = []
+        scores = []
+        for seg, offset, alive in state["segments"]:
+            if filters:
+                idx, sc = self.search_segment(seg, alive, query_vec, top_k, filters)
+            else:
+                idx, sc = seg["index"].search(query_vec, top_k, alive=alive)
+            ids.append(idx + offset)
+            scores.append(sc)
+
+        if not ids:
+            return self.build_result(state, [], [])
+
+        ids = np.concatenate(ids)
+        scores = np.concatenate(scores)
+        best = top_k_ids(scores, top_k)
+
+        return self.build_result(state, ids[best], scores[best])
+
+    def candidate_rows(self, state: dict, filters) -> np.ndarray:
+        # global ids of every live row passing the filters
+        rows = []
+        for seg, offset, alive in state["segments"]:
+            for _, start, end, seg_rows in self.candidate_ranges(seg, alive, filters):
+                rows.append(offset + (np.arange(start, end) if seg_rows is None else seg_rows))
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def find_similar_claims_batch(
+        self, new_features: list, top_k: int = 3, filters=None, same_claim_type: bool = True
+    ) -> list:
+        if not new_features:
+            return []
+
+        state = self.state()
+
+        if state["live_rows"] == 0:
+            return [self.build_result(state, [], []) for _ in new_features]
+
+        query_vecs = state["encoder"].encode_batch(new_features)
+
+        # queries with the same effective filters share one candidate set
+        groups = {}
+        for i, feature in enumerate(new_features):
+            groups.setdefault(query_filters(feature, filters, same_claim_type), []).append(i)
+
+        results = [None] * len(new_features)
+
+        for group_filters, positions in groups.items():
+            if group_filters:
+                rows = self.candidate_rows(state, group_filters)
+                matrix = self.rows_matrix(state, rows)
+                tombstones = None
+            else:
+                rows = np.arange(len(state["alive"]))
+                matrix = [seg["vectors"] for seg, _, _ in state["segments"]]
+                tombstones = ~state["alive"] if state["live_rows"] < len(rows) else None
+
+            k = min(top_k, len(rows) if group_filters else state["live_rows"])
+            if k == 0:
+                for i in positions:
+                    results[i] = self.build_result(state, [], [])
+                continue
+
+            for start in range(0, len(positions), BATCH_BLOCK):
+                chunk = positions[start:start + BATCH_BLOCK]
+                block = query_vecs[chunk].toarray()
+
+                # (candidates x block) -> (block x candidates), segments side by side
+                scores = np.hstack([np.asarray(m @ block.T).T for m in matrix])
+                if tombstones is not None:
+                    scores[:, tombstones] = -np.inf
+
+                top_idx = np.argpartition(scores, -k, axis=1)[:, -k:]
+                top_scores = np.take_along_axis(scores, top_idx, axis=1)
+
+                order = np.argsort(-top_scores, axis=1)
+                top_idx = np.take_along_axis(top_idx, order, axis=1)
+                top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+                for i, idx_row, score_row in zip(chunk, top_idx, top_scores):
+                    results[i] = self.build_result(state, rows[idx_row], score_row)
+
+        return results
+
+    def rows_matrix(self, state: dict, rows: np.ndarray) -> list:
+        # candidate rows (global ids, ascending) as one CSR block per segment
+        out = []
+        for seg, offset, _ in state["segments"]:
+            n = seg["vectors"].shape[0]
+            lo, hi = np.searchsorted(rows, [offset, offset + n])
+            if hi > lo:
+                out.append(seg["vectors"][rows[lo:hi] - offset])
+        return out
+
+
+# -----------------------------
+# MODULE-LEVEL API
+# -----------------------------
+
+_store = VectorStore()
+
+
+def get_store() -> VectorStore:
+    return _store
+
+
+def find_similar_claims(new_feature: dict, top_k: int = 3, filters=None, same_claim_type: bool = True) -> dict:
+    """
+    Best top_k live claims for one feature among those passing `filters`
+    (see FILTERS above); same_claim_type=False also searches the other
+    claim types.
+    """
+    return _store.find_similar_claims(new_feature, top_k, filters, same_claim_type)
+
+
+def find_similar_claims_batch(new_features: list, top_k: int = 3, filters=None, same_claim_type: bool = True) -> list:
+    """
+    find_similar_claims() for many features: one batch encode and one
+    matrix product per block of BATCH_BLOCK queries over the rows their
+    filters leave. Always an exact scan (no ANN index), so it can differ
+    from find_similar_claims(), which searches the approximate IVF index
+    of segments / partitions of BRUTE_MAX_ROWS or more rows.
+    """
+    return _store.find_similar_claims_batch(new_features, top_k, filters, same_claim_type)
@@ -1,79 +1,490 @@
 # semantic_store_builder.py
+#
+# The vector store is a list of immutable segments plus tombstones,
+# published as generations (see vector_generations.py):
+#
+#   build_vector_store()    whole feature store -> one segment
+#   update_vector_store()   only new / changed claims -> one new segment,
+#                           the rows they replace (or whose claim is
+#                           gone) are tombstoned
+#   merge_segments()        folds small segments and tombstoned rows
+#                           back into one segment (MERGE POLICY below)
+#   watch()                 polls the feature store, updates within
+#                           WATCH_SECONDS, merges on a background thread
+#
+# The feature encoder has a fixed vocabulary, so no update ever refits
+# anything: every segment is encoded with the spec in encoder.json.
 
 from pathlib import Path
+import hashlib
 import json
+import shutil
+import sys
+import threading
+import time
+
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-import joblib
+from scipy import sparse
+
+from ann_index import build_index, DEFAULT_KIND, IVFIndex
+from columnar_feature_store import COLUMN_TYPES, FEATURE_COLUMNS, INDEX_COLUMN, read_columns, read_features, store_version, STORE_DIR
+from feature_encoder import FeatureEncoder
+from sparse_store import load_csr, save_csr
+import vector_generations
 
 BASE_DIR = Path(__file__).resolve().parent
-FEATURE_DIR = BASE_DIR / "data" / "feature_store"
-VECTOR_DIR = BASE_DIR / "data" / "vector_store"
+FEATURE_DIR = STORE_DIR
+VECTOR_DIR = vector_generations.VECTOR_DIR
 
 VECTOR_DIR.mkdir(parents=True, exist_ok=True)
 
-VEC_FILE = VECTOR_DIR / "vectors.npy"
-META_FILE = VECTOR_DIR / "metadata.json"
-TFIDF_FILE = VECTOR_DIR / "tfidf.pkl"
+# file names inside one segment directory
+VEC_FILE = "vectors.npz"
+META_FILE = "metadata.json"
+ROWS_FILE = "rows.npz"
+PARTITIONS_FILE = "partitions.npz"
+ANN_FILE = "ann_index.npz"
+
+# file names inside one generation directory
+ENCODER_FILE = "encoder.json"
+MANIFEST_FILE = vector_generations.MANIFEST_FILE
+
+# "ivf" (approximate) or "brute" (exact)
+ANN_KIND = DEFAULT_KIND
+
+# segments smaller than this are scanned exactly (no k-means to build)
+BRUTE_MAX_ROWS = 5000
+
+# -------------------------------------------------
+# PARTITIONS
+# -------------------------------------------------
+# Segment rows are stored sorted by (claim_type, carrier, loss year),
+# so every partition, and every claim_type / (claim_type, carrier)
+# group of partitions, is one contiguous row range. Filtered queries
+# only scan the ranges whose key can match; ranges of BRUTE_MAX_ROWS or
+# more get their own IVF index (ids = segment rows).
+#
+# rows.npz also keeps the columns retrieval filters can test.
+
+PARTITION_KEYS = ["claim_type", "carrier", "loss_year"]
+FILTER_COLUMNS = ["claim_type", "carrier", "loss_year", "severity", "severity_score", "date_of_loss"]
+
+# -------------------------------------------------
+# MERGE POLICY
+# -------------------------------------------------
+# Query cost grows with the number of segments and with tombstoned rows
+# still being scanned; a merge is due once either passes its limit.
+
+MAX_SEGMENTS = 8
+MAX_DELETED_RATIO = 0.2
+
+# how often watch() checks the feature store
+WATCH_SECONDS = 2.0
 
 # -----------------------------
-# HELPERS
+# SEGMENTS
 # -----------------------------
 
-def load_json(path):
-    with open(path, "r") as f:
-        return json.load(f)
-
-def feature_to_text(feature):
-    return (
-        f"Claim type {feature['claim_type']}. "
-        f"Severity {feature['severity']} with score {feature['severity_score']}. "
-        f"Medical {feature['has_medical']}. "
-        f"Police {feature['has_police']}. "
-        f"Legal {feature['has_legal']}. "
-        f"Photos {feature['num_photos']}. "
-        f"Files {', '.join(feature['files_present'])}. "
-        f"Signals {', '.join(feature['signals'])}."
+def segment_metadata(feature: dict) -> dict:
+    # returned with every match
+    return {
+        "claim_number": feature["claim_number"],
+        "claim_type": feature["claim_type"],
+        "severity": feature["severity"],
+        "severity_score": feature["severity_score"],
+        "carrier": feature.get("carrier"),
+        "date_of_loss": feature.get("date_of_loss")
+    }
+
+def loss_year(date_of_loss) -> int:
+    # ISO date -> year (0 = unknown)
+    return int(date_of_loss[:4]) if date_of_loss else 0
+
+def partition_key(meta: dict) -> tuple:
+    return (meta["claim_type"] or "", meta.get("carrier") or "", loss_year(meta.get("date_of_loss")))
+
+def filter_columns(metadata: list) -> dict:
+    return {
+        "claim_type": np.array([m["claim_type"] or "" for m in metadata], dtype=str),
+        "carrier": np.array([m.get("carrier") or "" for m in metadata], dtype=str),
+        "loss_year": np.array([loss_year(m.get("date_of_loss")) for m in metadata], dtype=np.int32),
+        "severity": np.array([m["severity"] or "" for m in metadata], dtype=str),
+        "severity_score": np.array([m["severity_score"] or 0 for m in metadata], dtype=np.int32),
+        "date_of_loss": np.array([m.get("date_of_loss") or "" for m in metadata], dtype=str),
+    }
+
+def partition_arrays(vectors, keys: list) -> dict:
+    # keys sorted -> one (start, end) range per distinct key
+    n = len(keys)
+    starts = [i for i in range(n) if i == 0 or keys[i] != keys[i - 1]]
+    offsets = np.array(starts + [n], dtype=np.int64)
+
+    arrays = {
+        "claim_type": np.array([keys[i][0] for i in starts], dtype=str),
+        "carrier": np.array([keys[i][1] for i in starts], dtype=str),
+        "loss_year": np.array([keys[i][2] for i in starts], dtype=np.int32),
+        "offsets": offsets,
+    }
+
+    # IVF index per key prefix (claim_type / + carrier / + loss_year)
+    # range of BRUTE_MAX_ROWS or more rows; the whole segment has ann_index.npz
+    groups = []
+    for level in range(1, len(PARTITION_KEYS) + 1):
+        bounds = [i for i in starts if i == 0 or keys[i][:level] != keys[i - 1][:level]] + [n]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if BRUTE_MAX_ROWS <= end - start < n and (start, end) not in groups:
+                groups.append((start, end))
+
+    arrays["groups"] = np.array(groups, dtype=np.int64).reshape(-1, 2)
+
+    for g, (start, end) in enumerate(groups):
+        index = IVFIndex().build(vectors[start:end])
+        arrays[f"g{g}.centroids"] = index.centroids
+        arrays[f"g{g}.list_offsets"] = index.list_offsets
+        arrays[f"g{g}.list_ids"] = index.list_ids + start
+        arrays[f"g{g}.n_probe"] = np.array(index.n_probe)
+
+    return arrays
+
+def values_fingerprint(values: tuple) -> int:
+    # same feature columns -> same vector and metadata -> nothing to update
+    return int.from_bytes(hashlib.blake2b(repr(values).encode(), digest_size=8).digest(), "little")
+
+def row_fingerprint(feature: dict) -> int:
+    return values_fingerprint(tuple(feature[name] for name in FEATURE_COLUMNS))
+
+def build_segment(vectors, metadata: list, claim_ids: list, fingerprints: list):
+    """
+    Unpublished segment directory (publish_segment() makes it visible)
+    and the row order it was written in: row i of the segment is input
+    row order[i].
+    """
+    keys = [partition_key(m) for m in metadata]
+    order = np.array(sorted(range(len(keys)), key=keys.__getitem__), dtype=np.int64)
+
+    vectors = vectors[order]
+    metadata = [metadata[i] for i in order]
+    keys = [keys[i] for i in order]
+
+    build_dir = vector_generations.new_segment_dir()
+
+    save_csr(build_dir / VEC_FILE, vectors)
+
+    with open(build_dir / META_FILE, "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    np.savez(
+        build_dir / ROWS_FILE,
+        claim_id=np.array(claim_ids, dtype=str)[order],
+        fingerprint=np.array(fingerprints, dtype=np.uint64)[order],
+        **filter_columns(metadata),
+    )
+
+    np.savez(build_dir / PARTITIONS_FILE, **partition_arrays(vectors, keys))
+
+    # ANN index over the same rows (ids = row positions in vectors.npz)
+    kind = ANN_KIND if vectors.shape[0] >= BRUTE_MAX_ROWS else "brute"
+    build_index(vectors, kind=kind).save(build_dir / ANN_FILE)
+
+    return build_dir, order
+
+def encode_segment(encoder: FeatureEncoder, rows: list) -> Path:
+    build_dir, _ = build_segment(
+        encoder.encode_batch(rows),
+        [segment_metadata(row) for row in rows],
+        [row[INDEX_COLUMN] for row in rows],
+        [row_fingerprint(row) for row in rows],
     )
+    return build_dir
+
+def segment_rows(name: str):
+    # claim ids + fingerprints of every row of a published segment
+    with np.load(vector_generations.segment_dir(name) / ROWS_FILE) as rows:
+        return rows["claim_id"], rows["fingerprint"]
+
+# -----------------------------
+# GENERATIONS
+# -----------------------------
+
+def publish_generation(encoder_spec: dict, segments: list) -> str:
+    # caller holds vector_generations.writer_lock(); every listed segment is published already
+    build_dir = vector_generations.new_build_dir()
+
+    with open(build_dir / MANIFEST_FILE, "w") as f:
+        json.dump({"segments": segments}, f, indent=2)
+
+    # the retriever encodes queries with exactly this layout + weights
+    with open(build_dir / ENCODER_FILE, "w") as f:
+        json.dump(encoder_spec, f, indent=2)
+
+    return vector_generations.publish(build_dir)
+
+def current_layout():
+    # (generation, manifest, encoder spec) or None when nothing is published
+    generation = vector_generations.current_generation()
+    if generation is None:
+        return None
+
+    gen_dir = vector_generations.generation_dir(generation)
+    try:
+        with open(gen_dir / ENCODER_FILE) as f:
+            spec = json.load(f)
+        manifest = vector_generations.read_manifest(generation)
+    except FileNotFoundError:
+        return None
+
+    return generation, manifest, spec
 
 # -----------------------------
 # VECTOR STORE BUILDER
 # -----------------------------
 
-def build_vector_store():
-    documents = []
-    metadata = []
+def build_vector_store(weights: dict = None):
+    # weights: per-block overrides of feature_encoder.DEFAULT_WEIGHTS
+    encoder = FeatureEncoder(weights)
+    rows = read_features(list(COLUMN_TYPES), store_dir=FEATURE_DIR)
 
-    for feature_file in FEATURE_DIR.glob("*.json"):
-        feature = load_json(feature_file)
+    build_dir = encode_segment(encoder, rows) if rows else None
 
-        documents.append(feature_to_text(feature))
-        metadata.append({
-            "claim_number": feature["claim_number"],
-            "claim_type": feature["claim_type"],
-            "severity": feature["severity"],
-            "severity_score": feature["severity_score"]
-        })
+    with vector_generations.writer_lock():
+        segments = []
+        if build_dir is not None:
+            name = vector_generations.publish_segment(build_dir)
+            segments.append({"name": name, "rows": len(rows), "deleted": []})
 
-    vectorizer = TfidfVectorizer(
-        stop_words="english",
-        max_features=512
+        generation = publish_generation(encoder.spec(), segments)
+
+    print(f"VECTOR STORE CREATED ({generation})")
+    return generation
+
+def update_vector_store(weights: dict = None):
+    """
+    Adds claims that are new or changed in the feature store as one new
+    segment and tombstones the rows they replace or whose claim was
+    removed. Falls back to a full build when nothing compatible is
+    published (no store yet, or weights other than the store's).
+    """
+    with vector_generations.writer_lock():
+        layout = current_layout()
+        if layout is not None:
+            try:
+                encoder = FeatureEncoder.from_spec(layout[2]) if weights is None else FeatureEncoder(weights)
+            except ValueError:
+                encoder = None  # store from an older encoder version
+            if encoder is not None and encoder.spec() == layout[2]:
+                return _update(encoder, *layout)
+
+    return build_vector_store(weights)
+
+def _update(encoder: FeatureEncoder, generation: str, manifest: dict, spec: dict):
+    start = time.perf_counter()
+    segments = manifest["segments"]
+
+    # live rows of the published generation: claim id -> (segment, row, fingerprint)
+    live = {}
+    for pos, seg in enumerate(segments):
+        ids, fingerprints = segment_rows(seg["name"])
+        dead = set(seg["deleted"])
+        for row, (claim_id, fp) in enumerate(zip(ids.tolist(), fingerprints.tolist())):
+            if row not in dead:
+                live[claim_id] = (pos, row, fp)
+
+    added = []
+    deleted = [[] for _ in segments]
+
+    # plain column lists: only rows that changed become feature dicts
+    data = read_columns(list(COLUMN_TYPES), store_dir=FEATURE_DIR)
+    columns = [data[name] if isinstance(data[name], list) else data[name].tolist() for name in FEATURE_COLUMNS]
+
+    for claim_id, values in zip(data[INDEX_COLUMN].tolist(), zip(*columns)):
+        old = live.pop(claim_id, None)
+        if old is not None and old[2] == values_fingerprint(values):
+            continue
+        if old is not None:
+            deleted[old[0]].append(old[1])
+        added.append({INDEX_COLUMN: claim_id, **dict(zip(FEATURE_COLUMNS, values))})
+
+    # claims no longer in the feature store
+    for pos, row, _ in live.values():
+        deleted[pos].append(row)
+
+    removed = sum(len(rows) for rows in deleted)
+    if not added and not removed:
+        print(f"VECTOR STORE UNCHANGED ({generation})")
+        return generation
+
+    new_segments = [
+        {**seg, "deleted": sorted(seg["deleted"] + rows)}
+        for seg, rows in zip(segments, deleted)
+    ]
+
+    if added:
+        name = vector_generations.publish_segment(encode_segment(encoder, added))
+        new_segments.append({"name": name, "rows": len(added), "deleted": []})
+
+    generation = publish_generation(spec, new_segments)
+
+    print(
+        f"VECTOR STORE UPDATED ({generation}): +{len(added)} rows, "
+        f"{removed} tombstoned, {len(new_segments)} segments "
+        f"in {time.perf_counter() - start:.2f}s"
     )
+    return generation
 
-    vectors = vectorizer.fit_transform(documents).toarray()
+# -----------------------------
+# SEGMENT MERGING
+# -----------------------------
 
-    np.save(VEC_FILE, vectors)
+def segments_to_merge(manifest: dict, force: bool = False) -> list:
+    segments = manifest["segments"]
+    total = sum(seg["rows"] for seg in segments)
+    deleted = sum(len(seg["deleted"]) for seg in segments)
 
-    with open(META_FILE, "w") as f:
-        json.dump(metadata, f, indent=2)
+    if force or (total and deleted / total > MAX_DELETED_RATIO):
+        return segments if len(segments) > 1 or deleted else []
+
+    if len(segments) > MAX_SEGMENTS:
+        # leave the big base segment alone while the rest are smaller than it
+        largest = max(segments, key=lambda seg: seg["rows"])
+        rest = [seg for seg in segments if seg is not largest]
+        if largest["rows"] > sum(seg["rows"] for seg in rest):
+            return rest
+        return segments
+
+    return []
+
+def needs_merge() -> bool:
+    layout = current_layout()
+    return layout is not None and bool(segments_to_merge(layout[1]))
+
+def merge_segments(force: bool = False):
+    """
+    Rewrites the segments picked by the merge policy as one segment
+    without their tombstoned rows. The expensive part (stacking rows,
+    building the ANN index) runs without the writer lock; rows
+    tombstoned by updates meanwhile are carried over to the merged
+    segment when it is published.
+    """
+    with vector_generations.writer_lock():
+        layout = current_layout()
+        if layout is None:
+            return None
+        chosen = segments_to_merge(layout[1], force)
+        if not chosen:
+            return None
+
+    start = time.perf_counter()
+
+    vectors, metadata, claim_ids, fingerprints = [], [], [], []
+    # per chosen segment: old row -> row in the merged segment (-1 = dropped)
+    new_rows = {}
+    offset = 0
+
+    for seg in chosen:
+        seg_dir = vector_generations.segment_dir(seg["name"])
+
+        alive = np.ones(seg["rows"], dtype=bool)
+        alive[np.array(seg["deleted"], dtype=np.int64)] = False
+        keep = np.flatnonzero(alive)
+
+        vectors.append(load_csr(seg_dir / VEC_FILE, mmap=False)[keep])
+        with open(seg_dir / META_FILE) as f:
+            meta = json.load(f)
+        metadata.extend(meta[i] for i in keep.tolist())
+
+        ids, fps = segment_rows(seg["name"])
+        claim_ids.extend(ids[keep].tolist())
+        fingerprints.extend(fps[keep].tolist())
+
+        positions = np.full(seg["rows"], -1, dtype=np.int64)
+        positions[keep] = offset + np.arange(len(keep))
+        new_rows[seg["name"]] = positions
+        offset += len(keep)
+
+    build_dir, order = build_segment(sparse.vstack(vectors).tocsr(), metadata, claim_ids, fingerprints)
+
+    # rows are re-sorted by partition: merged input row -> segment row
+    placed = np.empty(len(order), dtype=np.int64)
+    placed[order] = np.arange(len(order))
+    for positions in new_rows.values():
+        kept = positions >= 0
+        positions[kept] = placed[positions[kept]]
+
+    with vector_generations.writer_lock():
+        layout = current_layout()
+        segments = layout[1]["segments"] if layout else []
+        names = {seg["name"] for seg in segments}
+
+        # a full rebuild replaced the store meanwhile -> nothing to merge into
+        if layout is None or not set(new_rows) <= names:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return None
+
+        # tombstones added to the chosen segments since we read them
+        deleted = sorted(
+            int(new_rows[seg["name"]][row])
+            for seg in segments if seg["name"] in new_rows
+            for row in seg["deleted"]
+            if new_rows[seg["name"]][row] >= 0
+        )
+
+        merged = {"name": vector_generations.publish_segment(build_dir), "rows": offset, "deleted": deleted}
+
+        # merged segment takes the place of the oldest segment it replaces
+        result = []
+        for seg in segments:
+            if seg["name"] not in new_rows:
+                result.append(seg)
+            elif merged is not None:
+                result.append(merged)
+                merged = None
+
+        generation = publish_generation(layout[2], result)
+
+    print(
+        f"VECTOR STORE MERGED ({generation}): {len(chosen)} segments -> 1 "
+        f"({offset} rows) in {time.perf_counter() - start:.2f}s"
+    )
+    return generation
+
+# -----------------------------
+# WATCH
+# -----------------------------
+
+def watch(interval: float = WATCH_SECONDS):
+    # new feature store partitions are searchable after one update;
+    # merges never hold up the next update
+    print(f"👀 Watching {FEATURE_DIR} every {interval}s")
+
+    version = None
+    merging = None
+
+    while True:
+        current = store_version(FEATURE_DIR)
+        if current != version:
+            update_vector_store()
+            version = current
 
-    joblib.dump(vectorizer, TFIDF_FILE)
+        if (merging is None or not merging.is_alive()) and needs_merge():
+            merging = threading.Thread(target=merge_segments, daemon=True)
+            merging.start()
 
-    print("VECTOR STORE CREATED ")
+        time.sleep(interval)
 
 # -----------------------------
 # RUN
 # -----------------------------
 
 if __name__ == "__main__":
-    build_vector_store()
\ No newline at end of file
+    # python semantic_store_builder.py [--update | --merge | --watch]
+    if "--update" in sys.argv:
+        update_vector_store()
+    elif "--merge" in sys.argv:
+        merge_segments(force=True)
+    elif "--watch" in sys.argv:
+        try:
+            watch()
+        except KeyboardInterrupt:
+            print("\n🛑 Watch stopped")
+    else:
+        build_vector_store()
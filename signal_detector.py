@@ -1,15 +1,55 @@
 from pathlib import Path
-import json
+import gc
+
+import numpy as np
+
+import record_log
 
 BASE_DIR = Path(__file__).resolve().parent
-ENTITIES_DIR = BASE_DIR / "data" / "entities"
-SIGNALS_DIR = BASE_DIR / "data" / "signals"
-SIGNALS_DIR.mkdir(parents=True, exist_ok=True)
+
+# input / output record logs (data/records/<name>.log), keyed by claim id
+ENTITIES_LOG = "entities"
+DUPLICATES_LOG = "duplicates"
+LOG_NAME = "signals"
+
+# -------------------------------------------------
+# SCORING RULES
+# -------------------------------------------------
+# shared by detect_signals (one claim) and detect_signals_batch (columns)
+
+INJURY_POINTS = 30
+POLICE_POINTS = 20
+LEGAL_POINTS = 40
+AUTO_BODILY_INJURY_POINTS = 20
+DUPLICATE_SUBMISSION_POINTS = 30
+
+# (amount above, signal, points), highest tier first; first match wins
+AMOUNT_TIERS = [
+    (50000, "SEVERE_LOSS_AMOUNT", 40),
+    (25000, "HIGH_LOSS_AMOUNT", 25),
+]
+
+# (score at least, severity), highest first; below all -> LOW
+SEVERITY_LEVELS = [
+    (80, "CRITICAL"),
+    (60, "HIGH"),
+    (30, "MEDIUM"),
+]
+DEFAULT_SEVERITY = "LOW"
 
 # -------------------------------------------------
 # SIGNAL DETECTION LOGIC
 # -------------------------------------------------
 
+def home_loss_signal(loss_type: str) -> str:
+    return f"HOME_LOSS_{loss_type.upper().replace(' ', '_')}"
+
+def severity_for(severity_score: int) -> str:
+    for cutoff, severity in SEVERITY_LEVELS:
+        if severity_score >= cutoff:
+            return severity
+    return DEFAULT_SEVERITY
+
 def detect_signals(entities: dict):
 
     signals = []
@@ -20,43 +60,40 @@ def detect_signals(entities: dict):
     # ---- MEDICAL / INJURY SIGNAL
     if entities.get("injuries_reported"):
         signals.append("INJURY_REPORTED")
-        severity_score += 30
+        severity_score += INJURY_POINTS
 
     # ---- POLICE SIGNAL
     if entities.get("police_report"):
         signals.append("POLICE_INVOLVEMENT")
-        severity_score += 20
+        severity_score += POLICE_POINTS
 
     # ---- LEGAL SIGNAL
     if entities.get("legal_involvement"):
         signals.append("LEGAL_INVOLVEMENT")
-        severity_score += 40
+        severity_score += LEGAL_POINTS
 
     # ---- HIGH VALUE SIGNAL
-    if amount > 50000:
-        signals.append("SEVERE_LOSS_AMOUNT")
-        severity_score += 40
-    elif amount > 25000:
-        signals.append("HIGH_LOSS_AMOUNT")
-        severity_score += 25
+    for threshold, signal, points in AMOUNT_TIERS:
+        if amount > threshold:
+            signals.append(signal)
+            severity_score += points
+            break
 
     # ---- CLAIM TYPE SPECIFIC SIGNALS
     if entities.get("claim_type") == "AUTO" and entities.get("injuries_reported"):
         signals.append("AUTO_BODILY_INJURY")
-        severity_score += 20
+        severity_score += AUTO_BODILY_INJURY_POINTS
+
+    # ---- DUPLICATE / RECYCLED DOCUMENTS (duplicate_detector)
+    if entities.get("duplicate_submission"):
+        signals.append("DUPLICATE_SUBMISSION")
+        severity_score += DUPLICATE_SUBMISSION_POINTS
 
     if entities.get("claim_type") == "HOME" and entities.get("loss_type"):
-        signals.append(f"HOME_LOSS_{entities['loss_type'].upper().replace(' ', '_')}")
+        signals.append(home_loss_signal(entities["loss_type"]))
 
     # ---- FINAL SEVERITY
-    if severity_score >= 80:
-        severity = "CRITICAL"
-    elif severity_score >= 60:
-        severity = "HIGH"
-    elif severity_score >= 30:
-        severity = "MEDIUM"
-    else:
-        severity = "LOW"
+    severity = severity_for(severity_score)
 
     return {
         "claim_number": entities.get("claim_number"),
@@ -66,31 +103,222 @@ def detect_signals(entities: dict):
         "signals_detected": signals
     }
 
+# -------------------------------------------------
+# BATCH SCORING (NUMPY)
+# -------------------------------------------------
+# Same rules as detect_signals over a columnar table of entities:
+#
+#   injuries_reported / police_report / legal_involvement   bool   (n,)
+#   duplicate_submission                                   bool   (n,)
+#   estimated_amount                                       int64  (n,)
+#   claim_type.codes / loss_type.codes                     int32  (n,)
+#   claim_type.categories / loss_type.categories           list of values
+#   claim_number                                           object (n,)
+#
+# Re-scoring after a threshold change only re-runs detect_signals_batch.
+
+CATEGORY_COLUMNS = ["claim_type", "loss_type"]
+FLAG_COLUMNS = ["injuries_reported", "police_report", "legal_involvement", "duplicate_submission"]
+
+# order of the fixed signals in signals_detected (HOME_LOSS_* comes last)
+FLAG_SIGNALS = (
+    ["INJURY_REPORTED", "POLICE_INVOLVEMENT", "LEGAL_INVOLVEMENT"]
+    + [signal for _, signal, _ in AMOUNT_TIERS]
+    + ["AUTO_BODILY_INJURY", "DUPLICATE_SUBMISSION"]
+)
+
+def encode_category(values: list):
+    # values (any hashable, None included) -> int32 codes, categories
+    lookup = {}
+    codes = np.fromiter(
+        (lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32, count=len(values)
+    )
+    return codes, list(lookup)
+
+def entities_to_columns(records: list) -> dict:
+    # entity dicts -> columns, with detect_signals' coercions applied once
+    claim_number = np.empty(len(records), dtype=object)
+    claim_number[:] = [r.get("claim_number") for r in records]
+
+    columns = {
+        "claim_number": claim_number,
+        "estimated_amount": np.array(
+            [int(r.get("estimated_amount") or 0) for r in records], dtype=np.int64
+        ),
+    }
+
+    for name in FLAG_COLUMNS:
+        columns[name] = np.array([bool(r.get(name)) for r in records], dtype=bool)
+
+    for name in CATEGORY_COLUMNS:
+        columns[f"{name}.codes"], columns[f"{name}.categories"] = encode_category(
+            [r.get(name) for r in records]
+        )
+
+    return columns
+
+def take_rows(columns: dict, rows) -> dict:
+    # row subset / resample of a column table (categories are shared)
+    return {
+        name: values if name.endswith(".categories") else values[rows]
+        for name, values in columns.items()
+    }
+
+def category_mask(columns: dict, name: str, test) -> np.ndarray:
+    # rows whose category passes test(value), evaluated once per category
+    hits = np.array([bool(test(v)) for v in columns[f"{name}.categories"]] or [False])
+    return hits[columns[f"{name}.codes"]]
+
+def detect_signals_batch(columns: dict) -> dict:
+    """
+    Signal flags, severity_score and severity for every row as arrays:
+    {"flags": {signal: bool}, "home_loss.codes": int (-1 = none),
+     "home_loss.categories", "severity_score", "severity", ...}.
+    """
+    injuries = columns["injuries_reported"]
+    amount = columns["estimated_amount"]
+
+    flags = {
+        "INJURY_REPORTED": injuries,
+        "POLICE_INVOLVEMENT": columns["police_report"],
+        "LEGAL_INVOLVEMENT": columns["legal_involvement"],
+    }
+
+    # amount tiers: first (highest) matching tier only
+    matched = np.zeros(len(amount), dtype=bool)
+    for threshold, signal, _ in AMOUNT_TIERS:
+        flags[signal] = (amount > threshold) & ~matched
+        matched |= flags[signal]
+
+    is_auto = category_mask(columns, "claim_type", lambda v: v == "AUTO")
+    flags["AUTO_BODILY_INJURY"] = is_auto & injuries
+    flags["DUPLICATE_SUBMISSION"] = columns["duplicate_submission"]
+
+    points = {
+        "INJURY_REPORTED": INJURY_POINTS,
+        "POLICE_INVOLVEMENT": POLICE_POINTS,
+        "LEGAL_INVOLVEMENT": LEGAL_POINTS,
+        "AUTO_BODILY_INJURY": AUTO_BODILY_INJURY_POINTS,
+        "DUPLICATE_SUBMISSION": DUPLICATE_SUBMISSION_POINTS,
+        **{signal: p for _, signal, p in AMOUNT_TIERS},
+    }
+
+    severity_score = np.zeros(len(amount), dtype=np.int64)
+    for signal in FLAG_SIGNALS:
+        severity_score += flags[signal] * points[signal]
+
+    severity = np.select(
+        [severity_score >= cutoff for cutoff, _ in SEVERITY_LEVELS],
+        [level for _, level in SEVERITY_LEVELS],
+        default=DEFAULT_SEVERITY,
+    )
+
+    # HOME_LOSS_<TYPE>: one label per loss_type category
+    is_home = category_mask(columns, "claim_type", lambda v: v == "HOME")
+    has_loss = category_mask(columns, "loss_type", bool)
+    home_loss = np.where(is_home & has_loss, columns["loss_type.codes"], -1)
+
+    return {
+        "claim_number": columns["claim_number"],
+        "claim_type.codes": columns["claim_type.codes"],
+        "claim_type.categories": columns["claim_type.categories"],
+        "severity": severity,
+        "severity_score": severity_score,
+        "flags": flags,
+        "home_loss.codes": home_loss,
+        "home_loss.categories": [
+            home_loss_signal(v) if v else None for v in columns["loss_type.categories"]
+        ],
+    }
+
+def batch_to_records(batch: dict) -> list:
+    # detect_signals_batch output -> one detect_signals dict per row
+    mask = np.zeros(len(batch["severity_score"]), dtype=np.int64)
+    for bit, signal in enumerate(FLAG_SIGNALS):
+        mask |= batch["flags"][signal].astype(np.int64) << bit
+
+    # signal list per (flag combination, home loss label): few distinct ones
+    home_codes = batch["home_loss.codes"]
+    home_labels = batch["home_loss.categories"]
+    key = mask * (len(home_labels) + 1) + (home_codes + 1)
+
+    lists = {}
+    for k in np.unique(key).tolist():
+        m, code = divmod(k, len(home_labels) + 1)
+        lists[k] = (
+            [signal for bit, signal in enumerate(FLAG_SIGNALS) if m >> bit & 1]
+            + ([home_labels[code - 1]] if code else [])
+        )
+
+    claim_types = batch["claim_type.categories"]
+
+    # a million small dicts: cyclic GC passes would cost more than building them
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return build_records(batch, claim_types, lists, key)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+def build_records(batch: dict, claim_types: list, lists: dict, key) -> list:
+    return [
+        {
+            "claim_number": claim_number,
+            "claim_type": claim_types[claim_type],
+            "severity": severity,
+            "severity_score": score,
+            "signals_detected": lists[k].copy(),
+        }
+        for claim_number, claim_type, severity, score, k in zip(
+            batch["claim_number"].tolist(),
+            batch["claim_type.codes"].tolist(),
+            batch["severity"].tolist(),
+            batch["severity_score"].tolist(),
+            key.tolist(),
+        )
+    ]
+
+def detect_signals_many(records: list) -> list:
+    return batch_to_records(detect_signals_batch(entities_to_columns(records)))
+
 # -------------------------------------------------
 # BATCH RUNNER
 # -------------------------------------------------
 
-def main():
-    print("🚀 Running Signal Detection...")
+def read_entities(claim_id: str):
+    # entities record + the duplicate_detector verdict as one more input
+    entities = record_log.read_json(ENTITIES_LOG, claim_id)
+    if entities is None:
+        return None
 
-    for folder in ENTITIES_DIR.iterdir():
-        if not folder.is_dir():
-            continue
+    entities["duplicate_submission"] = record_log.read_json(DUPLICATES_LOG, claim_id) is not None
+    return entities
 
-        entity_file = folder / "ENTITIES.json"
-        if not entity_file.exists():
-            continue
+def process_claim(claim_id: str):
+    entities = read_entities(claim_id)
+    if entities is None:
+        return None
 
-        with open(entity_file) as f:
-            entities = json.load(f)
+    return detect_signals(entities)
 
-        signals = detect_signals(entities)
+def process_claims(claim_ids: list) -> list:
+    # batch form of process_claim: one vectorised scoring pass
+    entities = [read_entities(claim_id) for claim_id in claim_ids]
+    scored = iter(detect_signals_many([e for e in entities if e is not None]))
+    return [next(scored) if e is not None else None for e in entities]
+
+def main():
+    print("🚀 Running Signal Detection...")
 
-        out_folder = SIGNALS_DIR / folder.name
-        out_folder.mkdir(exist_ok=True)
+    # whole history in one vectorised pass
+    with record_log.open_log(ENTITIES_LOG) as entities:
+        claim_ids = entities.keys()
+        records = [read_entities(claim_id) for claim_id in claim_ids]
 
-        with open(out_folder / "SIGNALS.json", "w") as f:
-            json.dump(signals, f, indent=2)
+    with record_log.open_log(LOG_NAME, writable=True) as log:
+        for claim_id, signals in zip(claim_ids, detect_signals_many(records)):
+            log.put_json(claim_id, signals)
 
     print(" SIGNAL DETECTION COMPLETE")
 
@@ -0,0 +1,80 @@
+# sparse_store.py
+
+from pathlib import Path
+import struct
+import zipfile
+
+import numpy as np
+from scipy import sparse
+
+# -------------------------------------------------
+# NOTE
+# -------------------------------------------------
+# Vectors are written with scipy's save_npz(compressed=False), so the
+# file stays a normal CSR .npz. Uncompressed zip members are stored
+# byte-for-byte, which lets the loader memory-map data / indices /
+# indptr in place: every process opening the store shares the same
+# page-cache pages instead of holding its own copy.
+
+MMAP_MEMBERS = ("data", "indices", "indptr")
+
+# -------------------------------------------------
+# WRITE
+# -------------------------------------------------
+
+def save_csr(path: Path, matrix):
+    sparse.save_npz(path, sparse.csr_matrix(matrix), compressed=False)
+
+# -------------------------------------------------
+# READ
+# -------------------------------------------------
+
+def _mmap_member(path: Path, info: zipfile.ZipInfo) -> np.ndarray:
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError(f"{path.name}:{info.filename} is compressed, cannot mmap")
+
+    with open(path, "rb") as f:
+        # local file header: 30 fixed bytes + name + extra field
+        f.seek(info.header_offset + 26)
+        name_len, extra_len = struct.unpack("<HH", f.read(4))
+        f.seek(info.header_offset + 30 + name_len + extra_len)
+
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+
+        offset = f.tell()
+
+    if not shape or shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+
+    return np.memmap(
+        path, dtype=dtype, mode="r", offset=offset,
+        shape=shape, order="F" if fortran else "C"
+    )
+
+def load_csr(path: Path, mmap: bool = True):
+    if not mmap:
+        return sparse.load_npz(path).tocsr()
+
+    with np.load(path) as npz:
+        fmt = npz["format"].item()
+        fmt = fmt.decode() if isinstance(fmt, bytes) else fmt
+        shape = tuple(int(n) for n in npz["shape"])
+
+    if fmt != "csr":
+        raise ValueError(f"{path.name} holds a {fmt} matrix, expected csr")
+
+    with zipfile.ZipFile(path) as zf:
+        parts = {
+            name: _mmap_member(path, zf.getinfo(f"{name}.npy"))
+            for name in MMAP_MEMBERS
+        }
+
+    return sparse.csr_matrix(
+        (parts["data"], parts["indices"], parts["indptr"]),
+        shape=shape,
+        copy=False
+    )
@@ -0,0 +1,145 @@
+# stage_manifest.py
+
+from pathlib import Path
+import ast
+import hashlib
+import json
+import os
+
+import record_log
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+MANIFEST_DIR = DATA_DIR / ".pipeline" / "manifests"
+
+# -------------------------------------------------
+# HASHING
+# -------------------------------------------------
+
+def hash_files(paths) -> str:
+    """
+    Content hash over (file name, bytes) of every input file.
+    Renames and deletions change the hash as well as edits.
+    """
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        h.update(path.name.encode())
+        h.update(b"\0")
+        h.update(path.read_bytes())
+        h.update(b"\0")
+    return h.hexdigest()
+
+def hash_records(stages, claim_id: str) -> str:
+    """
+    Content hash over one claim's records in the given stage logs
+    (a missing log or record hashes as empty).
+    """
+    h = hashlib.sha256()
+    for stage in stages:
+        log = record_log.reader(stage)
+        value = log.get(claim_id) if log is not None else None
+        h.update(stage.encode())
+        h.update(b"\0")
+        h.update(bytes(value) if value is not None else b"")
+        h.update(b"\0")
+    return h.hexdigest()
+
+def local_imports(path: Path) -> set:
+    # project modules (BASE_DIR/<name>.py) a source file imports, lazily or not
+    names = set()
+    for node in ast.walk(ast.parse(path.read_text(), filename=str(path))):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    return {BASE_DIR / f"{name}.py" for name in names if (BASE_DIR / f"{name}.py").exists()}
+
+def code_version(*modules) -> str:
+    """
+    Source of the stage module(s) and of every project module they
+    import, directly or through each other (claim_documents,
+    keyword_matcher, record_log, ...) -> any code edit a stage depends
+    on invalidates its outputs.
+    """
+    pending = [Path(module.__file__).resolve() for module in modules]
+    sources = set()
+    while pending:
+        path = pending.pop()
+        if path not in sources:
+            sources.add(path)
+            pending.extend(local_imports(path) - sources)
+
+    h = hashlib.sha256()
+    for path in sorted(sources):
+        h.update(path.name.encode())
+        h.update(b"\0")
+        h.update(path.read_bytes())
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+# -------------------------------------------------
+# MANIFEST IO
+# -------------------------------------------------
+
+def manifest_file(stage_name: str) -> Path:
+    return MANIFEST_DIR / f"{stage_name}.json"
+
+def journal_file(stage_name: str) -> Path:
+    # opened for appending by the stage runners
+    MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+    return MANIFEST_DIR / f"{stage_name}.journal"
+
+def load_manifest(stage_name: str) -> dict:
+    manifest = {}
+
+    path = manifest_file(stage_name)
+    if path.exists():
+        with open(path) as f:
+            manifest = json.load(f)
+
+    # replay entries of a run that crashed before save_manifest()
+    journal = journal_file(stage_name)
+    if journal.exists():
+        for line in journal.read_text().splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line
+            manifest[entry.pop("claim_id")] = entry
+
+    return manifest
+
+def save_manifest(stage_name: str, manifest: dict):
+    MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+    path = manifest_file(stage_name)
+    tmp = path.with_suffix(".tmp")
+
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    os.replace(tmp, path)
+
+    journal = journal_file(stage_name)
+    if journal.exists():
+        journal.unlink()
+
+def append_journal(log, claim_id: str, entry: dict):
+    log.write(json.dumps({"claim_id": claim_id, **entry}) + "\n")
+
+def clear_manifests():
+    if not MANIFEST_DIR.exists():
+        return
+    for path in MANIFEST_DIR.iterdir():
+        path.unlink()
+
+# -------------------------------------------------
+# CHANGE DETECTION
+# -------------------------------------------------
+
+def is_current(manifest: dict, claim_id: str, input_hash: str, version: str) -> bool:
+    entry = manifest.get(claim_id)
+    return (
+        entry is not None
+        and entry["input_hash"] == input_hash
+        and entry["code_version"] == version
+    )
@@ -1,12 +1,19 @@
 # EMAIL_INTELLIGENT_SYSTEM/summary_generator.py
 
 from pathlib import Path
+import os
 import re
 
+from claim_documents import load_claim_document
+import keyword_matcher
+from record_log import open_log
+
 BASE_DIR = Path(__file__).resolve().parent
-OCR_DIR = BASE_DIR / "data" / "ocr"
-SUMMARY_DIR = BASE_DIR / "data" / "summaries"
-SUMMARY_DIR.mkdir(parents=True, exist_ok=True)
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+OCR_DIR = DATA_DIR / "ocr"
+
+# output: data/records/summaries.log, one record per claim id
+LOG_NAME = "summaries"
 
 # -------------------------------------------------
 # Helpers
@@ -74,61 +81,74 @@ def extract_vehicle(text):
 # SMART RISK DETECTION (🔥 MAIN FIX)
 # -------------------------------------------------
 
-def detect_injury(text):
-    text = text.lower()
-
-    positive = [
-        "medical report",
-        "patient information",
-        "diagnosis",
-        "treating physician",
-        "emergency room",
-        "hospital admission",
-        "physical therapy",
-        "medical record",
-        "ssn:",
-        "dob:"
-    ]
-
-    negative = [
-        "medical payments",
-        "medical coverage",
-        "policy",
-        "coverage"
-    ]
-
-    if any(p in text for p in positive):
+INJURY_POSITIVE = [
+    "medical report",
+    "patient information",
+    "diagnosis",
+    "treating physician",
+    "emergency room",
+    "hospital admission",
+    "physical therapy",
+    "medical record",
+    "ssn:",
+    "dob:"
+]
+
+INJURY_NEGATIVE = [
+    "medical payments",
+    "medical coverage",
+    "policy",
+    "coverage"
+]
+
+POLICE_SIGNALS = [
+    "police accident report",
+    "police department",
+    "reporting officer",
+    "badge:",
+    "incident information",
+    "narrative",
+    "citations issued"
+]
+
+LEGAL_SIGNALS = [
+    "law firm",
+    "attorneys at law",
+    "demand for settlement",
+    "esq",
+    "legal demand",
+    "attorney for"
+]
+
+# one lowercase copy per document for all four lists
+RISK_KEYWORDS = keyword_matcher.KeywordMatcher({
+    "injury_positive": INJURY_POSITIVE,
+    "injury_negative": INJURY_NEGATIVE,
+    "police_signals": POLICE_SIGNALS,
+    "legal_signals": LEGAL_SIGNALS,
+})
+
+def detect_injury(text, hits=None):
+    if hits is None:
+        hits = RISK_KEYWORDS.matches(text)
+
+    if hits["injury_positive"]:
         return "Yes"
 
-    if any(n in text for n in negative):
+    if hits["injury_negative"]:
         return "No"
 
     return "No"
 
-def detect_police(text):
-    text = text.lower()
-    police_signals = [
-        "police accident report",
-        "police department",
-        "reporting officer",
-        "badge:",
-        "incident information",
-        "narrative",
-        "citations issued"
-    ]
-    return "Yes" if any(p in text for p in police_signals) else "No"
-
-def detect_legal(text):
-    text = text.lower()
-    legal_signals = [
-        "law firm",
-        "attorneys at law",
-        "demand for settlement",
-        "esq",
-        "legal demand",
-        "attorney for"
-    ]
-    return "Yes" if any(l in text for l in legal_signals) else "No"
+def detect_police(text, hits=None):
+    if hits is None:
+        hits = RISK_KEYWORDS.matches(text)
+    return "Yes" if hits["police_signals"] else "No"
+
+def detect_legal(text, hits=None):
+    if hits is None:
+        hits = RISK_KEYWORDS.matches(text)
+    return "Yes" if hits["legal_signals"] else "No"
 
 # -------------------------------------------------
 # MAIN SUMMARY
@@ -136,7 +156,7 @@ def detect_legal(text):
 
 def generate_summary(text):
 
-    claim_number = extract([r"(CLM-[A-Z]{2}\d{4})"], text) or "Unknown"
+    claim_number = extract([r"(CLM-[A-Z]{2}\d{4,})"], text) or "Unknown"
     policy_number = extract([r"Policy Number[:\s]*((AU|HO)\d{7})"], text) or "Unknown"
     carrier = extract([r"INSURER A[:\s]*([^\n]+)"], text) or "Unknown"
     loss_date = extract([r"Date of Loss[:\s]*([\d/]{8,10})"], text) or "Unknown"
@@ -150,9 +170,10 @@ def generate_summary(text):
     insured = extract_insured(text)
     vehicle = extract_vehicle(text)
 
-    has_injury = detect_injury(text)
-    has_police = detect_police(text)
-    has_legal = detect_legal(text)
+    hits = RISK_KEYWORDS.matches(text)
+    has_injury = detect_injury(text, hits)
+    has_police = detect_police(text, hits)
+    has_legal = detect_legal(text, hits)
 
     severity_score = 20
     if has_injury == "Yes": severity_score += 30
@@ -194,19 +215,17 @@ repair estimates, and supporting evidence. Claim requires adjuster review.
 # BATCH RUNNER
 # -------------------------------------------------
 
+def process_claim(folder: Path):
+    doc = load_claim_document(folder)
+    return generate_summary(doc.full_text() if doc.files else doc.combined)
+
 def main():
     folders = [f for f in OCR_DIR.iterdir() if f.is_dir()]
     print(f"🚀 Processing {len(folders)} claims")
 
-    for folder in folders:
-        texts = folder.glob("*.txt")
-        full_text = "\n".join(t.read_text(errors="ignore") for t in texts)
-
-        summary = generate_summary(full_text)
-
-        out = SUMMARY_DIR / folder.name
-        out.mkdir(exist_ok=True)
-        (out / "CLAIM_SUMMARY.txt").write_text(summary)
+    with open_log(LOG_NAME, writable=True) as log:
+        for folder in folders:
+            log.put_text(folder.name, process_claim(folder))
 
     print("✅ All summaries generated")
 
@@ -2,17 +2,20 @@
 
 import os
 import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from pathlib import Path
 from email.message import EmailMessage
 from typing import Dict
-from PIL import Image, ImageDraw
-from reportlab.lib.pagesizes import LETTER
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
+
+from claim_documents import COMBINED_NAME, layout_lines, render_combined, render_pages, txt_name
 
 BASE_DIR = Path(__file__).resolve().parent
-RAW_DIR = BASE_DIR / "data" / "raw" / "ClaimsEnterpriseEML"
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+RAW_DIR = DATA_DIR / "raw" / "ClaimsEnterpriseEML"
+OCR_DIR = DATA_DIR / "ocr"
 os.makedirs(RAW_DIR, exist_ok=True)
 
 AUTO = "AUTO"
@@ -108,16 +111,76 @@ def rand_dob():
     return f"{month:02d}/{day:02d}/{year}"
 
 
+# ---------------------------------------------------------------------
+# Canvas: reportlab PDF, or text only
+# ---------------------------------------------------------------------
+
+# reportlab's units (points): letter page and one inch
+LETTER = (612.0, 792.0)
+inch = 72.0
+
+
+def pdf_canvas(path: Path):
+    try:
+        from reportlab.pdfgen import canvas
+    except ImportError:
+        raise ImportError("PDF output needs reportlab (pip install reportlab), or use --text-only")
+    return canvas.Canvas(str(path), pagesize=LETTER)
+
+
+class TextCanvas:
+    """
+    Stand-in for the reportlab canvas in text-only mode: keeps the drawn
+    strings per page and lays them out the way raw_ingestor reads a PDF
+    text layer, so the OCR text is written without any PDF.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = path
+        self.font_size = 12
+        self.runs = []
+        self.done = []
+
+    def setFont(self, name, size, leading=None):
+        self.font_size = size
+
+    def drawString(self, x, y, text, *args, **kwargs):
+        if text.strip():
+            self.runs.append((x, y, text.strip()))
+
+    def drawCentredString(self, x, y, text, *args, **kwargs):
+        # start of the run, with an average glyph width of half the font size
+        self.drawString(x - len(text) * self.font_size / 4, y, text)
+
+    def rect(self, *args, **kwargs):
+        pass
+
+    def line(self, *args, **kwargs):
+        pass
+
+    def showPage(self):
+        self.done.append(self.runs)
+        self.runs = []
+
+    def save(self):
+        # like reportlab: a trailing empty page is dropped, an empty document keeps one
+        if self.runs or not self.done:
+            self.showPage()
+
+    def pages(self) -> list:
+        return [layout_lines(runs) for runs in self.done]
+
+
 # ---------------------------------------------------------------------
 # PDF Generation with Professional Formatting
 # ---------------------------------------------------------------------
 
-def create_acord25_pdf(path: Path, claim: Dict):
+def create_acord25_pdf(path: Path, claim: Dict, make_canvas=None):
     """
     ACORD 25 - Certificate of Liability Insurance (Auto) - Corrected layout and alignments
     Fixed: drawCentredText -> drawCentredString
     """
-    c = canvas.Canvas(str(path), pagesize=LETTER)
+    c = (make_canvas or pdf_canvas)(path)
     width, height = LETTER
 
     L = 0.75 * inch
@@ -230,16 +293,17 @@ def create_acord25_pdf(path: Path, claim: Dict):
     c.drawString(L + 0.15 * inch, disclaimer_y - 0.45 * inch, "A CONTRACT BETWEEN THE ISSUING INSURER(S), AUTHORIZED REPRESENTATIVE OR PRODUCER, AND THE")
 
     c.save()
+    return c
 
 
 
 
 
-def create_acord140_pdf(path: Path, claim: Dict):
+def create_acord140_pdf(path: Path, claim: Dict, make_canvas=None):
     """
     ACORD 140 - Property Section (Homeowners)
     """
-    c = canvas.Canvas(str(path), pagesize=LETTER)
+    c = (make_canvas or pdf_canvas)(path)
     width, height = LETTER
 
     # Header
@@ -345,13 +409,14 @@ def create_acord140_pdf(path: Path, claim: Dict):
                  "ACORD 140 (2008/01) © ACORD CORPORATION 2008")
 
     c.save()
+    return c
 
 
-def create_medical_report_pdf(path: Path, claim: Dict):
+def create_medical_report_pdf(path: Path, claim: Dict, make_canvas=None):
     """
     Detailed Medical Report PDF
     """
-    c = canvas.Canvas(str(path), pagesize=LETTER)
+    c = (make_canvas or pdf_canvas)(path)
     width, height = LETTER
 
     # Header
@@ -478,14 +543,15 @@ def create_medical_report_pdf(path: Path, claim: Dict):
                  f"Date: {claim['report_date']}")
 
     c.save()
+    return c
 
 
 
-def create_police_report_pdf(path: Path, claim: Dict):
+def create_police_report_pdf(path: Path, claim: Dict, make_canvas=None):
     """
     Detailed Police Report PDF
     """
-    c = canvas.Canvas(str(path), pagesize=LETTER)
+    c = (make_canvas or pdf_canvas)(path)
     width, height = LETTER
 
     # Header
@@ -575,14 +641,15 @@ def create_police_report_pdf(path: Path, claim: Dict):
     c.drawString(1*inch, y - 0.55*inch, f"Date: {claim['report_date']}")
 
     c.save()
+    return c
 
 
 
-def create_legal_demand_pdf(path: Path, claim: Dict):
+def create_legal_demand_pdf(path: Path, claim: Dict, make_canvas=None):
     """
     Detailed Legal Demand Letter PDF
     """
-    c = canvas.Canvas(str(path), pagesize=LETTER)
+    c = (make_canvas or pdf_canvas)(path)
     width, height = LETTER
     
     # Law Firm Header
@@ -671,21 +738,37 @@ def create_legal_demand_pdf(path: Path, claim: Dict):
     c.drawString(1*inch, y, f"Attorney for {claim['insured_name']}")
     
     c.save()
+    return c
+
+
+def damage_rectangles():
+    # visual noise/texture of a damage photo
+    rects = []
+    for _ in range(100):
+        x = random.randint(0, 800)
+        y = random.randint(0, 600)
+        color = (random.randint(30, 60), random.randint(30, 60), random.randint(30, 60))
+        rects.append(([x, y, x+random.randint(20, 80), y+random.randint(20, 80)], color))
+    return rects
 
 
 def create_damage_image(path: Path, text: str):
     """
     Create realistic-looking damage photo placeholder
     """
+    rects = damage_rectangles()
+
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        raise ImportError("Damage photos need Pillow (pip install pillow), or use --text-only")
+
     img = Image.new("RGB", (800, 600), color=(45, 45, 45))
     draw = ImageDraw.Draw(img)
     
     # Add some visual noise/texture
-    for _ in range(100):
-        x = random.randint(0, 800)
-        y = random.randint(0, 600)
-        color = (random.randint(30, 60), random.randint(30, 60), random.randint(30, 60))
-        draw.rectangle([x, y, x+random.randint(20, 80), y+random.randint(20, 80)], fill=color)
+    for box, color in rects:
+        draw.rectangle(box, fill=color)
     
     # Add damage label
     draw.rectangle([20, 20, 400, 80], fill=(180, 40, 40))
@@ -874,11 +957,49 @@ def generate_home_claim(idx: int) -> Dict:
 # Write email.eml + attachments as PDFs
 # ---------------------------------------------------------------------
 
-def write_claim_folder(claim: Dict, idx: int):
+def create_repair_estimate_pdf(path: Path, claim: Dict, make_canvas=None):
+    # Simple repair estimate (you can enhance this similarly)
+    c = (make_canvas or pdf_canvas)(path)
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(1*inch, 10*inch, "REPAIR ESTIMATE")
+    c.setFont("Helvetica", 10)
+    c.drawString(1*inch, 9.5*inch, f"Customer: {claim['insured_name']}")
+    c.drawString(1*inch, 9.3*inch, f"Claim: {claim['claim_number']}")
+    c.drawString(1*inch, 9*inch, f"Total Estimated Repairs: ${claim['claim_amount']:,}")
+    c.drawString(1*inch, 8.7*inch, f"Prepared for: {claim['carrier']}")
+    c.save()
+    return c
+
+
+def write_ocr_texts(claim_id: str, texts: Dict, ocr_dir: Path):
+    # same files raw_ingestor writes for the claim (images -> empty text)
+    out = ocr_dir / claim_id
+    out.mkdir(parents=True, exist_ok=True)
+
+    rendered = {name: render_pages(pages) for name, pages in texts.items()}
+    for name, text in rendered.items():
+        (out / txt_name(name)).write_text(text, encoding="utf-8")
+
+    (out / COMBINED_NAME).write_text(render_combined(rendered.items()), encoding="utf-8")
+
+
+def write_claim_folder(
+    claim: Dict,
+    idx: int,
+    text_only: bool = False,
+    raw_dir: Path = RAW_DIR,
+    ocr_dir: Path = OCR_DIR,
+    verbose: bool = True
+):
+    """
+    email.eml + attachments under raw_dir/<claim>. text_only writes no
+    PDFs / PNGs: email.eml plus the attachments' text straight into
+    ocr_dir/<claim>, as raw_ingestor would extract it.
+    """
     if claim["claim_type"] == "AUTO":
-        folder = RAW_DIR / f"CLM-AU{idx:04d}"
+        folder = raw_dir / f"CLM-AU{idx:04d}"
     else:
-        folder = RAW_DIR / f"CLM-HO{idx:04d}"
+        folder = raw_dir / f"CLM-HO{idx:04d}"
     folder.mkdir(parents=True, exist_ok=True)
 
     # email.eml
@@ -898,67 +1019,126 @@ def write_claim_folder(claim: Dict, idx: int):
     with open(eml_path, "wb") as f:
         f.write(msg.as_bytes())
 
+    texts = {}
+
+    def attach_pdf(name: str, create):
+        if text_only:
+            texts[name] = create(folder / name, claim, TextCanvas).pages()
+        else:
+            create(folder / name, claim)
+
     # Generate PDFs
     if claim["claim_type"] == "AUTO":
-        acord_pdf = folder / f"ACORD25_{claim['claim_number']}.pdf"
-        create_acord25_pdf(acord_pdf, claim)
+        attach_pdf(f"ACORD25_{claim['claim_number']}.pdf", create_acord25_pdf)
     else:
-        acord_pdf = folder / f"ACORD140_{claim['claim_number']}.pdf"
-        create_acord140_pdf(acord_pdf, claim)
+        attach_pdf(f"ACORD140_{claim['claim_number']}.pdf", create_acord140_pdf)
 
-    repair_pdf = folder / f"REPAIR_EST_{claim['claim_number']}.pdf"
-    # Simple repair estimate (you can enhance this similarly)
-    c = canvas.Canvas(str(repair_pdf), pagesize=LETTER)
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(1*inch, 10*inch, "REPAIR ESTIMATE")
-    c.setFont("Helvetica", 10)
-    c.drawString(1*inch, 9.5*inch, f"Customer: {claim['insured_name']}")
-    c.drawString(1*inch, 9.3*inch, f"Claim: {claim['claim_number']}")
-    c.drawString(1*inch, 9*inch, f"Total Estimated Repairs: ${claim['claim_amount']:,}")
-    c.drawString(1*inch, 8.7*inch, f"Prepared for: {claim['carrier']}")
-    c.save()
+    attach_pdf(f"REPAIR_EST_{claim['claim_number']}.pdf", create_repair_estimate_pdf)
 
     if claim["has_injury"]:
-        med_pdf = folder / f"MEDICAL_{claim['claim_number']}.pdf"
-        create_medical_report_pdf(med_pdf, claim)
+        attach_pdf(f"MEDICAL_{claim['claim_number']}.pdf", create_medical_report_pdf)
 
     if claim["has_police"] and claim["claim_type"] == "AUTO":
-        police_pdf = folder / f"POLICE_{claim['claim_number']}.pdf"
-        create_police_report_pdf(police_pdf, claim)
-
+        attach_pdf(f"POLICE_{claim['claim_number']}.pdf", create_police_report_pdf)
 
     if claim["has_legal"]:
-        legal_pdf = folder / f"LEGAL_{claim['claim_number']}.pdf"
-        create_legal_demand_pdf(legal_pdf, claim)
+        attach_pdf(f"LEGAL_{claim['claim_number']}.pdf", create_legal_demand_pdf)
 
     # Generate 1-2 damage images only
     num_imgs = random.randint(1, 2)
     for i in range(1, num_imgs + 1):
-        img_path = folder / f"DAMAGE_{i}_{claim['claim_number']}.png"
+        img_name = f"DAMAGE_{i}_{claim['claim_number']}.png"
         damage_desc = f"{claim['claim_type']} {claim['category']} - Photo {i}"
-        create_damage_image(img_path, damage_desc)
+        if text_only:
+            # photos are the claim's last random draws (and every claim is
+            # seeded on its own), so skipping them leaves the corpus unchanged
+            texts[img_name] = []
+        else:
+            create_damage_image(folder / img_name, damage_desc)
+
+    if text_only:
+        write_ocr_texts(folder.name, texts, ocr_dir)
 
-    print(f"[GEN] {claim['claim_type']} -> {folder.name}")
+    if verbose:
+        print(f"[GEN] {claim['claim_type']} -> {folder.name}")
 
 
 # ---------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------
 
-def main(total: int = 500):
+# claims per worker task
+CHUNK_SIZE = 500
+
+
+def claim_seed(seed: int, claim_type: str, idx: int) -> str:
+    # every claim draws from its own stream: the corpus does not depend
+    # on the number of workers or the order they finish in
+    return f"{seed}/{claim_type}/{idx}"
+
+
+def generate_claims(
+    jobs: list,
+    seed: int,
+    text_only: bool = False,
+    raw_dir: Path = RAW_DIR,
+    ocr_dir: Path = OCR_DIR,
+    verbose: bool = True
+) -> int:
+    for claim_type, idx in jobs:
+        random.seed(claim_seed(seed, claim_type, idx))
+        c = generate_auto_claim(idx) if claim_type == AUTO else generate_home_claim(idx)
+        write_claim_folder(c, idx, text_only, raw_dir, ocr_dir, verbose)
+    return len(jobs)
+
+
+def main(
+    total: int = 500,
+    text_only: bool = False,
+    seed: int = None,
+    raw_dir: Path = RAW_DIR,
+    ocr_dir: Path = OCR_DIR,
+    verbose: bool = True,
+    workers: int = None
+):
+    if seed is None:
+        seed = random.randrange(2**32)
+
     auto_n = total // 2
     home_n = total - auto_n
 
-    for i in range(1, auto_n + 1):
-        c = generate_auto_claim(i)
-        write_claim_folder(c, i)
+    jobs = [(AUTO, i) for i in range(1, auto_n + 1)] + [(HOME, i) for i in range(1, home_n + 1)]
+    chunks = [jobs[i:i + CHUNK_SIZE] for i in range(0, len(jobs), CHUNK_SIZE)]
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
 
-    for i in range(1, home_n + 1):
-        c = generate_home_claim(i)
-        write_claim_folder(c, i)
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            generate_claims(chunk, seed, text_only, raw_dir, ocr_dir, verbose)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(generate_claims, chunk, seed, text_only, raw_dir, ocr_dir, verbose)
+                for chunk in chunks
+            ]
+            for future in as_completed(futures):
+                future.result()
 
-    print(f"\n DONE: Generated {auto_n} auto + {home_n} home claims with professional PDFs.")
+    elapsed = time.perf_counter() - start
+    output = "text-only OCR output" if text_only else "professional PDFs"
+    print(f"\n DONE: Generated {auto_n} auto + {home_n} home claims with {output}.")
+    print(f" seed {seed}, {workers} workers, {elapsed:.1f}s ({total / elapsed if elapsed > 0 else 0:.0f} claims/sec)")
 
 
 if __name__ == "__main__":
-    main(500)
+    # python synthetic_data_generator.py [total] [--text-only] [--seed=N] [--workers=N]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    options = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+
+    main(
+        int(args[0]) if args else 500,
+        text_only="--text-only" in sys.argv,
+        seed=int(options["seed"]) if "seed" in options else None,
+        workers=int(options["workers"]) if "workers" in options else None
+    )
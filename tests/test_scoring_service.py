@@ -0,0 +1,53 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import scoring_service
+
+def fake_score_claims(claims):
+    for claim in claims:
+        if not isinstance(claim.get("severity_score", 0), int):
+            raise TypeError("severity_score must be a number")
+    return [{"claim_id": claim["claim_id"]} for claim in claims]
+
+def test_bad_claim_fails_only_its_own_request(monkeypatch):
+    monkeypatch.setattr(scoring_service, "score_claims", fake_score_claims)
+
+    claims = [{"claim_id": f"C{i}", "severity_score": 10} for i in range(5)]
+    claims.insert(2, {"claim_id": "BAD", "severity_score": "high"})
+
+    async def run():
+        metrics = scoring_service.LatencyMetrics()
+        batcher = scoring_service.MicroBatcher(metrics, max_wait_ms=50)
+        task = asyncio.create_task(batcher.run())
+        try:
+            return await asyncio.gather(
+                *(batcher.submit(claim) for claim in claims), return_exceptions=True
+            ), list(metrics.batch_sizes)
+        finally:
+            task.cancel()
+
+    results, batch_sizes = asyncio.run(run())
+
+    assert batch_sizes == [len(claims)]
+    assert isinstance(results[2], TypeError)
+    good = [r for i, r in enumerate(results) if i != 2]
+    assert good == [{"claim_id": f"C{i}"} for i in range(5)]
+
+def test_invalid_content_length_is_400():
+    async def read(raw):
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await scoring_service.read_request(reader)
+
+    for length in (b"abc", b"-5"):
+        raw = b"POST /score HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}"
+        try:
+            asyncio.run(read(raw))
+        except scoring_service.HttpError as e:
+            assert e.status == 400
+        else:
+            raise AssertionError(f"Content-Length {length!r} accepted")
@@ -0,0 +1,225 @@
+# vector_generations.py
+
+from contextlib import contextmanager
+from pathlib import Path
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in one process are still serialised
+    fcntl = None
+
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = Path(os.environ.get("CLAIMS_DATA_DIR", BASE_DIR / "data"))
+VECTOR_DIR = DATA_DIR / "vector_store"
+GENERATIONS_DIR = VECTOR_DIR / "generations"
+SEGMENTS_DIR = VECTOR_DIR / "segments"
+CURRENT_FILE = VECTOR_DIR / "CURRENT"
+LOCK_FILE = VECTOR_DIR / ".lock"
+
+# published generations kept on disk (older ones are pruned)
+KEEP_GENERATIONS = 3
+
+# -------------------------------------------------
+# LAYOUT
+# -------------------------------------------------
+# data/vector_store/
+#   CURRENT                  -> "gen-000007" (replaced atomically)
+#   generations/gen-000007/  manifest.json, encoder.json
+#   segments/seg-000012/     vectors.npz, metadata.json, rows.npz, ann_index.npz
+#
+# Segments are immutable; a generation is the list of segments it
+# serves plus the rows deleted from each (tombstones), so adding claims
+# publishes one small segment and a new manifest, never a full rewrite.
+#
+# A generation directory is complete before its name is ever written
+# to CURRENT, and every segment it lists is published before it, so a
+# reader can never pair files from two builds.
+#
+# Segment and generation numbers come from directory listings, so
+# writers (threads and processes, e.g. semantic_store_builder --watch
+# next to pipeline_runner) publish and prune under writer_lock().
+
+MANIFEST_FILE = "manifest.json"
+
+def generation_name(number: int) -> str:
+    return f"gen-{number:06d}"
+
+def generation_number(name: str) -> int:
+    return int(name.split("-", 1)[1])
+
+def list_generations() -> list:
+    if not GENERATIONS_DIR.exists():
+        return []
+    return sorted(
+        p.name for p in GENERATIONS_DIR.iterdir()
+        if p.is_dir() and p.name.startswith("gen-")
+    )
+
+def current_generation(vector_dir: Path = VECTOR_DIR):
+    current = Path(vector_dir) / "CURRENT"
+    try:
+        name = current.read_text().strip()
+    except FileNotFoundError:
+        return None
+    return name or None
+
+def generation_dir(name: str, vector_dir: Path = VECTOR_DIR) -> Path:
+    return Path(vector_dir) / "generations" / name
+
+def segment_dir(name: str, vector_dir: Path = VECTOR_DIR) -> Path:
+    return Path(vector_dir) / "segments" / name
+
+def read_manifest(name: str, vector_dir: Path = VECTOR_DIR) -> dict:
+    # {"segments": [{"name": "seg-000012", "rows": 500, "deleted": [row, ...]}, ...]}
+    with open(generation_dir(name, vector_dir) / MANIFEST_FILE) as f:
+        return json.load(f)
+
+# -------------------------------------------------
+# WRITER LOCK
+# -------------------------------------------------
+
+_thread_lock = threading.Lock()
+
+@contextmanager
+def writer_lock():
+    """
+    Exclusive across threads and processes. Hold it from publishing a
+    segment until the generation that references it is published (and
+    pruned), so no other writer reuses a number or prunes the segment.
+    """
+    with _thread_lock:
+        VECTOR_DIR.mkdir(parents=True, exist_ok=True)
+        with open(LOCK_FILE, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+# -------------------------------------------------
+# PUBLISH
+# -------------------------------------------------
+
+BUILD_PREFIX = ".build-"
+
+def new_build_dir(parent: Path = GENERATIONS_DIR) -> Path:
+    # same filesystem as the published dirs -> the final rename is atomic;
+    # the pid tells prune() whether the build's writer is still running
+    parent.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(prefix=f"{BUILD_PREFIX}{os.getpid()}-", dir=parent))
+
+def new_segment_dir() -> Path:
+    return new_build_dir(SEGMENTS_DIR)
+
+def _fsync_dir(path: Path):
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+def _seal(build_dir: Path):
+    # flush the directory's files before anyone can see them
+    for path in build_dir.iterdir():
+        with open(path, "rb") as f:
+            os.fsync(f.fileno())
+
+    # mkdtemp creates 0700 dirs; retrievers may run as other users
+    os.chmod(build_dir, 0o755)
+
+def list_segments() -> list:
+    if not SEGMENTS_DIR.exists():
+        return []
+    return sorted(
+        p.name for p in SEGMENTS_DIR.iterdir()
+        if p.is_dir() and p.name.startswith("seg-")
+    )
+
+def publish_segment(build_dir: Path) -> str:
+    # caller holds writer_lock()
+    _seal(build_dir)
+
+    existing = list_segments()
+    number = int(existing[-1].split("-", 1)[1]) + 1 if existing else 1
+    name = f"seg-{number:06d}"
+
+    os.rename(build_dir, SEGMENTS_DIR / name)
+    _fsync_dir(SEGMENTS_DIR)
+    return name
+
+def publish(build_dir: Path) -> str:
+    # caller holds writer_lock()
+    _seal(build_dir)
+
+    existing = list_generations()
+    number = generation_number(existing[-1]) + 1 if existing else 1
+    name = generation_name(number)
+
+    os.rename(build_dir, GENERATIONS_DIR / name)
+    _fsync_dir(GENERATIONS_DIR)
+
+    tmp = CURRENT_FILE.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        f.write(name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp, CURRENT_FILE)
+    _fsync_dir(VECTOR_DIR)
+
+    prune()
+    return name
+
+def prune(keep: int = KEEP_GENERATIONS):
+    # caller holds writer_lock(): a segment published by another writer
+    # is referenced by its generation before the lock is released
+    current = current_generation()
+
+    # readers that still mmap a pruned generation keep their pages (POSIX)
+    for name in list_generations()[:-keep]:
+        if name != current:
+            shutil.rmtree(GENERATIONS_DIR / name, ignore_errors=True)
+
+    # segments no kept generation serves any more
+    referenced = set()
+    for name in list_generations():
+        try:
+            referenced.update(s["name"] for s in read_manifest(name)["segments"])
+        except FileNotFoundError:
+            pass
+
+    for name in list_segments():
+        if name not in referenced:
+            shutil.rmtree(SEGMENTS_DIR / name, ignore_errors=True)
+
+    # leftovers of builds whose process died before publishing
+    for parent in (GENERATIONS_DIR, SEGMENTS_DIR):
+        for path in parent.glob(BUILD_PREFIX + "*"):
+            if not _build_running(path.name):
+                shutil.rmtree(path, ignore_errors=True)
+
+def _build_running(name: str) -> bool:
+    # segments are encoded outside writer_lock(), so a build dir may belong
+    # to a live writer; dirs without a pid predate the pid naming
+    pid = name[len(BUILD_PREFIX):].split("-", 1)[0]
+    if not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True